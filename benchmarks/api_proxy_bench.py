@@ -0,0 +1,137 @@
+"""Benchmark: hosted bots calling a stand-in Bot API directly vs. through the pooled proxy.
+
+Usage: python -m benchmarks.api_proxy_bench [--bots 50] [--requests 60] [--concurrency 4] [--api-ms 20] [--api-limit 30]
+
+The stand-in API answers sendMessage after ``--api-ms`` and, like Telegram,
+replies 429 with ``retry_after`` when a token sends more than
+``--api-limit`` requests in a second. Every fake bot has its own HTTP client,
+as a separately running bot would. The report shows how many upstream
+connections were opened, how many requests hit 429, and the latency seen
+by the bots.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from collections import defaultdict, deque
+
+import httpx
+
+from core.http_util import read_request, write_response
+from core.api_proxy import BotApiProxy, API_PROXY_METRICS
+
+
+class StandInApi:
+    """Plain HTTP stand-in for api.telegram.org with a per-token flood limit."""
+    def __init__(self, delay: float, limit: int):
+        self.delay = delay
+        self.limit = limit
+        self.connections = 0
+        self.recent: dict[str, deque] = defaultdict(deque)
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0, backlog=1024)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer) -> None:
+        self.connections += 1
+        try:
+            while (request := await read_request(reader, 1024 * 1024)) is not None:
+                token = request.path[len('/bot'):].split('/', 1)[0]
+                now = time.monotonic()
+                window = self.recent[token]
+                while window and now - window[0] >= 1:
+                    window.popleft()
+                if len(window) >= self.limit:
+                    body = {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                            'parameters': {'retry_after': 1}}
+                    status = 429
+                else:
+                    window.append(now)
+                    await asyncio.sleep(self.delay)
+                    body = {'ok': True, 'result': {'message_id': len(window)}}
+                    status = 200
+                write_response(writer, status, json.dumps(body).encode(), {'Content-Type': 'application/json'})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _run_bot(base_url: str, token: str, count: int, concurrency: int, results: dict) -> None:
+    # Each hosted bot keeps its own client, like a separate python-telegram-bot process
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency), timeout=30) as client:
+        pending = iter(range(count))
+
+        async def worker():
+            for i in pending:
+                started = time.perf_counter()
+                response = await client.post(f"{base_url}/bot{token}/sendMessage",
+                                             json={'chat_id': 1, 'text': f"message {i}"})
+                results['latencies'].append(time.perf_counter() - started)
+                results[response.status_code] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def _measure(args, through_proxy: bool) -> dict:
+    api = StandInApi(args.api_ms / 1000, args.api_limit)
+    api_port = await api.start()
+    base_url = f"http://127.0.0.1:{api_port}"
+    proxy = None
+    tokens = [f"{1000 + i}:TOKEN{i}" for i in range(args.bots)]
+    if through_proxy:
+        proxy = BotApiProxy(listen='127.0.0.1', port=0, upstream=base_url, pool_size=args.pool_size)
+        await proxy.start()
+        for i, token in enumerate(tokens):
+            proxy.register(str(1000 + i), token)
+        base_url = f"http://127.0.0.1:{proxy.bound_port}"
+
+    results = defaultdict(int, latencies=[])
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_bot(base_url, token, args.requests, args.concurrency, results) for token in tokens))
+    elapsed = time.perf_counter() - started
+
+    if proxy:
+        await proxy.stop()
+    # Let the stand-in see the clients' connections close before shutting it down
+    await asyncio.sleep(0.1)
+    api.server.close()
+    await api.server.wait_closed()
+    quantiles = statistics.quantiles(results['latencies'], n=100)
+    return {
+        'elapsed': elapsed, 'ok': results[200], 'rate_limited': results[429],
+        'connections': api.connections, 'p50': quantiles[49], 'p99': quantiles[98],
+    }
+
+
+async def run(args) -> int:
+    total = args.bots * args.requests
+    for label, through_proxy in (("direct", False), ("proxy", True)):
+        r = await _measure(args, through_proxy)
+        print(f"{label:>6}: {total} requests from {args.bots} bots in {r['elapsed']:.2f}s | "
+              f"ok {r['ok']}, 429 {r['rate_limited']} | upstream connections {r['connections']} | "
+              f"latency p50 {r['p50'] * 1000:.0f} ms, p99 {r['p99'] * 1000:.0f} ms")
+    stats = API_PROXY_METRICS.snapshot()
+    upstream = sum(s.api_time for s in stats.values()) / max(sum(s.count for s in stats.values()), 1)
+    print(f"proxy per-bot metrics: {len(stats)} bots recorded, mean upstream time {upstream * 1000:.1f} ms")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=60, help="sendMessage calls per bot")
+    parser.add_argument('--concurrency', type=int, default=4, help="parallel requests per bot")
+    parser.add_argument('--pool-size', type=int, default=64, help="proxy upstream connection pool")
+    parser.add_argument('--api-ms', type=float, default=20, help="stand-in API response time")
+    parser.add_argument('--api-limit', type=int, default=30, help="stand-in API requests per second per token")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Benchmark: consecutive incremental backups vs. full directory copies.
+
+Usage: python -m benchmarks.backup_bench [--size-mb 200] [--runs 20] [--churn 0.01]
+"""
+import os
+import sys
+import time
+import shutil
+import random
+import argparse
+import tempfile
+
+from utils.backup_store import backup_tree, apply_retention, gc_blobs
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            total += os.path.getsize(os.path.join(dirpath, f))
+    return total
+
+
+def _make_bot(root: str, size_mb: int, rnd: random.Random) -> list[str]:
+    """Creates a synthetic bot: 3/4 compressible source-like text, 1/4 random binary assets."""
+    words = [''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz_') for _ in range(rnd.randint(3, 10))) for _ in range(2000)]
+    text_files = []
+    text_budget = size_mb * 1024 * 1024 * 3 // 4
+    i = 0
+    while text_budget > 0:
+        rel = f"pkg{i % 50}/module_{i}.py"
+        os.makedirs(os.path.join(root, os.path.dirname(rel)), exist_ok=True)
+        body = '\n'.join(f"def {rnd.choice(words)}_{n}({rnd.choice(words)}):\n    return {rnd.choice(words)}" for n in range(900))
+        with open(os.path.join(root, rel), 'w') as f:
+            f.write(body)
+        text_files.append(rel)
+        text_budget -= len(body)
+        i += 1
+
+    os.makedirs(os.path.join(root, 'assets'), exist_ok=True)
+    for n in range(max(1, size_mb // 4)):
+        with open(os.path.join(root, 'assets', f"asset_{n}.bin"), 'wb') as f:
+            f.write(rnd.randbytes(1024 * 1024))
+    return text_files
+
+
+def _churn(root: str, text_files: list[str], fraction: float, rnd: random.Random) -> None:
+    for rel in rnd.sample(text_files, max(1, int(len(text_files) * fraction))):
+        with open(os.path.join(root, rel), 'a') as f:
+            f.write(f"\n# edited {time.time()}\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--churn', type=float, default=0.01, help="fraction of source files modified between runs")
+    parser.add_argument('--keep-last', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(42)
+    work = tempfile.mkdtemp(prefix='backup_bench_')
+    try:
+        bot_root = os.path.join(work, 'bot')
+        store = os.path.join(work, 'store')
+        text_files = _make_bot(bot_root, args.size_mb, rnd)
+        bot_bytes = _dir_size(bot_root)
+        print(f"bot: {len(text_files)} source files, {bot_bytes / 1e6:.1f} MB")
+
+        # Baseline: the previous implementation copied the whole tree every time
+        started = time.perf_counter()
+        shutil.copytree(bot_root, os.path.join(work, 'full_copy'))
+        copy_time = time.perf_counter() - started
+        shutil.rmtree(os.path.join(work, 'full_copy'))
+        print(f"full copy: {copy_time:.2f}s per backup, {args.runs * bot_bytes / 1e6:.1f} MB for {args.runs} backups")
+
+        times = []
+        for run in range(args.runs):
+            if run:
+                _churn(bot_root, text_files, args.churn, rnd)
+            started = time.perf_counter()
+            manifest = backup_tree('bench', bot_root, store_root=store)
+            if apply_retention('bench', keep_last=args.keep_last, keep_daily=0, store_root=store):
+                gc_blobs(store_root=store)
+            times.append(time.perf_counter() - started)
+            print(f"run {run + 1:2d}: {times[-1]:.2f}s, {manifest['new_blobs']} new blobs, "
+                  f"{manifest['stored_bytes'] / 1e6:.2f} MB written, store {_dir_size(store) / 1e6:.1f} MB")
+
+        incremental = times[1:] or times
+        print(f"first backup {times[0]:.2f}s, incremental avg {sum(incremental) / len(incremental):.2f}s, "
+              f"store {_dir_size(store) / 1e6:.1f} MB holding {args.keep_last} backups")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
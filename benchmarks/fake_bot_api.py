@@ -0,0 +1,205 @@
+"""A local fake of the Telegram Bot API for load tests.
+
+Implements the methods the platform uses (getMe, getUpdates, sendMessage,
+editMessageText, answerCallbackQuery, getFile, sendDocument and file
+downloads) well enough for python-telegram-bot; any other method answers
+``True``. Tests push updates with the ``push_*`` helpers, and every call the
+application makes is recorded with its arrival time.
+"""
+import json
+import time
+import asyncio
+import itertools
+from collections import Counter
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from typing import Callable, Optional
+from urllib.parse import parse_qsl
+
+from core.http_util import HttpError, HttpRequest, read_request, write_response
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Fake Bot', 'username': 'fake_bot'}
+
+
+@dataclass
+class ApiCall:
+    method: str
+    params: dict
+    at: float = field(default_factory=time.perf_counter)
+
+
+def _parse_params(request: HttpRequest) -> dict:
+    """Form, multipart and JSON bodies as a flat dict; uploaded files become their size."""
+    content_type = request.headers.get('content-type', '')
+    if not request.body:
+        return {}
+    if content_type.startswith('application/json'):
+        return json.loads(request.body)
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=email_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + request.body)
+        params = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True) or b""
+            params[name] = len(payload) if part.get_filename() else payload.decode()
+        return params
+    return dict(parse_qsl(request.body.decode()))
+
+
+class FakeBotApi:
+    """Fake Bot API server; one instance serves any token."""
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.calls: list[ApiCall] = []
+        self.counts: Counter = Counter()
+        self.files: dict[str, bytes] = {}
+        self._updates: list[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1000)
+        self._new_call = asyncio.Condition()
+        self._new_update = asyncio.Condition()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._closing = False
+
+    async def start(self) -> str:
+        """Starts listening on a free local port; returns the base URL for ``Application.builder().base_url``."""
+        self._server = await asyncio.start_server(self._handle_connection, '127.0.0.1', 0, backlog=1024)
+        return f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        # Pending long polls return at once instead of being cancelled with the loop
+        self._closing = True
+        async with self._new_update:
+            self._new_update.notify_all()
+        await asyncio.sleep(0.1)
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # --- updates -------------------------------------------------------
+
+    def _user(self) -> dict:
+        return {'id': self.chat_id, 'is_bot': False, 'first_name': 'Admin'}
+
+    def _chat(self) -> dict:
+        return {'id': self.chat_id, 'type': 'private'}
+
+    async def _push(self, update_id: Optional[int] = None, **payload) -> int:
+        update_id = update_id or next(self._update_ids)
+        async with self._new_update:
+            self._updates.append({'update_id': update_id, **payload})
+            self._new_update.notify_all()
+        return update_id
+
+    async def push_callback(self, data: str, message_id: int = 1) -> str:
+        """Queues a button press on message ``message_id``; returns the callback query id."""
+        update_id = next(self._update_ids)
+        query = {
+            'id': str(update_id), 'from': self._user(), 'chat_instance': '1', 'data': data,
+            'message': {'message_id': message_id, 'date': int(time.time()), 'chat': self._chat(),
+                        'from': BOT_USER, 'text': '...'},
+        }
+        await self._push(update_id, callback_query=query)
+        return str(update_id)
+
+    def _message(self, **fields) -> dict:
+        return {'message_id': next(self._message_ids), 'date': int(time.time()), 'chat': self._chat(), **fields}
+
+    async def push_text(self, text: str) -> int:
+        return await self._push(message=self._message(**{'from': self._user(), 'text': text}))
+
+    async def push_document(self, file_name: str, content: bytes) -> int:
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = content
+        document = {'file_id': file_id, 'file_unique_id': file_id, 'file_name': file_name,
+                    'file_size': len(content), 'mime_type': 'application/octet-stream'}
+        return await self._push(message=self._message(**{'from': self._user(), 'document': document}))
+
+    async def wait_for(self, predicate: Callable[[ApiCall], bool], timeout: float, start: int = 0) -> Optional[ApiCall]:
+        """Waits for a call matching ``predicate`` among the calls recorded from index ``start`` on."""
+        async def _wait():
+            index = start
+            async with self._new_call:
+                while True:
+                    for call in self.calls[index:]:
+                        if predicate(call):
+                            return call
+                    index = len(self.calls)
+                    await self._new_call.wait()
+        try:
+            return await asyncio.wait_for(_wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    # --- HTTP ----------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, 64 * 1024 * 1024)
+                except HttpError as e:
+                    write_response(writer, e.status, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, content_type, body = await self._dispatch(request)
+                write_response(writer, status, body, {'Content-Type': content_type})
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: HttpRequest) -> tuple[int, str, bytes]:
+        path = request.path.split('?', 1)[0]
+        if path.startswith('/file/bot'):
+            content = self.files.get(path.rsplit('/', 1)[-1])
+            if content is None:
+                return 404, 'text/plain', b'Not Found'
+            return 200, 'application/octet-stream', content
+        if not path.startswith('/bot'):
+            return 404, 'text/plain', b'Not Found'
+
+        method = path.rsplit('/', 1)[-1]
+        params = _parse_params(request)
+        if method != 'getUpdates':
+            async with self._new_call:
+                self.calls.append(ApiCall(method, params))
+                self.counts[method] += 1
+                self._new_call.notify_all()
+        result = await self._result(method, params)
+        return 200, 'application/json', json.dumps({'ok': True, 'result': result}).encode()
+
+    async def _result(self, method: str, params: dict):
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return await self._get_updates(int(params.get('offset') or 0), float(params.get('timeout') or 0))
+        if method == 'sendMessage':
+            return self._message(**{'from': BOT_USER, 'text': params.get('text', '')})
+        if method == 'editMessageText':
+            return {'message_id': int(params.get('message_id') or 1), 'date': int(time.time()),
+                    'chat': self._chat(), 'from': BOT_USER, 'text': params.get('text', '')}
+        if method == 'sendDocument':
+            document = {'file_id': 'sent', 'file_unique_id': 'sent', 'file_name': 'document'}
+            return self._message(**{'from': BOT_USER, 'document': document})
+        if method == 'getFile':
+            file_id = params.get('file_id', '')
+            return {'file_id': file_id, 'file_unique_id': file_id, 'file_size': len(self.files.get(file_id, b"")),
+                    'file_path': f"documents/{file_id}"}
+        return True
+
+    async def _get_updates(self, offset: int, timeout: float) -> list[dict]:
+        async with self._new_update:
+            # Confirmed updates are dropped, as Telegram does once the offset moves past them
+            self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            if not self._updates and timeout and not self._closing:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return self._updates[:100]
@@ -0,0 +1,140 @@
+"""Benchmark: the shared webhook gateway fed by a fake Telegram sender and fake hosted bots.
+
+Usage: python -m benchmarks.gateway_bench [--bots 50] [--updates 200] [--connections 8] [--slow-bot-ms 0]
+
+The fake Telegram side posts numbered updates for every bot with the bot's
+secret, retrying on 503 like Telegram does. Each fake bot is a local HTTP
+server that records arrival order and latency. With ``--slow-bot-ms`` the
+first bot answers slowly, to show its queue filling up (503s) without
+delaying the other bots.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from core.http_util import read_request, write_response
+from core.webhook_gateway import WebhookGateway, SECRET_HEADER, HOOK_PREFIX, allocate_bot_port
+
+
+class FakeBot:
+    """Stand-in for a hosted bot running its own webhook server on a local port."""
+    def __init__(self, bot_id: str, port: int, delay: float):
+        self.bot_id = bot_id
+        self.port = port
+        self.delay = delay
+        self.received: list[int] = []
+        self.latencies: list[float] = []
+        self.server = None
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', self.port)
+
+    async def _handle(self, reader, writer) -> None:
+        try:
+            while (request := await read_request(reader, 1024 * 1024)) is not None:
+                update = json.loads(request.body)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                self.received.append(update['update_id'])
+                self.latencies.append(time.perf_counter() - update['sent_at'])
+                write_response(writer, 200)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _send_updates(gateway_port: int, bot_id: str, secret: str, count: int, connections: int,
+                        counters: dict) -> None:
+    """Fake Telegram: posts ``count`` updates over ``connections`` keep-alive connections."""
+    ids = iter(range(count))
+    lock = asyncio.Lock()
+
+    async def worker():
+        reader, writer = await asyncio.open_connection('127.0.0.1', gateway_port)
+        try:
+            while True:
+                async with lock:
+                    update_id = next(ids, None)
+                if update_id is None:
+                    return
+                while True:
+                    body = json.dumps({'update_id': update_id, 'sent_at': time.perf_counter()}).encode()
+                    head = f"POST {HOOK_PREFIX}{bot_id} HTTP/1.1\r\nHost: gw\r\nContent-Length: {len(body)}\r\n" \
+                           f"{SECRET_HEADER}: {secret}\r\n\r\n"
+                    writer.write(head.encode() + body)
+                    await writer.drain()
+                    status = int((await reader.readline()).split()[1])
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    if status == 200:
+                        break
+                    counters['rejected'] += 1
+                    # Telegram backs off before redelivering
+                    await asyncio.sleep(0.05)
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(worker() for _ in range(connections)))
+
+
+async def run(args) -> int:
+    gateway = WebhookGateway(listen='127.0.0.1', port=0, queue_size=args.queue_size)
+    await gateway.start()
+    used: set[int] = set()
+    bots = []
+    for i in range(args.bots):
+        port = allocate_bot_port(used)
+        used.add(port)
+        bot = FakeBot(str(1000 + i), port, args.slow_bot_ms / 1000 if i == 0 else 0)
+        await bot.start()
+        gateway.register(bot.bot_id, port, f"secret-{i}")
+        bots.append(bot)
+
+    counters = {'rejected': 0}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _send_updates(gateway.bound_port, bot.bot_id, f"secret-{i}", args.updates, args.connections, counters)
+        for i, bot in enumerate(bots)
+    ))
+    for route in gateway.routes.values():
+        await route.queue.join()
+    elapsed = time.perf_counter() - started
+
+    total = args.bots * args.updates
+    # Updates of one bot may be accepted out of order across Telegram's parallel connections,
+    # but every one must arrive exactly once
+    complete = all(sorted(b.received) == list(range(args.updates)) for b in bots)
+    fast = [lat for b in bots[1:] if args.slow_bot_ms for lat in b.latencies] or [lat for b in bots for lat in b.latencies]
+    quantiles = statistics.quantiles(fast, n=100)
+    print(f"{total} updates for {args.bots} bots in {elapsed:.2f}s ({total / elapsed:.0f} updates/s), "
+          f"all delivered exactly once: {complete}")
+    print(f"latency sender->bot{' (excluding slow bot)' if args.slow_bot_ms else ''}: "
+          f"p50 {quantiles[49] * 1000:.1f} ms, p99 {quantiles[98] * 1000:.1f} ms")
+    print(f"503 backpressure responses: {counters['rejected']}")
+
+    await gateway.stop()
+    # Let the bots see the forwarders' connections close before shutting them down
+    await asyncio.sleep(0.1)
+    for bot in bots:
+        bot.server.close()
+        await bot.server.wait_closed()
+    return 0 if complete else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=50)
+    parser.add_argument('--updates', type=int, default=200, help="updates per bot")
+    parser.add_argument('--connections', type=int, default=8, help="parallel sender connections per bot")
+    parser.add_argument('--queue-size', type=int, default=100)
+    parser.add_argument('--slow-bot-ms', type=float, default=0, help="handling delay of the first bot")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
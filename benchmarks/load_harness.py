@@ -0,0 +1,317 @@
+"""Load test: main.py's application against a fake Bot API while it manages many dummy bots.
+
+Usage: python -m benchmarks.load_harness [--bots 200] [--callbacks 2000] [--rate 50] [--uploads 5] [--seed 1] [--json report.json]
+
+Runs in a fresh temporary directory, so the platform's config, bot folders
+and releases are created from scratch. The steps are:
+
+1. Deploy and start ``--bots`` dummy bots. Each one prints a log line every
+   ``--log-interval`` seconds.
+2. Send ``--callbacks`` admin button presses at ``--rate`` per second. Each
+   press is a random mix of panels, logs, status screens and restarts.
+3. Run ``--uploads`` full upload flows, from a .py document to the deploy
+   reply.
+
+For each phase the report lists:
+- callback latency from update to answerCallbackQuery (p50/p99)
+- the handler metrics' own percentiles
+- event loop lag
+- CPU time and RSS of the control process
+- the number of config writes
+
+The same seed gives the same workload.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CALLBACK_MIX = (
+    ("BOT_LIST", 10), ("BOT_PANEL", 30), ("VIEW_LOGS", 25), ("SYSTEM_STATUS", 10),
+    ("HANDLER_STATS", 5), ("JOBS_LIST", 5), ("RELEASES", 10), ("RESTART_BOT", 5),
+)
+
+DUMMY_BOT = '''import time
+import itertools
+
+# {token}
+for i in itertools.count():
+    print(f"tick {{i}}", flush=True)
+    time.sleep({interval})
+'''
+
+
+def percentiles(values: list[float]) -> dict:
+    if len(values) < 2:
+        return {'p50': values[0] if values else 0.0, 'p99': values[0] if values else 0.0, 'max': max(values, default=0.0)}
+    q = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': q[49], 'p99': q[98], 'max': max(values)}
+
+
+def rss_kb() -> dict:
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(('VmRSS:', 'VmHWM:')):
+                name, value = line.split(':')
+                fields[name] = int(value.split()[0])
+    return {'rss_kb': fields.get('VmRSS', 0), 'peak_rss_kb': fields.get('VmHWM', 0)}
+
+
+class LoopLagSampler:
+    """Measures how late a periodic timer fires, which is time the loop spent busy elsewhere."""
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - expected, 0.0))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def take(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+
+class Phase:
+    """CPU, RSS, config writes and loop lag between two points of the run."""
+    def __init__(self, name: str, lag: LoopLagSampler):
+        from database.config_manager import config_version
+        self.name = name
+        self.lag = lag
+        self.lag.take()
+        self._config_version = config_version
+        self.started = time.perf_counter()
+        self.usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.writes = config_version()
+
+    def finish(self, **extra) -> dict:
+        elapsed = time.perf_counter() - self.started
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (usage.ru_utime - self.usage.ru_utime) + (usage.ru_stime - self.usage.ru_stime)
+        return {
+            'phase': self.name,
+            'seconds': elapsed,
+            'cpu_seconds': cpu,
+            'cpu_percent': 100 * cpu / elapsed if elapsed else 0.0,
+            'config_writes': self._config_version() - self.writes,
+            'loop_lag': percentiles(self.lag.take()),
+            **rss_kb(),
+            **extra,
+        }
+
+
+async def _deploy_dummy_bots(count: int, interval: float) -> list[str]:
+    from database.config_manager import get_config, save_config
+    from utils.release_store import deploy
+    from utils.file_utils import get_bot_path
+
+    config = get_config()
+    bot_ids = []
+    for i in range(count):
+        bot_id = str(7000000 + i)
+        token = f"{bot_id}:{'A' * 35}"
+        staging = tempfile.mkdtemp(prefix='staging_', dir='.')
+        with open(os.path.join(staging, 'bot.py'), 'w') as f:
+            f.write(DUMMY_BOT.format(token=token, interval=interval))
+        await asyncio.to_thread(deploy, bot_id, staging)
+        config[bot_id] = {'name': f"dummy{i}", 'token': token, 'directory': get_bot_path(bot_id),
+                          'status': 'stopped', 'pid': None, 'auto_restart': True}
+        bot_ids.append(bot_id)
+    save_config()
+    return bot_ids
+
+
+async def _callback_phase(api, bot_ids: list[str], count: int, rate: float, rng: random.Random) -> dict:
+    actions, weights = zip(*CALLBACK_MIX)
+    sent: dict[str, float] = {}
+    latencies: list[float] = []
+    start_index = len(api.calls)
+
+    async def collect():
+        index = start_index
+        while len(latencies) < count:
+            call = await api.wait_for(lambda c: c.method == 'answerCallbackQuery', 30, start=index)
+            if call is None:
+                return
+            index = api.calls.index(call, index) + 1
+            query_id = call.params.get('callback_query_id')
+            if query_id in sent:
+                latencies.append(call.at - sent.pop(query_id))
+
+    collector = asyncio.create_task(collect())
+    started = time.perf_counter()
+    for i in range(count):
+        action = rng.choices(actions, weights)[0]
+        data = action if action in ("BOT_LIST", "SYSTEM_STATUS", "HANDLER_STATS", "JOBS_LIST") \
+            else f"{action}|{rng.choice(bot_ids)}"
+        sent[await api.push_callback(data, message_id=i + 1)] = time.perf_counter()
+        # Paced against the start time so handler latency does not lower the offered rate
+        await asyncio.sleep(max(started + (i + 1) / rate - time.perf_counter(), 0))
+    await collector
+    return {'callbacks': count, 'answered': len(latencies), 'callback_latency': percentiles(latencies)}
+
+
+async def _upload_phase(api, count: int, interval: float) -> dict:
+    latencies: list[float] = []
+    failures = 0
+    for i in range(count):
+        token = f"{8000000 + i}:{'B' * 35}"
+        started = time.perf_counter()
+        query_id = await api.push_callback("UPLOAD_BOT")
+        # Updates run concurrently, so the document must wait until the prompt set the upload state
+        await api.wait_for(lambda c: c.method == 'answerCallbackQuery'
+                           and c.params.get('callback_query_id') == query_id, 30)
+        index = len(api.calls)
+        await api.push_document(f"upload{i}.py", DUMMY_BOT.format(token=token, interval=interval).encode())
+        received = await api.wait_for(lambda c: 'تم استقبال الملف' in str(c.params.get('text', '')), 30, index)
+        if received is None:
+            failures += 1
+            continue
+        index = len(api.calls)
+        await api.push_text("yes")
+        deployed = await api.wait_for(lambda c: 'تم نشر' in str(c.params.get('text', '')), 60, index)
+        if deployed is None:
+            failures += 1
+            continue
+        latencies.append(deployed.at - started)
+    return {'uploads': count, 'failed': failures, 'upload_latency': percentiles(latencies)}
+
+
+def _handler_percentiles() -> dict:
+    from core.metrics import HANDLER_METRICS
+    return {
+        key: {'count': s.count, 'errors': s.errors, 'p50': s.quantile(0.5), 'p99': s.quantile(0.99),
+              'mean': s.total_time / s.count if s.count else 0.0}
+        for key, s in sorted(HANDLER_METRICS.snapshot().items())
+    }
+
+
+async def run(args) -> dict:
+    from config import ADMIN_ID
+    from database.config_manager import load_config
+    from core.process_manager import ACTIVE_MANAGERS, get_manager
+    from main import build_application
+    from benchmarks.fake_bot_api import FakeBotApi
+
+    load_config()
+    api = FakeBotApi(chat_id=ADMIN_ID)
+    url = await api.start()
+    application = build_application(base_url=f"{url}/bot", base_file_url=f"{url}/file/bot")
+    lag = LoopLagSampler()
+    lag.start()
+    rng = random.Random(args.seed)
+    phases = []
+    try:
+        await application.initialize()
+        await application.post_init(application)
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+
+        phase = Phase('start_bots', lag)
+        bot_ids = await _deploy_dummy_bots(args.bots, args.log_interval)
+        results = await asyncio.gather(*(get_manager(bot_id).start() for bot_id in bot_ids))
+        phases.append(phase.finish(bots=len(bot_ids), started=sum(r.startswith('✅') for r in results)))
+
+        phase = Phase('callbacks', lag)
+        phases.append(phase.finish(**await _callback_phase(api, bot_ids, args.callbacks, args.rate, rng)))
+
+        phase = Phase('uploads', lag)
+        phases.append(phase.finish(**await _upload_phase(api, args.uploads, args.log_interval)))
+    finally:
+        phase = Phase('stop_bots', lag)
+        await asyncio.gather(*(manager.stop() for manager in list(ACTIVE_MANAGERS.values())), return_exceptions=True)
+        phases.append(phase.finish())
+        lag.stop()
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.post_shutdown(application)
+        await application.shutdown()
+        await api.stop()
+
+    return {
+        'args': vars(args),
+        'phases': phases,
+        'handlers': _handler_percentiles(),
+        'api_calls': dict(api.counts),
+    }
+
+
+def _print_report(report: dict) -> None:
+    for p in report['phases']:
+        line = f"{p['phase']:>10}: {p['seconds']:6.2f}s cpu {p['cpu_percent']:5.1f}% " \
+               f"rss {p['rss_kb'] / 1024:6.1f} MB config writes {p['config_writes']:5d} " \
+               f"loop lag p99 {p['loop_lag']['p99'] * 1000:6.1f} ms max {p['loop_lag']['max'] * 1000:6.1f} ms"
+        if 'callback_latency' in p:
+            c = p['callback_latency']
+            line += f" | {p['answered']}/{p['callbacks']} answered, p50 {c['p50'] * 1000:.1f} ms p99 {c['p99'] * 1000:.1f} ms"
+        if 'upload_latency' in p:
+            u = p['upload_latency']
+            line += f" | {p['uploads'] - p['failed']}/{p['uploads']} deployed, p50 {u['p50']:.2f}s"
+        print(line)
+    print(f"{'handler':<40} count  errors   p50(ms)  p99(ms)  mean(ms)")
+    for key, h in report['handlers'].items():
+        print(f"{key:<40} {h['count']:5d} {h['errors']:7d} {h['p50'] * 1000:9.0f} {h['p99'] * 1000:8.0f} {h['mean'] * 1000:9.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=200, help="dummy hosted bots to run")
+    parser.add_argument('--callbacks', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=50, help="callbacks per second")
+    parser.add_argument('--uploads', type=int, default=5)
+    parser.add_argument('--log-interval', type=float, default=1.0, help="seconds between dummy bot log lines")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write the full report to this file")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary working directory")
+    parser.add_argument('--verbose', action='store_true', help="keep the platform's INFO logging")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    # The platform resolves its folders and config file relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix='load_harness_')
+    os.chdir(workdir)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        os.chdir(REPO_ROOT)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report['workdir'] = workdir
+    _print_report(report)
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
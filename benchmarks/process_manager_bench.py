@@ -0,0 +1,252 @@
+"""Benchmark: BotProcessManager with fleets of synthetic bots.
+
+Usage: python -m benchmarks.process_manager_bench [--fleet idle=50,spammy=10,crashy=5,slow=5,forky=5]
+       [--duration 10] [--spam-rate 500] [--json results.json]
+
+Bot kinds:
+  idle    sleeps forever
+  spammy  writes ``--spam-rate`` numbered lines per second to stdout and a tenth as many to stderr
+  crashy  exits with code 1 one second after starting, so the monitor keeps restarting it
+  slow    ignores SIGTERM, so stopping it takes the full grace period and a SIGKILL
+  forky   forks three sleeping children into its process group
+
+The whole fleet is started at once, left running for ``--duration`` seconds,
+restarted at once and then stopped at once. The benchmark runs in a fresh
+temporary directory. The JSON on stdout (or in ``--json``) holds, per kind:
+- start/stop/restart latency
+- log lines captured per second vs. offered
+- crash restarts
+- children left behind after stop
+It also holds overall figures: loop lag, control-process RSS per managed bot,
+config writes and bytes, and run metadata for comparing runs over time.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from collections import defaultdict
+
+from benchmarks.load_harness import REPO_ROOT, LoopLagSampler, percentiles, rss_kb
+
+BOT_SCRIPTS = {
+    'idle': '''import time
+while True:
+    time.sleep(3600)
+''',
+    'spammy': '''import sys
+import time
+import itertools
+rate = {spam_rate}
+for i in itertools.count(1):
+    print(f"line {{i}}")
+    if i % 10 == 0:
+        print(f"err {{i}}", file=sys.stderr)
+    if i % max(rate // 10, 1) == 0:
+        sys.stdout.flush()
+        time.sleep(0.1)
+''',
+    'crashy': '''import sys
+import time
+print("starting", flush=True)
+time.sleep(1)
+sys.exit(1)
+''',
+    'slow': '''import time
+import signal
+signal.signal(signal.SIGTERM, lambda *args: print("ignoring SIGTERM", flush=True))
+while True:
+    time.sleep(3600)
+''',
+    'forky': '''import os
+import time
+for _ in range(3):
+    if os.fork() == 0:
+        while True:
+            time.sleep(3600)
+while True:
+    time.sleep(3600)
+''',
+}
+
+
+def _parse_fleet(spec: str) -> dict[str, int]:
+    fleet = {}
+    for part in spec.split(','):
+        kind, _, count = part.partition('=')
+        if kind not in BOT_SCRIPTS:
+            raise argparse.ArgumentTypeError(f"unknown bot kind {kind!r}, expected one of {', '.join(BOT_SCRIPTS)}")
+        fleet[kind] = int(count or 1)
+    return fleet
+
+
+def _process_group_members(pgid: int) -> int:
+    count = 0
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are fixed
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid and fields[0] != 'Z':
+            count += 1
+    return count
+
+
+async def _timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+async def run(args) -> dict:
+    from config import CONFIG_FILE
+    from database.config_manager import load_config, get_config, save_config, config_version
+    from core.process_manager import get_manager
+    from utils.release_store import deploy
+    from utils.file_utils import get_bot_path
+
+    load_config()
+    config = get_config()
+    kinds: dict[str, list[str]] = defaultdict(list)
+    for kind, count in args.fleet.items():
+        for i in range(count):
+            bot_id = str(len(config) + 9000000)
+            staging = tempfile.mkdtemp(prefix='staging_', dir='.')
+            with open(os.path.join(staging, 'bot.py'), 'w') as f:
+                f.write(BOT_SCRIPTS[kind].format(spam_rate=args.spam_rate))
+            await asyncio.to_thread(deploy, bot_id, staging)
+            config[bot_id] = {'name': f"{kind}{i}", 'token': f"{bot_id}:{'X' * 35}", 'directory': get_bot_path(bot_id),
+                              'status': 'stopped', 'pid': None, 'auto_restart': True}
+            kinds[kind].append(bot_id)
+    save_config()
+    bot_ids = [bot_id for ids in kinds.values() for bot_id in ids]
+    managers = {bot_id: get_manager(bot_id) for bot_id in bot_ids}
+
+    lag = LoopLagSampler()
+    lag.start()
+    baseline_rss = rss_kb()['rss_kb']
+    writes_before = config_version()
+    results: dict = {kind: {'bots': len(ids)} for kind, ids in kinds.items()}
+
+    async def measure(phase: str, action: str) -> None:
+        durations = await asyncio.gather(*(_timed(getattr(managers[b], action)()) for b in bot_ids))
+        by_bot = dict(zip(bot_ids, durations))
+        for kind, ids in kinds.items():
+            results[kind][f'{phase}_latency'] = percentiles([by_bot[b] for b in ids])
+
+    # start
+    started = time.perf_counter()
+    await measure('start', 'start')
+    start_wall = time.perf_counter() - started
+    start_lag = percentiles(lag.take())
+    pids = {b: managers[b].process.pid for b in bot_ids if managers[b].process}
+
+    # steady state
+    log_before = {b: managers[b].log_version for b in bot_ids}
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    await asyncio.sleep(args.duration)
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    steady_lag = percentiles(lag.take())
+    fleet_rss = rss_kb()['rss_kb']
+    for kind, ids in kinds.items():
+        captured = sum(managers[b].log_version - log_before[b] for b in ids)
+        results[kind]['log_lines_per_sec'] = captured / args.duration
+        if kind == 'spammy':
+            # Lines are numbered, so the newest captured one tells how far the bots got;
+            # a bot blocks on its full pipe once capture falls behind
+            last_seen = 0
+            for b in ids:
+                numbers = [int(line.rsplit(' ', 1)[-1]) for line in managers[b].log_buffer
+                           if line.startswith('[STDOUT] line ')]
+                last_seen += max(numbers, default=0)
+            results[kind]['stdout_last_line_seen'] = last_seen
+            results[kind]['offered_lines_per_sec'] = len(ids) * args.spam_rate * 1.1
+        if kind == 'crashy':
+            results[kind]['restarts'] = sum(1 for b in ids if managers[b].process
+                                            and managers[b].process.pid != pids.get(b))
+
+    # restart and stop
+    await measure('restart', 'restart')
+    restart_lag = percentiles(lag.take())
+    pgids = {b: managers[b].process.pid for b in bot_ids if managers[b].process}
+    await measure('stop', 'stop')
+    stop_lag = percentiles(lag.take())
+    for kind, ids in kinds.items():
+        results[kind]['processes_left_after_stop'] = sum(_process_group_members(pgids[b]) for b in ids if b in pgids)
+    lag.stop()
+
+    writes = config_version() - writes_before
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'commit': _git_commit(),
+            'python': platform.python_version(), 'cpus': os.cpu_count(), 'args': {**vars(args)},
+        },
+        'kinds': results,
+        'overall': {
+            'bots': len(bot_ids),
+            'start_wall_seconds': start_wall,
+            'loop_lag': {'start': start_lag, 'steady': steady_lag, 'restart': restart_lag, 'stop': stop_lag},
+            'steady_cpu_percent': 100 * ((usage_after.ru_utime - usage_before.ru_utime)
+                                         + (usage_after.ru_stime - usage_before.ru_stime)) / args.duration,
+            'rss_kb_baseline': baseline_rss,
+            'rss_kb_per_bot': (fleet_rss - baseline_rss) / max(len(bot_ids), 1),
+            'config_writes': writes,
+            'config_bytes_written': writes * os.path.getsize(CONFIG_FILE),
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fleet', type=_parse_fleet, default=_parse_fleet('idle=50,spammy=10,crashy=5,slow=5,forky=5'),
+                        help="comma separated kind=count pairs")
+    parser.add_argument('--duration', type=float, default=10, help="seconds of steady state")
+    parser.add_argument('--spam-rate', type=int, default=500, help="stdout lines per second of each spammy bot")
+    parser.add_argument('--json', help="write the results to this file instead of stdout")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary working directory")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    # The platform resolves its folders and config file relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix='pm_bench_')
+    os.chdir(workdir)
+    logging.basicConfig(level=logging.WARNING)
+    logging.disable(logging.WARNING)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        os.chdir(REPO_ROOT)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if json_path:
+        with open(json_path, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Benchmark: callback dispatch through a chain of regex handlers vs. the prefix router.
+
+Usage: python -m benchmarks.router_bench [--updates 100000] [--rate 1000]
+"""
+import sys
+import time
+import random
+import argparse
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+from core.router import CallbackRouter
+
+# The handler chain main.py registered before the router, in registration order
+CHAIN_PATTERNS = [
+    r"^MAIN_MENU$", r"^BOT_LIST$", r"^BOT_PANEL\|", r"^SYSTEM_STATUS$", r"^HANDLER_STATS$", r"^BACKUPS_LIST$",
+    r"^BACKUP_VIEW\|", r"^BACKUP_RESTORE_CONFIRM\|", r"^BACKUP_RESTORE\|", r"^JOBS_LIST$", r"^JOB_CANCEL\|",
+    r"^(START_BOT|STOP_BOT|RESTART_BOT)\|", r"^DELETE_BOT_CONFIRM\|", r"^DELETE_BOT\|", r"^VIEW_LOGS\|",
+    r"^BACKUP_BOT\|", r"^RELEASES\|", r"^RELEASE_ACTIVATE\|", r"^UPLOAD_BOT$", r"^FILE_MANAGER\|",
+    r"^FILE_ACTIONS\|", r"^FM_DOWNLOAD\|", r"^FM_DELETE_CONFIRM\|", r"^FM_DELETE\|", r"^FM_UPLOAD_PROMPT\|",
+    r"^FM_CREATE_DIR_PROMPT\|",
+]
+
+ROUTES = [
+    ("MAIN_MENU",), ("BOT_LIST",), ("BOT_PANEL", "bot_id"), ("SYSTEM_STATUS",), ("HANDLER_STATS",),
+    ("BACKUPS_LIST",), ("BACKUP_VIEW", "bot_id", "backup_id"), ("BACKUP_RESTORE_CONFIRM", "bot_id", "backup_id"),
+    ("BACKUP_RESTORE", "bot_id", "backup_id"), ("JOBS_LIST",), ("JOB_CANCEL", "job_id"), ("START_BOT", "bot_id"),
+    ("STOP_BOT", "bot_id"), ("RESTART_BOT", "bot_id"), ("DELETE_BOT_CONFIRM", "bot_id"), ("DELETE_BOT", "bot_id"),
+    ("VIEW_LOGS", "bot_id"), ("BACKUP_BOT", "bot_id"), ("RELEASES", "bot_id"),
+    ("RELEASE_ACTIVATE", "bot_id", "release_id"), ("UPLOAD_BOT",), ("FILE_MANAGER", "bot_id", "path"),
+    ("FILE_ACTIONS", "bot_id", "path"), ("FM_DOWNLOAD", "bot_id", "path"), ("FM_DELETE_CONFIRM", "bot_id", "path"),
+    ("FM_DELETE", "bot_id", "path"), ("FM_UPLOAD_PROMPT", "bot_id", "path"), ("FM_CREATE_DIR_PROMPT", "bot_id", "path"),
+]
+
+# Rough click mix of an admin session: navigation and the file manager dominate
+WORKLOAD = [
+    ("BOT_PANEL|123456789", 20), ("FILE_MANAGER|123456789|src/handlers", 20), ("FILE_ACTIONS|123456789|src/main.py", 10),
+    ("BOT_LIST", 10), ("MAIN_MENU", 8), ("VIEW_LOGS|123456789", 8), ("RESTART_BOT|123456789", 5),
+    ("SYSTEM_STATUS", 5), ("JOBS_LIST", 4), ("BACKUP_VIEW|123456789|20250101_120000", 4),
+    ("FM_DOWNLOAD|123456789|data.json", 3), ("JOB_CANCEL|17", 3),
+]
+
+
+async def _noop(update, context):
+    return None
+
+
+def _make_updates(count: int, rnd: random.Random) -> list[Update]:
+    user = User(id=1, first_name='admin', is_bot=False)
+    datas = rnd.choices([d for d, _ in WORKLOAD], weights=[w for _, w in WORKLOAD], k=count)
+    return [
+        Update(update_id=i, callback_query=CallbackQuery(id=str(i), from_user=user, chat_instance='bench', data=data))
+        for i, data in enumerate(datas)
+    ]
+
+
+def _run_chain(updates: list[Update]) -> float:
+    handlers = [CallbackQueryHandler(_noop, pattern=p) for p in CHAIN_PATTERNS]
+    started = time.perf_counter()
+    for update in updates:
+        for handler in handlers:
+            if handler.check_update(update):
+                # Each handler re-split the data itself
+                update.callback_query.data.split('|')
+                break
+    return time.perf_counter() - started
+
+
+def _run_router(updates: list[Update]) -> float:
+    router = CallbackRouter()
+    for name, *params in ROUTES:
+        router.register(name, _noop, *params)
+    handler = router.handler()
+    started = time.perf_counter()
+    for update in updates:
+        if handler.check_update(update):
+            router.parse(update.callback_query.data)
+    return time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=100_000)
+    parser.add_argument('--rate', type=int, default=1000, help="updates per second to express the cost against")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    updates = _make_updates(args.updates, random.Random(42))
+    for label, run in (("regex chain", _run_chain), ("prefix router", _run_router)):
+        best = min(run(updates) for _ in range(args.repeat))
+        per_update = best / len(updates)
+        print(f"{label:14s}: {per_update * 1e6:6.2f} us/update, "
+              f"{per_update * args.rate * 100:.3f}% of one core at {args.rate} updates/s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Benchmark: platform shutdown of a large fleet through the shutdown coordinator.
+
+Usage: python -m benchmarks.shutdown_bench [--fleet idle=180,spammy=10,slow=5,forky=5] [--grace 10]
+       [--json results.json]
+
+Deploys and starts the fleet (bot kinds as in process_manager_bench), lets it
+run for a moment and then shuts it down the way post_shutdown does. The run
+happens in a fresh temporary directory. The JSON report holds:
+- shutdown wall time vs. the grace period
+- bots that exited on SIGTERM vs. were killed
+- processes left in the bots' groups
+- config writes during shutdown (expected: 1)
+- bots whose captured logs reached the archive
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+
+from benchmarks.load_harness import REPO_ROOT
+from benchmarks.process_manager_bench import BOT_SCRIPTS, _parse_fleet, _process_group_members, _git_commit
+
+
+async def run(args) -> dict:
+    from database.config_manager import load_config, get_config, save_config, config_version
+    from core.process_manager import get_manager
+    from core.shutdown import ShutdownCoordinator
+    from utils.release_store import deploy
+    from utils.file_utils import get_bot_path
+
+    load_config()
+    config = get_config()
+    bot_ids = []
+    for kind, count in args.fleet.items():
+        for i in range(count):
+            bot_id = str(len(config) + 9000000)
+            staging = tempfile.mkdtemp(prefix='staging_', dir='.')
+            with open(os.path.join(staging, 'bot.py'), 'w') as f:
+                f.write(BOT_SCRIPTS[kind].format(spam_rate=args.spam_rate))
+            await asyncio.to_thread(deploy, bot_id, staging)
+            config[bot_id] = {'name': f"{kind}{i}", 'token': f"{bot_id}:{'X' * 35}", 'directory': get_bot_path(bot_id),
+                              'status': 'stopped', 'pid': None, 'auto_restart': True}
+            bot_ids.append(bot_id)
+    save_config()
+    managers = [get_manager(bot_id) for bot_id in bot_ids]
+    await asyncio.gather(*(m.start() for m in managers))
+    pgids = [m.process.pid for m in managers if m.process]
+    await asyncio.sleep(args.settle)
+    log_lines = sum(m.log_version for m in managers)
+
+    writes_before = config_version()
+    report = await ShutdownCoordinator().shutdown(detach=False, grace=args.grace)
+    writes = config_version() - writes_before
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'commit': _git_commit(), 'cpus': os.cpu_count(),
+            'args': {**vars(args)},
+        },
+        'bots': report.bots,
+        'grace_seconds': args.grace,
+        'shutdown_seconds': report.seconds,
+        'graceful': report.graceful,
+        'killed': report.killed,
+        'processes_left': sum(_process_group_members(pgid) for pgid in pgids),
+        'config_writes': writes,
+        'still_marked_running': sum(1 for b in bot_ids if config[b].get('status') == 'running'),
+        'log_lines_captured': log_lines,
+        'bots_with_archived_logs': sum(m.log_archive.stats.raw_bytes > 0 for m in managers if m.log_archive),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fleet', type=_parse_fleet, default=_parse_fleet('idle=180,spammy=10,slow=5,forky=5'),
+                        help="comma separated kind=count pairs")
+    parser.add_argument('--grace', type=float, default=10, help="shared grace period in seconds")
+    parser.add_argument('--settle', type=float, default=3, help="seconds the fleet runs before the shutdown")
+    parser.add_argument('--spam-rate', type=int, default=500, help="stdout lines per second of each spammy bot")
+    parser.add_argument('--json', help="write the results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    # The platform resolves its folders and config file relative to the working directory
+    sys.path.insert(0, REPO_ROOT)
+    workdir = tempfile.mkdtemp(prefix='shutdown_bench_')
+    os.chdir(workdir)
+    logging.basicConfig(level=logging.WARNING)
+    logging.disable(logging.WARNING)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if json_path:
+        with open(json_path, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Heartbeats from a hosted bot to the platform's watchdog.
+
+The platform puts this directory on the PYTHONPATH of every bot it starts, so
+a bot only needs ``import hosting_heartbeat``. Once a bot has sent its first
+heartbeat, the watchdog expects one at least every few intervals and restarts
+the bot when they stop. Beats should therefore come from the code that does
+the work. A beat from a side thread would keep a deadlocked bot looking alive.
+
+python-telegram-bot (the task runs on the bot's event loop, so a blocked loop
+stops the beats)::
+
+    import hosting_heartbeat
+
+    async def post_init(application):
+        application.create_task(hosting_heartbeat.keep_alive())
+
+    Application.builder().token(TOKEN).post_init(post_init).build()
+
+Synchronous loops call ``hosting_heartbeat.beat()`` once per iteration; it
+sends at most one datagram per second and costs next to nothing otherwise.
+Outside the platform every function is a no-op.
+"""
+import os
+import time
+import socket
+import asyncio
+
+SOCKET_PATH = os.environ.get('HOSTING_HEARTBEAT_SOCKET')
+TOKEN = os.environ.get('HOSTING_HEARTBEAT_TOKEN', '').encode()
+INTERVAL = float(os.environ.get('HOSTING_HEARTBEAT_INTERVAL', '10'))
+
+_socket = None
+_last = 0.0
+
+
+def enabled() -> bool:
+    return bool(SOCKET_PATH and TOKEN) and hasattr(socket, 'AF_UNIX')
+
+
+def beat() -> None:
+    """Tells the watchdog the bot is alive; never raises."""
+    global _socket, _last
+    now = time.monotonic()
+    if not enabled() or now - _last < 1.0:
+        return
+    _last = now
+    try:
+        if _socket is None:
+            _socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            _socket.setblocking(False)
+        _socket.sendto(TOKEN, SOCKET_PATH)
+    except OSError:
+        # The platform may be restarting; the next beat tries again
+        pass
+
+
+async def keep_alive(interval: float | None = None) -> None:
+    """Beats every ``interval`` seconds (the platform's suggestion by default) for as long as the loop runs."""
+    while True:
+        beat()
+        await asyncio.sleep(interval or INTERVAL)
@@ -17,7 +17,176 @@ WEBHOOK_PORT = 8443
 WEBHOOK_PATH = None
 # عنوان URL الخارجي (مثال: https://example.com/your-path) المطلوب لتسجيل الويب هوك على تلغرام
 WEBHOOK_URL = None
+# بوابة الويب هوك المشتركة: مستمع واحد على WEBHOOK_PORT يستقبل تحديثات المنصة والبوتات المستضافة
+# (/hook/<bot_id>) ويمررها لكل بوت عبر منفذ محلي خاص به
+WEBHOOK_GATEWAY = False
+WEBHOOK_BOT_PORT_BASE = 21000
+WEBHOOK_QUEUE_SIZE = 1000
+WEBHOOK_MAX_BODY = 1024 * 1024
+WEBHOOK_FORWARD_TIMEOUT = 10.0
+
+# وكيل Bot API المشترك: البوتات المستضافة توجَّه إليه عبر TELEGRAM_API_BASE_URL فيستخدم
+# مجمع اتصالات واحداً مع تلغرام ويحد معدل الطلبات لكل توكن (طلب/ثانية مع دفعة أولية)
+# مجموع المعدل والدفعة لا يتجاوز 30 طلباً في أي ثانية وهو حد تلغرام للبوت الواحد
+# حجم المجمع يخص الإرسال فقط؛ طلبات getUpdates الطويلة لها اتصالاتها خارجه
+API_PROXY_ENABLED = False
+API_PROXY_LISTEN = '127.0.0.1'
+API_PROXY_PORT = 8081
+API_PROXY_UPSTREAM = "https://api.telegram.org"
+API_PROXY_POOL_SIZE = 100
+API_PROXY_RATE_PER_TOKEN = 25
+API_PROXY_BURST = 5
+API_PROXY_MAX_BODY = 50 * 1024 * 1024
+# أعلى من مهلة getUpdates الطويلة التي تستخدمها البوتات عادة
+API_PROXY_TIMEOUT = 90.0
+
+# التقاط السجلات: أسطر الذاكرة لكل بوت وحجم الجزء المقروء في كل دور، وحد المعدل الافتراضي
+# (سطر/ثانية وبايت/ثانية، 0 = بلا حد) مع رصيد يكفي LOG_BURST_SECONDS ثانية.
+# الأسطر الزائدة تُسقط ('drop') أو يُحفظ واحد من كل LOG_SAMPLE_EVERY ('sample').
+# يمكن تجاوز الحد لكل بوت عبر المفتاح log_limits في إعداداته
+LOG_BUFFER_LINES = 500
+LOG_CAPTURE_CHUNK = 16 * 1024
+LOG_MAX_LINE_BYTES = 4096
+LOG_RATE_LINES_PER_SEC = 200
+LOG_RATE_BYTES_PER_SEC = 64 * 1024
+LOG_BURST_SECONDS = 2
+LOG_OVERFLOW_MODE = 'sample'
+LOG_SAMPLE_EVERY = 100
+# الخيارات التي يتنقل بينها زر حد السجلات: (سطر/ثانية، بايت/ثانية)
+LOG_LIMIT_PRESETS = ((50, 16 * 1024), (200, 64 * 1024), (1000, 256 * 1024), (0, 0))
+
+# أرشيف السجلات: الأسطر الملتقطة تُجمع في مقاطع (عند بلوغ عدد الأسطر أو العمر بالثواني) وتُضغط
+# في الخلفية على شكل كتل مستقلة (zlib أو lzma) مع فهرس جانبي، فتُقرأ فترة زمنية دون فك المقطع كاملاً
+LOG_ARCHIVE_ENABLED = True
+LOG_ARCHIVE_DIR = "bot_logs"
+LOG_ARCHIVE_CODEC = 'zlib'
+LOG_ARCHIVE_LEVEL = 6
+LOG_ARCHIVE_BLOCK_BYTES = 64 * 1024
+LOG_ARCHIVE_SEGMENT_LINES = 20000
+LOG_ARCHIVE_SEGMENT_SECONDS = 300
+LOG_ARCHIVE_KEEP_DAYS = 90
+# تنزيل السجلات المؤرشفة: أقصى عدد أسطر ونص (بايت) يُرسل، الأحدث أولاً، ويُقسّم الملف إلى أجزاء
+# لا يتجاوز كل منها الحجم المحدد (حد تلغرام للمستندات 50MB)، ويُضغط gzip كل جزء أكبر من حد الضغط
+LOG_EXPORT_MAX_LINES = 1_000_000
+LOG_EXPORT_MAX_BYTES = 100 * 1024 * 1024
+LOG_EXPORT_PART_BYTES = 45 * 1024 * 1024
+LOG_EXPORT_GZIP_OVER = 1024 * 1024
+
+# جدولة المعالج: فئات الأولوية (nice، فئة ionice: 2 عادية و3 خاملة، مستوى ionice)،
+# فترة قياس الاستهلاك وإعادة التوزيع (ثوانٍ)، فرق الحمل بين الأنوية (بالأنوية) الذي يستدعي
+# إعادة التوزيع، الحمل الأدنى المحسوب لكل بوت، كلفة مشاركة نواة مع بوت سريع الاستجابة،
+# وعدد الأنوية الأولى المتروكة لعملية المنصة
+CPU_SCHEDULER_ENABLED = True
+CPU_PRIORITY_CLASSES = {
+    'latency': (0, 2, 0),
+    'normal': (5, 2, 4),
+    'background': (15, 3, 0),
+}
+CPU_DEFAULT_PRIORITY = 'normal'
+CPU_SCHEDULER_INTERVAL = 30
+CPU_REBALANCE_THRESHOLD = 0.5
+CPU_IDLE_WEIGHT = 0.02
+CPU_LATENCY_PENALTY = 0.5
+CPU_RESERVED_CORES = 1 if (os.cpu_count() or 1) > 2 else 0
+
+# السبات: البوتات التي تفعّل المفتاح hibernate في إعداداتها تُوقف وتُعلَّم 'hibernated' إذا بقي
+# استهلاكها للمعالج (بالأنوية) وسجلاتها (سطر/دقيقة) تحت الحدود طوال HIBERNATION_IDLE_SECONDS.
+# تستيقظ بتحديث يصل عبر بوابة الويب هوك، أو بأمر المشرف، أو بعد HIBERNATION_MAX_SLEEP ثانية،
+# أو في الأوقات اليومية ("HH:MM") المحددة في المفتاح hibernation_wake_times
+HIBERNATION_ENABLED = True
+HIBERNATION_IDLE_SECONDS = 3600
+HIBERNATION_CPU_THRESHOLD = 0.01
+HIBERNATION_LOG_LINES_PER_MIN = 1
+HIBERNATION_CHECK_INTERVAL = 60
+HIBERNATION_MAX_SLEEP = 6 * 3600
+
+# المحلل بالعينات لعملية المنصة: أقصى مدة (ثوانٍ) وأقصى معدل عينات (مرة/ثانية) والقيم الافتراضية،
+# ومفتاح الوصول لمسار /debug/profile في خادم الصحة (None = المسار معطل)
+PROFILER_MAX_SECONDS = 60
+PROFILER_MAX_HZ = 100
+PROFILER_DEFAULT_SECONDS = 10
+PROFILER_DEFAULT_HZ = 50
+HEALTH_ADMIN_TOKEN = None
+
+# تشغيل البوت المستضاف تحت المحلل من لوحته: مدة التشغيل (ثوانٍ) لـ cProfile ولزمن الاستيراد،
+# أقصى مدة مسموحة، وعدد الصفوف في كل جدول من التقرير
+PROFILE_RUN_SECONDS = 60
+PROFILE_IMPORTTIME_SECONDS = 20
+PROFILE_RUN_MAX_SECONDS = 300
+PROFILE_REPORT_ROWS = 60
+
+# تحليل الأعطال: مجلد التقارير، عدد الأعطال الأخيرة المحفوظة لكل بوت، أسطر السجل قبل الخطأ،
+# وأقصى مدة (ثوانٍ) بين ظهور الـ traceback وخروج العملية لربطه بالعطل
+CRASHES_DIR = "bot_crashes"
+CRASH_KEEP_RECENT = 50
+CRASH_CONTEXT_LINES = 20
+CRASH_TRACEBACK_WINDOW = 10.0
+
+# المراقبة: البوتات تُرسل نبضات عبر مقبس Unix (وحدة bot_sdk/hosting_heartbeat.py)؛ البوت الذي أرسل
+# نبضة ثم انقطعت نبضاته WATCHDOG_TIMEOUT ثانية يُعتبر معلقاً. البوتات بلا نبضات التي فعّلت المفتاح
+# watchdog تُعتبر معلقة إذا لم يتغير استهلاكها للمعالج ولا سجلها طوال WATCHDOG_FALLBACK_SECONDS.
+# المعلق يتلقى SIGABRT لطباعة مكدساته ثم يُعاد تشغيله (بعد WATCHDOG_DUMP_WAIT ثانية على الأكثر)
+WATCHDOG_ENABLED = True
+WATCHDOG_SOCKET = "bot_watchdog.sock"
+WATCHDOG_HEARTBEAT_INTERVAL = 10
+WATCHDOG_TIMEOUT = 60
+WATCHDOG_FALLBACK_SECONDS = 900
+WATCHDOG_CHECK_INTERVAL = 15
+WATCHDOG_DUMP_WAIT = 5
+
+# إيقاف المنصة: كل البوتات تتلقى SIGTERM معاً ولها مهلة واحدة مشتركة (ثوانٍ) ثم SIGKILL، ومدة انتظار
+# إضافية بعد القتل. في وضع الفصل (SHUTDOWN_DETACH) تبقى البوتات تعمل وتُحوَّل مخرجاتها إلى عملية
+# تصريف (حتى SHUTDOWN_DRAIN_MAX_BYTES لكل بوت) ثم تُستبدل عند تشغيل المنصة التالي
+SHUTDOWN_GRACE_SECONDS = 10
+SHUTDOWN_KILL_WAIT = 2
+SHUTDOWN_DETACH = False
+SHUTDOWN_DRAIN_MAX_BYTES = 50 * 1024 * 1024
+
+# حدود استخراج الملفات المضغوطة (حماية من قنابل ZIP)
+MAX_ZIP_TOTAL_SIZE = 200 * 1024 * 1024
+MAX_ZIP_MEMBERS = 5000
+MAX_ZIP_RATIO = 100
+
+# النسخ الاحتياطية: عدد النسخ المحفوظة لكل بوت ومستوى الضغط
+BACKUP_KEEP_LAST = 10
+BACKUP_KEEP_DAILY = 7
+BACKUP_COMPRESSION_LEVEL = 6
+
+# المهام الخلفية: أحجام مجمعات التنفيذ وفترة تحديث رسائل التقدم (ثوانٍ)
+JOB_IO_WORKERS = 4
+JOB_CPU_WORKERS = min(4, os.cpu_count() or 1)
+JOB_PROGRESS_INTERVAL = 2.0
+
+# الإصدارات: كل نشر يُبنى في مجلد مستقل ويُفعَّل عبر رابط رمزي في BOTS_DIR
+# كل ملف ليس من الرفع (قواعد البيانات والجلسات وما ينشئه البوت) يُنقل إلى الإصدار المفعَّل عند كل تبديل
+RELEASES_DIR = "bot_releases"
+RELEASE_KEEP = 5
+# ملفات البيانات المرفوعة التي قد يعدّلها البوت أثناء التشغيل تُنسخ ولا تُربط، وتُعامل كبيانات لا كشيفرة
+RELEASE_MUTABLE_EXTENSIONS = ('.json', '.db', '.sqlite', '.sqlite3', '.txt', '.log', '.csv', '.pickle', '.pkl')
+
+# فحص ما قبل التشغيل: كل إصدار جديد يُترجم إلى bytecode في مجمع العمليات (بدفعات من الملفات)
+# ويُفحص بحثاً عن أخطاء الصياغة والوحدات غير المثبتة؛ الإصدار الذي فيه أخطاء صياغة لا يُفعَّل
+# (يبقى في قائمة الإصدارات للتفعيل اليدوي) إذا كان PREFLIGHT_BLOCK_ON_ERRORS مفعلاً
+PREFLIGHT_ENABLED = True
+PREFLIGHT_BLOCK_ON_ERRORS = True
+PREFLIGHT_CHUNK_FILES = 32
+PREFLIGHT_MAX_FILE_SIZE = 2 * 1024 * 1024
+PREFLIGHT_IMPORT_TIMEOUT = 15
+
+# الشاشات المباشرة: فترة الفحص، أقل فاصل بين تعديلين في نفس المحادثة،
+# ميزانية التعديلات الكلية في الثانية، ومدة بقاء الوضع المباشر (ثوانٍ)
+LIVE_TICK = 1.0
+LIVE_CHAT_MIN_INTERVAL = 3.0
+LIVE_GLOBAL_EDITS_PER_SEC = 20
+LIVE_VIEW_TTL = 600
+
+# تجميع إشعارات الأخطاء: فترة إرسال الملخص، مدة نسيان الخطأ الهادئ (ثوانٍ)،
+# والحد الأقصى للإشعارات في الدقيقة
+ERROR_DIGEST_INTERVAL = 60
+ERROR_DIGEST_WINDOW = 3600
+ERROR_NOTIFY_PER_MINUTE = 6
 
 # التأكد من وجود المجلدات
 os.makedirs(BOTS_DIR, exist_ok=True)
-os.makedirs(BACKUPS_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(BACKUPS_DIR, exist_ok=True)
+os.makedirs(RELEASES_DIR, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,308 @@
+import ssl
+import json
+import time
+import asyncio
+import logging
+import contextlib
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+from config import (
+    API_PROXY_ENABLED, API_PROXY_LISTEN, API_PROXY_PORT, API_PROXY_UPSTREAM, API_PROXY_POOL_SIZE,
+    API_PROXY_RATE_PER_TOKEN, API_PROXY_BURST, API_PROXY_MAX_BODY, API_PROXY_TIMEOUT
+)
+from core.http_util import HttpError, HttpRequest, read_request, write_response, format_request, read_response
+from core.metrics import HandlerMetrics
+
+logger = logging.getLogger(__name__)
+
+# getUpdates is a long poll, not a sent message; file downloads are not limited either
+RATE_EXEMPT_METHODS = {'getupdates'}
+# Held upstream for the whole poll timeout, so they get connections outside the shared pool
+LONG_POLL_METHODS = {'getupdates'}
+FORWARDED_HEADERS = ('content-type', 'accept')
+
+
+def api_proxy_enabled() -> bool:
+    return bool(API_PROXY_ENABLED)
+
+
+def api_proxy_env(listen: str = API_PROXY_LISTEN, port: int = API_PROXY_PORT) -> dict[str, str]:
+    """Environment pointing a hosted bot at the proxy.
+
+    python-telegram-bot bots use them with ``ApplicationBuilder().base_url(...)``
+    and ``.base_file_url(...)``; the token is appended by the library as usual.
+    """
+    origin = f"http://{listen}:{port}"
+    return {
+        'TELEGRAM_API_BASE_URL': f"{origin}/bot",
+        'TELEGRAM_API_FILE_URL': f"{origin}/file/bot",
+    }
+
+
+class TokenBucket:
+    """Request budget of one bot token: ``rate`` per second after an initial ``burst``.
+
+    Callers reserve a token and wait for it, so bursts are spread out instead
+    of being rejected. A 429 from upstream blocks the token until its
+    ``retry_after`` has passed.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self) -> float:
+        """Takes one token and returns how long the caller must wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class UpstreamPool:
+    """Keep-alive HTTP/1.1 connections to the Bot API shared by all requests.
+
+    At most ``size`` requests are in flight (no limit for ``None``); each
+    borrows an idle connection or opens a new one and returns it afterwards,
+    so TLS handshakes only happen when the pool grows. A plain stream pool is
+    used because a general HTTP client's pool bookkeeping grows with the
+    number of waiting requests.
+    """
+    def __init__(self, url: str, size: Optional[int]):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.ssl = ssl.create_default_context() if parts.scheme == 'https' else None
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.size = size
+        self.opened = 0
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(size) if size else None
+
+    async def _connection(self) -> tuple[tuple[asyncio.StreamReader, asyncio.StreamWriter], bool]:
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl,
+                                    server_hostname=self.host if self.ssl else None), 10.0)
+        self.opened += 1
+        return conn, False
+
+    async def request(self, method: str, path: str, body: bytes, headers: dict[str, str],
+                      max_body: int) -> tuple[int, dict[str, str], bytes]:
+        async with self._slots or contextlib.nullcontext():
+            while True:
+                (reader, writer), reused = await self._connection()
+                try:
+                    writer.write(format_request(method, path, body, headers, host=self.host))
+                    await writer.drain()
+                    status, response_headers, response = await read_response(reader, max_body)
+                except ConnectionResetError:
+                    writer.close()
+                    # The server closed an idle connection before it saw the request; resend on a new one
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if response_headers.get('connection', '').lower() == 'close':
+                    writer.close()
+                else:
+                    self._idle.append((reader, writer))
+                return status, response_headers, response
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+@dataclass
+class ProxyUsage:
+    """Rate limiting counters of one bot; latencies live in API_PROXY_METRICS."""
+    throttled: int = 0
+    throttle_time: float = 0.0
+    upstream_429: int = 0
+
+
+def _error(status: int, description: str) -> tuple[int, dict[str, str], bytes]:
+    # Shaped like a Bot API error so the bot's library reports it normally
+    body = json.dumps({'ok': False, 'error_code': status, 'description': description}).encode()
+    return status, {'Content-Type': 'application/json'}, body
+
+
+def _retry_after(body: bytes) -> float:
+    try:
+        return float(json.loads(body).get('parameters', {}).get('retry_after', 1))
+    except (ValueError, AttributeError):
+        return 1.0
+
+
+class BotApiProxy:
+    """Local HTTP proxy for the Bot API shared by all hosted bots.
+
+    Bots send ``/bot<token>/<method>`` and ``/file/bot<token>/<path>`` to it in
+    plain HTTP; the proxy forwards them over one pool of keep-alive HTTPS
+    connections, so the host keeps a handful of upstream TLS connections
+    instead of a pool per bot. Long polls (getUpdates) sit upstream for up to
+    their whole timeout, so they use a second, unbounded pool and never hold
+    one of the ``pool_size`` slots sends wait for; every polling bot keeps
+    one connection there. Only tokens registered by BotProcessManager are
+    accepted. Requests are paced per token, and every call is recorded per bot
+    in API_PROXY_METRICS (``api`` time is the upstream part, the rest is waiting).
+    """
+    def __init__(self, listen: str = API_PROXY_LISTEN, port: int = API_PROXY_PORT,
+                 upstream: str = API_PROXY_UPSTREAM, pool_size: int = API_PROXY_POOL_SIZE,
+                 rate: float = API_PROXY_RATE_PER_TOKEN, burst: int = API_PROXY_BURST):
+        self.listen = listen
+        self.port = port
+        self.upstream = upstream.rstrip('/')
+        self.pool_size = pool_size
+        self.rate = rate
+        self.burst = burst
+        self.tokens: dict[str, str] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+        self.usage: dict[str, ProxyUsage] = {}
+        self._pool: Optional[UpstreamPool] = None
+        self._poll_pool: Optional[UpstreamPool] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def register(self, bot_id: str, token: str) -> None:
+        for known, owner in list(self.tokens.items()):
+            if owner == bot_id and known != token:
+                del self.tokens[known]
+        self.tokens[token] = bot_id
+        self.buckets.setdefault(token, TokenBucket(self.rate, self.burst))
+        self.usage.setdefault(bot_id, ProxyUsage())
+
+    def unregister(self, bot_id: str) -> None:
+        for token, owner in list(self.tokens.items()):
+            if owner == bot_id:
+                del self.tokens[token]
+                self.buckets.pop(token, None)
+        self.usage.pop(bot_id, None)
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    async def start(self) -> None:
+        if self._server is not None:
+            return
+        self._pool = UpstreamPool(self.upstream, self.pool_size)
+        self._poll_pool = UpstreamPool(self.upstream, None)
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port, backlog=1024)
+        logger.info(f"Bot API proxy listening on {self.listen}:{self.bound_port} -> {self.upstream}")
+
+    @property
+    def bound_port(self) -> Optional[int]:
+        if not self._server or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for pool in (self._pool, self._poll_pool):
+            if pool:
+                pool.close()
+        self._pool = self._poll_pool = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, API_PROXY_MAX_BODY)
+                except HttpError as e:
+                    write_response(writer, e.status, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, headers, body = await self._forward(request)
+                write_response(writer, status, body, headers, keep_alive=request.keep_alive)
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _parse(self, path: str) -> tuple[Optional[str], str]:
+        """Returns (token, method) for a Bot API path; method is empty for file downloads."""
+        if path.startswith('/file/bot'):
+            return path[len('/file/bot'):].split('/', 1)[0], ''
+        if path.startswith('/bot'):
+            token, _, method = path[len('/bot'):].partition('/')
+            return token, method.split('?', 1)[0].lower()
+        return None, ''
+
+    async def _forward(self, request: HttpRequest) -> tuple[int, dict[str, str], bytes]:
+        token, method = self._parse(request.path)
+        bot_id = self.tokens.get(token) if token else None
+        if bot_id is None:
+            return _error(403, "Forbidden: token is not hosted here")
+
+        started = time.perf_counter()
+        usage = self.usage[bot_id]
+        if method and method not in RATE_EXEMPT_METHODS:
+            wait = self.buckets[token].reserve()
+            if wait > 0:
+                usage.throttled += 1
+                usage.throttle_time += wait
+                await asyncio.sleep(wait)
+
+        API_PROXY_METRICS.started(bot_id)
+        upstream_started = time.perf_counter()
+        status = 502
+        try:
+            headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+            pool = self._poll_pool if method in LONG_POLL_METHODS else self._pool
+            status, response_headers, body = await asyncio.wait_for(
+                pool.request(request.method, request.path, request.body, headers, API_PROXY_MAX_BODY),
+                API_PROXY_TIMEOUT)
+            result = status, {'Content-Type': response_headers.get('content-type', 'application/json')}, body
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HttpError) as e:
+            logger.warning(f"Bot API proxy: upstream request for bot {bot_id} failed: {type(e).__name__}")
+            result = _error(502, f"Bad Gateway: {type(e).__name__}")
+        finally:
+            now = time.perf_counter()
+            API_PROXY_METRICS.finished(bot_id, now - started, now - upstream_started, status >= 400)
+
+        if status == 429:
+            usage.upstream_429 += 1
+            self.buckets[token].block(_retry_after(result[2]))
+        return result
+
+    def stats(self, bot_id: str) -> Optional[dict]:
+        usage = self.usage.get(bot_id)
+        if usage is None:
+            return None
+        calls = API_PROXY_METRICS.snapshot().get(bot_id)
+        return {
+            'requests': calls.count if calls else 0,
+            'errors': calls.errors if calls else 0,
+            'p50': calls.quantile(0.5) if calls else 0.0,
+            'p99': calls.quantile(0.99) if calls else 0.0,
+            'throttled': usage.throttled,
+            'throttle_time': usage.throttle_time,
+            'upstream_429': usage.upstream_429,
+        }
+
+
+API_PROXY_METRICS = HandlerMetrics("bot_api_proxy", "bot")
+API_PROXY = BotApiProxy()
@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+import pstats
+
+from config import PROFILE_REPORT_ROWS
+
+PROFILE_MODES = {'cprofile': "cProfile", 'importtime': "زمن الاستيراد"}
+WRAPPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile_wrapper.py')
+
+
+def profile_args(mode: str, output: str, script_path: str) -> list[str]:
+    """Command line that runs ``script_path`` under the profiling wrapper."""
+    interpreter = [sys.executable, '-u'] + (['-X', 'importtime'] if mode == 'importtime' else [])
+    return interpreter + [WRAPPER_PATH, mode, output, script_path]
+
+
+def _cprofile_report(path: str) -> str:
+    out = io.StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs()
+    out.write("=== Sorted by cumulative time ===\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_REPORT_ROWS)
+    out.write("\n=== Sorted by own time ===\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(PROFILE_REPORT_ROWS)
+    return out.getvalue()
+
+
+def _importtime_report(path: str) -> str:
+    rows = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            # "import time: self [us] | cumulative | imported package"
+            parts = line[len("import time:"):].split('|')
+            if len(parts) != 3 or not parts[0].strip().isdigit():
+                continue
+            rows.append((int(parts[1]), int(parts[0]), parts[2].rstrip()))
+    # Top-level imports are the ones without indentation; their cumulative times add up to the total
+    total = sum(cumulative for cumulative, _, name in rows if not name.startswith('  '))
+    out = [f"Imports: {len(rows)}, total {total / 1000:.1f} ms", "",
+           "=== Sorted by cumulative time ===", f"{'cumulative ms':>14} {'self ms':>9}  module"]
+    for cumulative, own, name in sorted(rows, reverse=True)[:PROFILE_REPORT_ROWS]:
+        out.append(f"{cumulative / 1000:14.1f} {own / 1000:9.1f}  {name.strip()}")
+    out += ["", "=== Sorted by own time ===", f"{'self ms':>9}  module"]
+    for cumulative, own, name in sorted(rows, key=lambda r: r[1], reverse=True)[:PROFILE_REPORT_ROWS]:
+        out.append(f"{own / 1000:9.1f}  {name.strip()}")
+    return "\n".join(out) + "\n"
+
+
+def build_report(mode: str, path: str) -> str:
+    """Sorted text report of a profiling run's output file. Blocking."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        raise FileNotFoundError("the profiling run wrote no data")
+    return _cprofile_report(path) if mode == 'cprofile' else _importtime_report(path)
@@ -0,0 +1,242 @@
+import os
+import math
+import time
+import ctypes
+import asyncio
+import logging
+import platform
+from dataclasses import dataclass, field
+from typing import Optional
+
+from config import (
+    CPU_SCHEDULER_ENABLED, CPU_PRIORITY_CLASSES, CPU_SCHEDULER_INTERVAL, CPU_REBALANCE_THRESHOLD,
+    CPU_IDLE_WEIGHT, CPU_LATENCY_PENALTY, CPU_RESERVED_CORES
+)
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LABELS = {'latency': "سريعة الاستجابة", 'normal': "عادية", 'background': "خلفية"}
+# ioprio_set has no stdlib wrapper; syscall numbers per architecture
+_IOPRIO_SET = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'i386': 289, 'armv7l': 314}.get(platform.machine())
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def cpu_scheduler_enabled() -> bool:
+    return CPU_SCHEDULER_ENABLED and hasattr(os, 'sched_setaffinity')
+
+
+def _set_ioprio(pid: int, io_class: int, level: int) -> None:
+    if _IOPRIO_SET is None:
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(_IOPRIO_SET, _IOPRIO_WHO_PROCESS, pid, (io_class << _IOPRIO_CLASS_SHIFT) | level) != 0:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+
+def group_members(pgids: set[int]) -> dict[int, list[tuple[int, int]]]:
+    """(pid, cpu ticks) of every live process in the given process groups, by group."""
+    members: dict[int, list[tuple[int, int]]] = {pgid: [] for pgid in pgids}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; fields after it are fixed
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        pgid = int(fields[2])
+        if pgid in members and fields[0] != 'Z':
+            members[pgid].append((int(entry), int(fields[11]) + int(fields[12])))
+    return members
+
+
+def _apply(pids: list[int], cpus: Optional[tuple[int, ...]], priority: Optional[str]) -> None:
+    """Sets the affinity of every thread, and the nice/ionice level, of the given processes."""
+    for pid in pids:
+        if priority is not None:
+            nice, io_class, io_level = CPU_PRIORITY_CLASSES[priority]
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, nice)
+                _set_ioprio(pid, io_class, io_level)
+            except OSError as e:
+                # Raising a priority again needs CAP_SYS_NICE
+                logger.warning(f"Could not set priority {priority} on pid {pid}: {e}")
+        if cpus is None:
+            continue
+        try:
+            tids = [int(tid) for tid in os.listdir(f'/proc/{pid}/task')]
+        except OSError:
+            tids = [pid]
+        for tid in tids:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except OSError:
+                pass
+
+
+@dataclass
+class Placement:
+    bot_id: str
+    pid: int
+    priority: str
+    cpus: tuple[int, ...] = ()
+    usage: float = 0.0
+    moves: int = 0
+    ticks: Optional[tuple[int, float]] = field(default=None, repr=False)
+
+
+def plan(bots: list[Placement], cores: list[int]) -> dict[str, tuple[int, ...]]:
+    """Assigns CPU sets greedily: heaviest bots first, each on its least loaded cores.
+
+    Latency-class bots are placed first; other bots pay CPU_LATENCY_PENALTY
+    for sharing a core with one, so they pack onto the remaining cores. A bot
+    using more than one core gets as many cores as it uses.
+    """
+    load = {core: 0.0 for core in cores}
+    latency_cores: set[int] = set()
+    result = {}
+    for bot in sorted(bots, key=lambda b: (b.priority != 'latency', -b.usage, b.bot_id)):
+        width = min(len(cores), max(1, math.ceil(bot.usage - 0.1)))
+        penalty = 0.0 if bot.priority == 'latency' else CPU_LATENCY_PENALTY
+        chosen = sorted(cores, key=lambda c: (load[c] + (penalty if c in latency_cores else 0.0), c))[:width]
+        for core in chosen:
+            load[core] += max(bot.usage, CPU_IDLE_WEIGHT) / width
+        if bot.priority == 'latency':
+            latency_cores.update(chosen)
+        result[bot.bot_id] = tuple(sorted(chosen))
+    return result
+
+
+class CpuScheduler:
+    """Places hosted bots on CPU sets and priority classes, and rebalances them while they run.
+
+    Every CPU_SCHEDULER_INTERVAL seconds the CPU time of each bot's process
+    group is sampled from /proc. When per-core load differs by more than
+    CPU_REBALANCE_THRESHOLD cores, a new plan is made and only the bots whose
+    set changed are moved with ``sched_setaffinity``; nothing is restarted.
+    """
+    def __init__(self):
+        self.placements: dict[str, Placement] = {}
+        self.rebalances = 0
+        self.last_rebalance: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cores(self) -> list[int]:
+        allowed = sorted(os.sched_getaffinity(0))
+        return allowed[CPU_RESERVED_CORES:] if len(allowed) > CPU_RESERVED_CORES else allowed
+
+    def core_load(self) -> dict[int, tuple[float, int]]:
+        """Measured load (cores busy) and number of bots per core."""
+        load = {core: (0.0, 0) for core in self.cores}
+        for p in self.placements.values():
+            for core in p.cpus:
+                busy, count = load.get(core, (0.0, 0))
+                load[core] = (busy + p.usage / len(p.cpus), count + 1)
+        return load
+
+    async def place(self, bot_id: str, pid: int, priority: str) -> Placement:
+        """Gives a newly started bot its priority class and the least loaded cores."""
+        previous = self.placements.get(bot_id)
+        placement = Placement(bot_id, pid, priority, usage=previous.usage if previous else 0.0)
+        self.placements.pop(bot_id, None)
+        # Existing bots keep their cores; the new one goes where the plan would put it
+        load = self.core_load()
+        latency_cores = {c for p in self.placements.values() if p.priority == 'latency' for c in p.cpus}
+        penalty = 0.0 if priority == 'latency' else CPU_LATENCY_PENALTY
+        cores = sorted(self.cores, key=lambda c: (load[c][0] + (penalty if c in latency_cores else 0.0), c))
+        width = min(len(cores), max(1, math.ceil(placement.usage - 0.1)))
+        placement.cpus = tuple(sorted(cores[:width]))
+        self.placements[bot_id] = placement
+        await asyncio.to_thread(_apply, [pid], placement.cpus, priority)
+        logger.info(f"Bot {bot_id} placed on CPUs {placement.cpus} with priority {priority}")
+        return placement
+
+    async def set_priority(self, bot_id: str, priority: str) -> None:
+        """Changes the priority class of a running bot and all its processes."""
+        placement = self.placements.get(bot_id)
+        if placement is None:
+            return
+        placement.priority = priority
+        members = await asyncio.to_thread(group_members, {placement.pid})
+        await asyncio.to_thread(_apply, [pid for pid, _ in members[placement.pid]], None, priority)
+
+    def forget(self, bot_id: str) -> None:
+        self.placements.pop(bot_id, None)
+
+    def _update_usage(self, members: dict[int, list[tuple[int, int]]]) -> None:
+        now = time.monotonic()
+        for bot_id, p in list(self.placements.items()):
+            if p.pid not in members:
+                # Placed while the sample was being taken
+                continue
+            group = members[p.pid]
+            if not group:
+                # The bot has exited; it is placed again when it starts
+                self.placements.pop(bot_id, None)
+                continue
+            ticks = sum(t for _, t in group)
+            if p.ticks is not None:
+                elapsed = now - p.ticks[1]
+                if elapsed > 0:
+                    p.usage = max(ticks - p.ticks[0], 0) / _CLOCK_TICKS / elapsed
+            p.ticks = (ticks, now)
+
+    async def rebalance(self, force: bool = False) -> int:
+        """Samples usage and moves bots if the cores are out of balance; returns how many moved."""
+        members = await asyncio.to_thread(group_members, {p.pid for p in self.placements.values()})
+        self._update_usage(members)
+        load = [busy for busy, _ in self.core_load().values()]
+        if not force and (not load or max(load) - min(load) <= CPU_REBALANCE_THRESHOLD):
+            return 0
+        moves = []
+        for bot_id, cpus in plan(list(self.placements.values()), self.cores).items():
+            p = self.placements[bot_id]
+            if cpus != p.cpus:
+                p.cpus = cpus
+                p.moves += 1
+                moves.append(([pid for pid, _ in members.get(p.pid, [])], cpus))
+        for pids, cpus in moves:
+            await asyncio.to_thread(_apply, pids, cpus, None)
+        self.rebalances += 1
+        self.last_rebalance = time.time()
+        if moves:
+            logger.info(f"CPU rebalance moved {len(moves)} bots")
+        return len(moves)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(CPU_SCHEDULER_INTERVAL)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.exception(f"CPU rebalance failed: {e}")
+
+    def render(self, names: dict[str, str]) -> str:
+        """Per-core load and bot placements for the system status screen."""
+        text = "--- توزيع المعالج ---\n"
+        for core, (busy, count) in sorted(self.core_load().items()):
+            text += f"CPU{core}: {busy * 100:.0f}% ({count} بوت)\n"
+        for p in sorted(self.placements.values(), key=lambda p: -p.usage):
+            cpus = ",".join(str(c) for c in p.cpus)
+            text += f"• {names.get(p.bot_id, p.bot_id)}: CPU {cpus} | {PRIORITY_LABELS.get(p.priority, p.priority)} " \
+                    f"| {p.usage * 100:.0f}%" + (f" | نُقل {p.moves}×" if p.moves else "") + "\n"
+        if self.last_rebalance:
+            text += f"آخر إعادة توزيع: {time.strftime('%H:%M:%S', time.localtime(self.last_rebalance))}\n"
+        return text
+
+
+CPU_SCHEDULER = CpuScheduler()
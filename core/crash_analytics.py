@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import time
+import signal
+import hashlib
+import logging
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from config import (
+    BOTS_DIR, RELEASES_DIR, CRASHES_DIR, CRASH_KEEP_RECENT, CRASH_CONTEXT_LINES, LOG_MAX_LINE_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+TRACEBACK_START = b"Traceback (most recent call last):"
+FAULT_START = b"Fatal Python error:"
+# "File ..., line N, in f" in tracebacks, "File ..., line N in f" in faulthandler dumps
+FRAME_PATTERN = re.compile(r'^\s*File "(?P<file>[^"]+)", line (?P<line>\d+),? in (?P<func>.+)$')
+MAX_BLOCK_LINES = 200
+
+
+@dataclass
+class CapturedTraceback:
+    """A traceback or faulthandler dump seen on a bot's stderr."""
+    kind: str
+    lines: list[str]
+    context: list[str]
+    finished_at: float
+
+    @property
+    def frames(self) -> list[tuple[str, int, str]]:
+        frames = []
+        for line in self.lines:
+            match = FRAME_PATTERN.match(line)
+            if match:
+                frames.append((match['file'], int(match['line']), match['func'].strip()))
+        # faulthandler lists the innermost call first, tracebacks last
+        return frames[::-1] if self.kind == 'fault' else frames
+
+    @property
+    def exception(self) -> tuple[str, str]:
+        """(exception type, message) from the final line, or the fatal error for a dump."""
+        if self.kind == 'fault':
+            return "FatalError", self.lines[0].partition(':')[2].strip()
+        last = self.lines[-1] if self.lines else ""
+        name, _, message = last.partition(':')
+        return name.strip() or "Exception", message.strip()
+
+
+class TracebackDetector:
+    """Follows a bot's raw stderr lines and keeps the tracebacks and fault dumps it prints.
+
+    A Python traceback runs from its ``Traceback`` header to the first
+    unindented line, the exception. A faulthandler dump runs from ``Fatal
+    Python error`` to the blank line after its stack. The log lines shown
+    before a block started are kept as its context.
+    """
+    def __init__(self, context: deque):
+        self.context = context
+        self.recent: deque[CapturedTraceback] = deque(maxlen=5)
+        self._kind: Optional[str] = None
+        self._lines: list[str] = []
+        self._context: list[str] = []
+
+    @property
+    def active(self) -> bool:
+        return self._kind is not None
+
+    def reset(self) -> None:
+        self.recent.clear()
+        self._kind = None
+
+    def _finish(self) -> None:
+        self.recent.append(CapturedTraceback(self._kind, self._lines, self._context, time.time()))
+        self._kind = None
+
+    def feed(self, raw: bytes) -> None:
+        if self._kind is None:
+            if raw.startswith(TRACEBACK_START) or raw.startswith(FAULT_START):
+                self._kind = 'traceback' if raw.startswith(TRACEBACK_START) else 'fault'
+                self._context = list(self.context)[-CRASH_CONTEXT_LINES:]
+                self._lines = [] if self._kind == 'traceback' else [raw.decode('utf-8', errors='ignore').strip()]
+            return
+
+        line = raw[:LOG_MAX_LINE_BYTES].decode('utf-8', errors='ignore').rstrip()
+        if self._kind == 'traceback':
+            self._lines.append(line)
+            if line and not line[0].isspace():
+                self._finish()
+        else:
+            # The dump is "error, blank, thread header, frames..., blank"
+            if not line and any(FRAME_PATTERN.match(l) for l in self._lines):
+                self._finish()
+                return
+            self._lines.append(line)
+        if self._kind and len(self._lines) >= MAX_BLOCK_LINES:
+            self._finish()
+
+    def flush(self) -> None:
+        """Closes a block cut off by the end of the stream."""
+        if self._kind is not None and self._lines:
+            self._finish()
+
+    def last(self, kind: str, since: float) -> Optional[CapturedTraceback]:
+        for captured in reversed(self.recent):
+            if captured.kind == kind and captured.finished_at >= since:
+                return captured
+        return None
+
+
+def _normalize_path(bot_id: str, path: str) -> tuple[str, bool]:
+    """Frame path without the release folder, so one crash keeps its fingerprint across deploys.
+
+    Also tells whether the frame is in the bot's own code.
+    """
+    for root in (os.path.abspath(os.path.join(BOTS_DIR, bot_id)), os.path.abspath(os.path.join(RELEASES_DIR, bot_id))):
+        if path.startswith(root + os.sep):
+            rest = path[len(root) + 1:]
+            # Inside the releases folder the first component is the release id
+            return (rest.split(os.sep, 1)[-1] if root.startswith(os.path.abspath(RELEASES_DIR)) else rest), True
+    if 'site-packages' in path:
+        return path.split('site-packages' + os.sep, 1)[-1], False
+    return os.path.join(*path.split(os.sep)[-2:]), False
+
+
+def _exit_description(exit_code: int) -> str:
+    if exit_code < 0:
+        try:
+            return f"signal {signal.Signals(-exit_code).name}"
+        except ValueError:
+            return f"signal {-exit_code}"
+    return f"exit {exit_code}"
+
+
+@dataclass
+class CrashGroup:
+    """All crashes of one bot that share a fingerprint, with the latest example."""
+    fingerprint: str
+    exc_type: str
+    message: str
+    location: str
+    count: int = 0
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    exit_code: int = 0
+    traceback: list[str] = field(default_factory=list)
+    context: list[str] = field(default_factory=list)
+    fault: list[str] = field(default_factory=list)
+
+
+class CrashStore:
+    """Grouped crash reports per bot, persisted as one JSON file per bot in CRASHES_DIR."""
+    def __init__(self, directory: str = CRASHES_DIR):
+        self.directory = directory
+        self._cache: dict[str, dict] = {}
+
+    def _path(self, bot_id: str) -> str:
+        return os.path.join(self.directory, f"{bot_id}.json")
+
+    def _load(self, bot_id: str) -> dict:
+        data = self._cache.get(bot_id)
+        if data is None:
+            data = {'groups': {}, 'recent': []}
+            try:
+                with open(self._path(bot_id), 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                data['groups'] = {fp: CrashGroup(**g) for fp, g in raw.get('groups', {}).items()}
+                data['recent'] = raw.get('recent', [])
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"Could not read crash reports of bot {bot_id}: {e}")
+            self._cache[bot_id] = data
+        return data
+
+    def _save(self, bot_id: str) -> None:
+        data = self._cache[bot_id]
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(bot_id) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'groups': {fp: asdict(g) for fp, g in data['groups'].items()}, 'recent': data['recent']},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self._path(bot_id))
+
+    def record(self, bot_id: str, exit_code: int, traceback: Optional[CapturedTraceback],
+               fault: Optional[CapturedTraceback], log_tail: list[str]) -> CrashGroup:
+        """Adds one crash to its group and returns the group."""
+        source = traceback or fault
+        if source is not None:
+            exc_type, message = source.exception
+            frames = [(*_normalize_path(bot_id, f), line, func) for f, line, func in source.frames]
+        else:
+            exc_type, message, frames = _exit_description(exit_code), "", []
+        # File and function, not line numbers, so small edits keep crashes in the same group
+        signature = exc_type + "|" + "|".join(f"{f}:{func}" for f, _, _, func in frames)
+        fingerprint = hashlib.sha1(signature.encode()).hexdigest()[:12]
+        # The innermost frame in the bot's own code, else the innermost one
+        shown = next((frame for frame in reversed(frames) if frame[1]), frames[-1] if frames else None)
+        location = f"{shown[0]}:{shown[2]} in {shown[3]}" if shown else ""
+
+        now = time.time()
+        data = self._load(bot_id)
+        group = data['groups'].get(fingerprint)
+        if group is None:
+            group = data['groups'][fingerprint] = CrashGroup(fingerprint, exc_type, message, location, first_seen=now)
+        group.count += 1
+        group.last_seen = now
+        group.exit_code = exit_code
+        group.message = message
+        group.location = location
+        group.traceback = traceback.lines if traceback else []
+        group.fault = fault.lines if fault else []
+        context = source.context if source else log_tail
+        group.context = context[-CRASH_CONTEXT_LINES:]
+        data['recent'] = (data['recent'] + [{'time': now, 'exit_code': exit_code, 'fingerprint': fingerprint}])[-CRASH_KEEP_RECENT:]
+        try:
+            self._save(bot_id)
+        except OSError as e:
+            logger.error(f"Could not save crash report of bot {bot_id}: {e}")
+        return group
+
+    def groups(self, bot_id: str) -> list[CrashGroup]:
+        return sorted(self._load(bot_id)['groups'].values(), key=lambda g: g.last_seen, reverse=True)
+
+    def get(self, bot_id: str, fingerprint: str) -> Optional[CrashGroup]:
+        return self._load(bot_id)['groups'].get(fingerprint)
+
+    def total(self, bot_id: str) -> int:
+        return sum(g.count for g in self._load(bot_id)['groups'].values())
+
+    def delete(self, bot_id: str) -> None:
+        self._cache.pop(bot_id, None)
+        try:
+            os.remove(self._path(bot_id))
+        except FileNotFoundError:
+            pass
+
+
+CRASHES = CrashStore()
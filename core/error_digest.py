@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+import logging
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from telegram import Bot, Update
+
+from config import ADMIN_ID, ERROR_DIGEST_INTERVAL, ERROR_DIGEST_WINDOW, ERROR_NOTIFY_PER_MINUTE
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass
+class ErrorEntry:
+    """Aggregated occurrences of one error fingerprint."""
+    fingerprint: str
+    error_type: str
+    location: str
+    first_seen: float
+    last_seen: float
+    example: str
+    context: str = ""
+    pending: int = 0
+    total: int = 0
+
+    def render(self) -> str:
+        first = datetime.fromtimestamp(self.first_seen).strftime('%H:%M:%S')
+        last = datetime.fromtimestamp(self.last_seen).strftime('%H:%M:%S')
+        header = "⚠️ خطأ جديد" if self.pending == self.total else "⚠️ ملخص خطأ متكرر"
+        text = f"{header}: {self.error_type}\n" \
+               f"الموقع: {self.location}\n" \
+               f"العدد: {self.pending} منذ آخر إشعار (الإجمالي: {self.total})\n" \
+               f"أول ظهور: {first} | آخر ظهور: {last}\n"
+        if self.context:
+            text += f"السياق: {self.context}\n"
+        return text + f"آخر مثال: {self.example[:500]}"
+
+
+def _location(error: BaseException) -> str:
+    """Innermost traceback frame inside the project, falling back to the innermost frame overall."""
+    frames = traceback.extract_tb(error.__traceback__) if error.__traceback__ else []
+    if not frames:
+        return "unknown"
+    own = [f for f in frames if f.filename.startswith(PROJECT_ROOT) and 'site-packages' not in f.filename]
+    frame = (own or frames)[-1]
+    filename = os.path.relpath(frame.filename, PROJECT_ROOT) if own else os.path.basename(frame.filename)
+    return f"{filename}:{frame.lineno} in {frame.name}"
+
+
+def _describe_update(update: object) -> str:
+    if isinstance(update, Update):
+        if update.callback_query and update.callback_query.data:
+            return f"زر {update.callback_query.data.split('|', 1)[0]}"
+        if update.effective_message:
+            return "رسالة" if not update.effective_message.document else "ملف مرفوع"
+    return ""
+
+
+class ErrorDigest:
+    """Groups exceptions by fingerprint and notifies the admin with one digest per fingerprint.
+
+    A new fingerprint is reported right away; repeats are counted and summarised
+    every ERROR_DIGEST_INTERVAL seconds. No more than ERROR_NOTIFY_PER_MINUTE
+    messages are sent in any 60 second window; the rest keep counting until a
+    later flush has budget for them.
+    """
+    def __init__(self):
+        self.entries: dict[str, ErrorEntry] = {}
+        self.sent: deque[float] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, error: BaseException, update: object = None) -> bool:
+        """Counts an exception; returns True if its fingerprint was not seen in the current window."""
+        now = time.time()
+        error_type = type(error).__name__
+        location = _location(error)
+        fingerprint = f"{error_type}@{location}"
+        entry = self.entries.get(fingerprint)
+        is_new = entry is None
+        if is_new:
+            entry = self.entries[fingerprint] = ErrorEntry(fingerprint, error_type, location, now, now, str(error))
+        entry.last_seen = now
+        entry.example = str(error) or error_type
+        entry.context = _describe_update(update)
+        entry.pending += 1
+        entry.total += 1
+        return is_new
+
+    def _budget(self, now: float) -> int:
+        while self.sent and now - self.sent[0] >= 60:
+            self.sent.popleft()
+        return ERROR_NOTIFY_PER_MINUTE - len(self.sent)
+
+    async def flush(self, bot: Bot, only_new: bool = False) -> int:
+        """Sends digests for fingerprints with unreported occurrences; returns the number sent.
+
+        With ``only_new`` just fingerprints never reported before are sent, so
+        repeats of known errors stay in the periodic digest.
+        """
+        if not ADMIN_ID:
+            return 0
+        async with self._flush_lock:
+            now = time.time()
+            pending = sorted((e for e in self.entries.values() if e.pending and (not only_new or e.pending == e.total)),
+                             key=lambda e: e.first_seen)
+            budget = self._budget(now)
+            sent = 0
+            for entry in pending[:max(budget, 0)]:
+                try:
+                    await bot.send_message(chat_id=ADMIN_ID, text=entry.render())
+                except Exception as e:
+                    logger.warning(f"Could not send error digest: {e}")
+                    break
+                self.sent.append(time.time())
+                entry.pending = 0
+                sent += 1
+            if len(pending) > sent:
+                logger.info(f"Error digest: {len(pending) - sent} fingerprints wait for the notification budget")
+            # Fingerprints quiet for a whole window start over as new errors
+            for fingerprint, entry in list(self.entries.items()):
+                if not entry.pending and now - entry.last_seen > ERROR_DIGEST_WINDOW:
+                    del self.entries[fingerprint]
+            return sent
+
+    def start(self, bot: Bot) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(bot))
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            await asyncio.sleep(ERROR_DIGEST_INTERVAL)
+            try:
+                await self.flush(bot)
+            except Exception as e:
+                logger.exception(f"Error digest flush failed: {e}")
+
+
+ERROR_DIGEST = ErrorDigest()
@@ -1,9 +1,18 @@
 import json
 import logging
+import secrets
 import threading
-from http.server import SimpleHTTPRequestHandler, HTTPServer
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
 from datetime import datetime
+from config import HEALTH_ADMIN_TOKEN, PROFILER_DEFAULT_SECONDS, PROFILER_DEFAULT_HZ
 from database.config_manager import get_config
+from core.metrics import HANDLER_METRICS
+from core.api_proxy import API_PROXY_METRICS
+from core.process_manager import ACTIVE_MANAGERS
+from core import log_capture, log_archive
+from core.sampling_profiler import profile, render_summary, ProfilerBusy
+from core.watchdog import WATCHDOG
 
 logger = logging.getLogger(__name__)
 
@@ -17,28 +26,72 @@ class HealthCheckHandler(SimpleHTTPRequestHandler):
             BOT_CONFIG = get_config()
             total_bots = len(BOT_CONFIG)
             running_bots = sum(1 for config in BOT_CONFIG.values() if config.get('status') == 'running')
+            hibernated_bots = sum(1 for config in BOT_CONFIG.values() if config.get('status') == 'hibernated')
             
             response = {
                 'status': 'healthy',
                 'timestamp': datetime.now().isoformat(),
                 'total_bots': total_bots,
                 'running_bots': running_bots,
+                'hibernated_bots': hibernated_bots,
                 'message': 'Bot Hosting Platform is running'
             }
             self.wfile.write(json.dumps(response).encode())
+        elif self.path == '/metrics':
+            log_stats = {bot_id: m.log_capture.stats for bot_id, m in list(ACTIVE_MANAGERS.items())}
+            archive_stats = {bot_id: m.log_archive.stats for bot_id, m in list(ACTIVE_MANAGERS.items()) if m.log_archive}
+            body = (HANDLER_METRICS.render_prometheus() + API_PROXY_METRICS.render_prometheus()
+                    + log_capture.render_prometheus(log_stats)
+                    + log_archive.render_prometheus(archive_stats) + WATCHDOG.render_prometheus()).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; version=0.0.4')
+            self.end_headers()
+            self.wfile.write(body)
+        elif urlsplit(self.path).path == '/debug/profile':
+            self._profile()
         else:
             self.send_response(404)
             self.send_header('Content-type', 'text/plain')
             self.end_headers()
             self.wfile.write(b'Not Found')
 
+    def _send_text(self, status: int, body: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-type', 'text/plain; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def _profile(self) -> None:
+        """Samples the control process; ``?seconds=&hz=&format=collapsed|top``, admin token required."""
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        # Bytes, since compare_digest raises TypeError on non-ASCII str and header values are latin-1 decoded
+        if not HEALTH_ADMIN_TOKEN or not secrets.compare_digest(token.encode(), HEALTH_ADMIN_TOKEN.encode()):
+            self._send_text(403, "Forbidden\n")
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        try:
+            seconds = float(query.get('seconds', [PROFILER_DEFAULT_SECONDS])[0])
+            hz = float(query.get('hz', [PROFILER_DEFAULT_HZ])[0])
+        except ValueError:
+            self._send_text(400, "seconds and hz must be numbers\n")
+            return
+        try:
+            # Runs in this request's own thread, so health checks keep being answered
+            result = profile(seconds, hz)
+        except ProfilerBusy as e:
+            self._send_text(409, f"{e}\n")
+            return
+        self._send_text(200, render_summary(result) if query.get('format', [''])[0] == 'top' else result.collapsed())
+
     def log_message(self, format, *args):
         logger.debug(f"Health check: {format % args}")
 
 def run_health_server(port: int = 8000):
     server_address = ('0.0.0.0', port)
     try:
-        httpd = HTTPServer(server_address, HealthCheckHandler)
+        # A request per thread: a running profile must not hold up health checks
+        httpd = ThreadingHTTPServer(server_address, HealthCheckHandler)
+        httpd.daemon_threads = True
         logger.info(f"Health check server started on port {port}")
         httpd.serve_forever()
     except Exception as e:
@@ -0,0 +1,97 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+import secrets
+from typing import Optional
+
+from config import WATCHDOG_ENABLED, WATCHDOG_SOCKET, WATCHDOG_HEARTBEAT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# The helper module hosted bots import lives here; the directory is put on their PYTHONPATH
+SDK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bot_sdk')
+
+
+def heartbeats_enabled() -> bool:
+    return WATCHDOG_ENABLED and hasattr(socket, 'AF_UNIX')
+
+
+class HeartbeatProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: 'HeartbeatServer'):
+        self.server = server
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.server.beat(data.strip().decode('ascii', 'replace'))
+
+
+class HeartbeatServer:
+    """Receives heartbeats of hosted bots on one Unix datagram socket.
+
+    Every start of a bot gets a fresh random token, passed in the bot's
+    environment with the socket path; a heartbeat is a datagram holding the
+    token, so beats from a previous process of the bot or from another bot
+    are ignored. A bot that never sends one is simply not tracked.
+    """
+    def __init__(self, path: str = WATCHDOG_SOCKET):
+        self.path = os.path.abspath(path)
+        self.tokens: dict[str, str] = {}
+        # bot_id -> time of the last heartbeat of the current process (monotonic)
+        self.last_beat: dict[str, float] = {}
+        self.beats = 0
+        self._transport: Optional[asyncio.DatagramTransport] = None
+
+    async def start(self) -> None:
+        if self._transport is not None:
+            return
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: HeartbeatProtocol(self), local_addr=self.path, family=socket.AF_UNIX
+        )
+        logger.info(f"Heartbeat socket listening on {self.path}")
+
+    async def stop(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def register(self, bot_id: str) -> dict[str, str]:
+        """New token for a bot about to start; returns the environment the helper module reads."""
+        token = secrets.token_hex(16)
+        for old, owner in list(self.tokens.items()):
+            if owner == bot_id:
+                del self.tokens[old]
+        self.tokens[token] = bot_id
+        self.last_beat.pop(bot_id, None)
+        return {
+            'HOSTING_HEARTBEAT_SOCKET': self.path,
+            'HOSTING_HEARTBEAT_TOKEN': token,
+            'HOSTING_HEARTBEAT_INTERVAL': str(WATCHDOG_HEARTBEAT_INTERVAL),
+        }
+
+    def unregister(self, bot_id: str) -> None:
+        for token, owner in list(self.tokens.items()):
+            if owner == bot_id:
+                del self.tokens[token]
+        self.last_beat.pop(bot_id, None)
+
+    def beat(self, token: str) -> None:
+        bot_id = self.tokens.get(token)
+        if bot_id is not None:
+            self.last_beat[bot_id] = time.monotonic()
+            self.beats += 1
+
+
+def heartbeat_env(bot_id: str, env: dict[str, str]) -> dict[str, str]:
+    """Heartbeat variables for a bot's environment, with the helper module's directory on PYTHONPATH."""
+    extra = HEARTBEATS.register(bot_id)
+    extra['PYTHONPATH'] = os.pathsep.join(p for p in (SDK_DIR, env.get('PYTHONPATH')) if p)
+    return extra
+
+
+HEARTBEATS = HeartbeatServer()
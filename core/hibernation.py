@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config import (
+    HIBERNATION_ENABLED, HIBERNATION_IDLE_SECONDS, HIBERNATION_CPU_THRESHOLD, HIBERNATION_LOG_LINES_PER_MIN,
+    HIBERNATION_CHECK_INTERVAL, HIBERNATION_MAX_SLEEP
+)
+from database.config_manager import get_config, save_config
+from core.cpu_scheduler import group_members
+from core.process_manager import ACTIVE_MANAGERS, get_manager
+from core.webhook_gateway import WEBHOOK_GATEWAY, gateway_enabled
+
+logger = logging.getLogger(__name__)
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_KB = (os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096) // 1024
+
+
+def hibernation_enabled() -> bool:
+    return HIBERNATION_ENABLED and os.path.isdir('/proc')
+
+
+def _rss_kb(pids: list[int]) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * _PAGE_KB
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+def next_wake(config: dict) -> Optional[float]:
+    """When a hibernated bot is due: HIBERNATION_MAX_SLEEP after it slept or its next daily wake time."""
+    slept_at = config.get('hibernated_at')
+    if not slept_at:
+        return None
+    due = [slept_at + HIBERNATION_MAX_SLEEP] if HIBERNATION_MAX_SLEEP else []
+    slept = datetime.fromtimestamp(slept_at)
+    for wake_time in config.get('hibernation_wake_times') or []:
+        try:
+            hour, minute = (int(part) for part in wake_time.split(':'))
+        except ValueError:
+            continue
+        candidate = slept.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= slept:
+            candidate += timedelta(days=1)
+        due.append(candidate.timestamp())
+    return min(due) if due else None
+
+
+@dataclass
+class IdleState:
+    pid: int
+    ticks: int
+    log_version: int
+    sampled_at: float
+    idle_since: float
+
+
+class HibernationManager:
+    """Puts opted-in bots to sleep when idle and wakes them on demand.
+
+    Every HIBERNATION_CHECK_INTERVAL seconds the CPU time of each running
+    opted-in bot's process group and its captured log lines are sampled.
+    A bot that stays under both thresholds for HIBERNATION_IDLE_SECONDS is
+    stopped with the status ``hibernated``. It is started again when an
+    update for it reaches the webhook gateway (which keeps the update queued
+    meanwhile), when the admin starts it, or when its wake time comes.
+    """
+    def __init__(self):
+        self.idle: dict[str, IdleState] = {}
+        self.hibernations = 0
+        self.reclaimed_kb = 0
+        self.wake_latencies: deque[tuple[str, float]] = deque(maxlen=100)
+        self._waking: dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            WEBHOOK_GATEWAY.hooks.append(self.on_activity)
+            if gateway_enabled():
+                # Routes are normally added when a bot starts; sleeping bots need theirs to be woken
+                for bot_id, config in get_config().items():
+                    if config.get('status') == 'hibernated' and config.get('webhook') and config.get('webhook_port'):
+                        WEBHOOK_GATEWAY.register(bot_id, config['webhook_port'], config['webhook_secret'])
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.on_activity in WEBHOOK_GATEWAY.hooks:
+            WEBHOOK_GATEWAY.hooks.remove(self.on_activity)
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(HIBERNATION_CHECK_INTERVAL)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.exception(f"Hibernation check failed: {e}")
+
+    def on_activity(self, bot_id: str) -> None:
+        if get_config().get(bot_id, {}).get('status') == 'hibernated':
+            self.wake_soon(bot_id, 'activity')
+
+    def wake_soon(self, bot_id: str, reason: str) -> asyncio.Task:
+        """Starts waking the bot once, however many triggers arrive meanwhile."""
+        task = self._waking.get(bot_id)
+        if task is None or task.done():
+            task = self._waking[bot_id] = asyncio.create_task(self.wake(bot_id, reason))
+        return task
+
+    async def wake(self, bot_id: str, reason: str) -> str:
+        """Starts a hibernated bot and records how long it took to come up."""
+        config = get_config().get(bot_id)
+        if not config or config.get('status') != 'hibernated':
+            return ""
+        started = time.perf_counter()
+        result = await get_manager(bot_id).start()
+        latency = time.perf_counter() - started
+        if config.get('status') == 'running':
+            self.wake_latencies.append((reason, latency))
+            config.pop('hibernated_at', None)
+            config.pop('hibernated_rss_kb', None)
+            save_config()
+            logger.info(f"Bot {bot_id} woke from hibernation ({reason}) in {latency:.2f}s")
+        return result
+
+    async def check(self) -> None:
+        """Samples activity of running opted-in bots, hibernates idle ones and wakes due ones."""
+        config_all = get_config()
+        now = time.time()
+        for bot_id, config in list(config_all.items()):
+            if config.get('status') == 'hibernated':
+                due = next_wake(config)
+                if due is not None and due <= now:
+                    self.wake_soon(bot_id, 'schedule')
+
+        candidates = {bot_id: m for bot_id, m in list(ACTIVE_MANAGERS.items())
+                      if config_all.get(bot_id, {}).get('hibernate') and m.process and m.process.returncode is None
+                      and config_all[bot_id].get('status') == 'running'}
+        for bot_id in set(self.idle) - set(candidates):
+            del self.idle[bot_id]
+        if not candidates:
+            return
+        members = await asyncio.to_thread(group_members, {m.process.pid for m in candidates.values()})
+        sampled_at = time.monotonic()
+        for bot_id, manager in candidates.items():
+            pid = manager.process.pid
+            group = members.get(pid) or []
+            ticks = sum(t for _, t in group)
+            state = self.idle.get(bot_id)
+            if state is None or state.pid != pid:
+                self.idle[bot_id] = IdleState(pid, ticks, manager.log_version, sampled_at, sampled_at)
+                continue
+            elapsed = sampled_at - state.sampled_at
+            if elapsed <= 0:
+                continue
+            cpu = (ticks - state.ticks) / _CLOCK_TICKS / elapsed
+            lines_per_min = (manager.log_version - state.log_version) / elapsed * 60
+            if cpu > HIBERNATION_CPU_THRESHOLD or lines_per_min > HIBERNATION_LOG_LINES_PER_MIN:
+                state.idle_since = sampled_at
+            state.ticks, state.log_version, state.sampled_at = ticks, manager.log_version, sampled_at
+            if sampled_at - state.idle_since >= HIBERNATION_IDLE_SECONDS:
+                await self.hibernate(bot_id, [p for p, _ in group])
+
+    async def hibernate(self, bot_id: str, pids: list[int]) -> None:
+        manager = ACTIVE_MANAGERS.get(bot_id)
+        if manager is None:
+            return
+        rss = await asyncio.to_thread(_rss_kb, pids)
+        await manager.hibernate()
+        self.idle.pop(bot_id, None)
+        config = get_config().get(bot_id, {})
+        if config.get('status') == 'hibernated':
+            config['hibernated_rss_kb'] = rss
+            save_config()
+            self.hibernations += 1
+            self.reclaimed_kb += rss
+            logger.info(f"Bot {bot_id} hibernated after {HIBERNATION_IDLE_SECONDS}s idle, reclaiming {rss} KB")
+
+    def render(self) -> str:
+        """Hibernation summary for the system status screen."""
+        config_all = get_config()
+        sleeping = [c for c in config_all.values() if c.get('status') == 'hibernated']
+        held = sum(c.get('hibernated_rss_kb', 0) for c in sleeping)
+        text = f"--- السبات ---\nبوتات نائمة: {len(sleeping)} | ذاكرة مستعادة حالياً: {held / 1024:.1f} MB\n" \
+               f"مرات السبات: {self.hibernations} (إجمالي {self.reclaimed_kb / 1024:.1f} MB)\n"
+        if self.wake_latencies:
+            latencies = sorted(latency for _, latency in self.wake_latencies)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            text += f"زمن الإيقاظ: p50 {p50:.2f}s | p95 {p95:.2f}s ({len(latencies)} إيقاظ)\n"
+        return text
+
+
+HIBERNATION = HibernationManager()
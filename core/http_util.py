@@ -0,0 +1,131 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Optional
+
+MAX_HEADER_LINES = 100
+REASONS = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 411: "Length Required", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 501: "Not Implemented", 502: "Bad Gateway", 503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """Malformed or oversized request; the connection is answered with ``status`` and closed."""
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or REASONS.get(status, ""))
+        self.status = status
+
+
+def _content_length(headers: dict[str, str], error_status: int) -> int:
+    # int() would also take '-5', ' 7' or '1_0'; anything but plain digits is a malformed message
+    value = headers.get('content-length', '0') or '0'
+    if not (value.isascii() and value.isdigit()):
+        raise HttpError(error_status, "Bad Content-Length")
+    return int(value)
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get('connection', '').lower() != 'close'
+
+
+async def read_request(reader: asyncio.StreamReader, max_body: int) -> Optional[HttpRequest]:
+    """Reads one HTTP/1.1 request; returns None when the peer closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, _ = line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    except ValueError:
+        raise HttpError(400, "Bad request line")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(400, "Too many headers")
+
+    # Bodies are only read by Content-Length; an encoded body left unread would be parsed as the next request
+    transfer_encoding = headers.get('transfer-encoding', '').lower()
+    if 'chunked' in transfer_encoding:
+        raise HttpError(411)
+    if transfer_encoding and transfer_encoding != 'identity':
+        raise HttpError(501, "Unsupported Transfer-Encoding")
+    length = _content_length(headers, 400)
+    if length > max_body:
+        raise HttpError(413)
+    body = await reader.readexactly(length) if length else b""
+    return HttpRequest(method.upper(), path, headers, body)
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, body: bytes = b"",
+                   headers: Optional[dict[str, str]] = None, keep_alive: bool = True) -> None:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}"]
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+
+
+def format_request(method: str, path: str, body: bytes = b"", headers: Optional[dict[str, str]] = None,
+                   host: str = "localhost") -> bytes:
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body
+
+
+async def read_response(reader: asyncio.StreamReader, max_body: int) -> tuple[int, dict[str, str], bytes]:
+    """Reads one HTTP/1.1 response with a Content-Length or chunked body."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionResetError("Connection closed before the response")
+    try:
+        status = int(line.split()[1])
+    except (IndexError, ValueError):
+        raise HttpError(502, "Bad status line")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        return status, headers, await _read_chunked(reader, max_body)
+    length = _content_length(headers, 502)
+    if length > max_body:
+        raise HttpError(502, "Response too large")
+    body = await reader.readexactly(length) if length else b""
+    return status, headers, body
+
+
+async def _read_chunked(reader: asyncio.StreamReader, max_body: int) -> bytes:
+    chunks, total = [], 0
+    while True:
+        try:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+        except ValueError:
+            raise HttpError(502, "Bad chunk size")
+        if size == 0:
+            # Trailer headers end with an empty line
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            return b"".join(chunks)
+        total += size
+        if total > max_body:
+            raise HttpError(502, "Response too large")
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
+
+from config import JOB_IO_WORKERS, JOB_CPU_WORKERS, JOB_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# نوع المهمة -> الاسم المعروض
+JOB_KINDS = {
+    'extract': "📦 استخراج ملف مضغوط",
+    'token_scan': "🔎 البحث عن التوكن",
+    'install': "📥 تثبيت ملفات البوت",
+    'preflight': "🧪 فحص ما قبل التشغيل",
+    'backup': "💾 نسخ احتياطي",
+    'restore': "♻️ استعادة نسخة",
+    'delete': "🗑 حذف ملفات",
+}
+
+JOB_STATUS_LABELS = {
+    'queued': "في الانتظار",
+    'running': "قيد التنفيذ",
+    'done': "اكتملت",
+    'failed': "فشلت",
+    'cancelled': "أُلغيت",
+}
+
+MAX_FINISHED_JOBS = 50
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's worker when the admin cancels it."""
+
+
+@dataclass
+class Job:
+    """A unit of heavy work tracked by the JobManager."""
+    job_id: str
+    kind: str
+    title: str
+    status: str = 'queued'
+    done: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def report(self, done: int, total: int, *_: Any) -> None:
+        """Progress callback for worker code; raises JobCancelled once cancellation was requested."""
+        self.done, self.total = done, total
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.job_id)
+
+    @property
+    def percent(self) -> Optional[int]:
+        return self.done * 100 // self.total if self.total else None
+
+    @property
+    def duration(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def render(self) -> str:
+        label = JOB_KINDS.get(self.kind, self.kind)
+        progress = f" {self.percent}%" if self.percent is not None else ""
+        status = JOB_STATUS_LABELS.get(self.status, self.status)
+        return f"{label}: {self.title}\n⏳ {status}{progress} — {self.duration:.1f}s"
+
+    def _execute(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        if self.cancel_event.is_set():
+            self.status = 'cancelled'
+            raise JobCancelled(self.job_id)
+        self.status = 'running'
+        self.started_at = time.time()
+        try:
+            result = fn(*args, **kwargs)
+            self.status = 'done'
+            return result
+        except JobCancelled:
+            self.status = 'cancelled'
+            raise
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            raise
+        finally:
+            self.finished_at = time.time()
+
+
+class JobManager:
+    """Runs heavy operations on bounded executors and reports their progress to Telegram."""
+    def __init__(self, io_workers: int = JOB_IO_WORKERS, cpu_workers: int = JOB_CPU_WORKERS):
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='job_io')
+        self.cpu_workers = cpu_workers
+        self._cpu_executor: Optional[ProcessPoolExecutor] = None
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self._ids = itertools.count(1)
+
+    @property
+    def cpu_executor(self) -> ProcessPoolExecutor:
+        """Process pool for hashing/compression; created on first use."""
+        if self._cpu_executor is None:
+            # spawn avoids forking a process that holds asyncio and thread state
+            self._cpu_executor = ProcessPoolExecutor(
+                max_workers=self.cpu_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._cpu_executor
+
+    def _register(self, kind: str, title: str) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(job_id=str(next(self._ids)), kind=kind, title=title)
+        self.jobs[job.job_id] = job
+        finished = [j for j in self.jobs.values() if not j.active]
+        for old in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self.jobs.pop(old.job_id, None)
+        return job
+
+    async def run(self, kind: str, title: str, fn: Callable, *args: Any, message: Optional[Message] = None,
+                  report_progress: bool = True, **kwargs: Any) -> Any:
+        """Runs fn(*args, **kwargs) as a tracked job in the I/O pool and returns its result.
+
+        With ``report_progress`` the worker receives ``progress=job.report``.
+        If ``message`` is given it is edited with the job's progress and a
+        cancel button at most once per JOB_PROGRESS_INTERVAL. CPU-heavy work
+        fans out to ``cpu_executor`` from inside the job, so it keeps progress
+        and cancellation.
+        """
+        job = self._register(kind, title)
+        loop = asyncio.get_running_loop()
+        if report_progress:
+            kwargs['progress'] = job.report
+        future = loop.run_in_executor(self.io_executor, job._execute, fn, args, kwargs)
+
+        reporter = asyncio.create_task(self._report_progress(job, message)) if message else None
+        try:
+            return await future
+        finally:
+            if reporter:
+                reporter.cancel()
+            logger.info(f"Job {job.job_id} ({kind}) {job.status} in {job.duration:.2f}s")
+
+    async def _report_progress(self, job: Job, message: Message) -> None:
+        last_text = None
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("✖️ إلغاء المهمة", callback_data=f"JOB_CANCEL|{job.job_id}")]])
+        while True:
+            await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+            text = job.render()
+            if text == last_text:
+                continue
+            last_text = text
+            try:
+                await message.edit_text(text, reply_markup=keyboard)
+            except Exception as e:
+                logger.debug(f"Could not update progress for job {job.job_id}: {e}")
+
+    def cancel(self, job_id: str) -> bool:
+        """Requests cancellation; the worker stops at its next progress report."""
+        job = self.jobs.get(job_id)
+        if not job or not job.active:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def list_jobs(self) -> list[Job]:
+        """Returns running jobs first, then recently finished ones, newest first."""
+        jobs = list(reversed(self.jobs.values()))
+        return [j for j in jobs if j.active] + [j for j in jobs if not j.active]
+
+
+JOB_MANAGER = JobManager()
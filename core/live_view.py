@@ -0,0 +1,168 @@
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Hashable, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from config import LIVE_TICK, LIVE_CHAT_MIN_INTERVAL, LIVE_GLOBAL_EDITS_PER_SEC, LIVE_VIEW_TTL
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LiveView:
+    """One auto-refreshing dashboard message.
+
+    ``version_fn`` returns a cheap fingerprint of the state the screen shows;
+    ``render_fn`` is awaited for (text, keyboard) and only runs when it
+    changed; blocking work such as walking directories belongs in a thread.
+    """
+    key: str
+    message: Message
+    version_fn: Callable[[], Hashable]
+    render_fn: Callable[[], Awaitable[tuple[str, InlineKeyboardMarkup]]]
+    opened_at: float = field(default_factory=time.monotonic)
+    version: Hashable = None
+    text: Optional[str] = None
+    dirty_since: Optional[float] = None
+    renders: int = 0
+    edits: int = 0
+
+
+class LiveViewScheduler:
+    """Re-renders open dashboards on state changes within a per-chat and a global edit budget.
+
+    There is at most one live view per chat. Changes between two ticks are
+    coalesced into one render, renders with identical text are not sent, a
+    chat is edited at most once per LIVE_CHAT_MIN_INTERVAL and all chats
+    together share a token bucket of LIVE_GLOBAL_EDITS_PER_SEC edits.
+    """
+    def __init__(self):
+        self.views: dict[int, LiveView] = {}
+        self.last_edit: dict[int, float] = {}
+        self.tokens = float(LIVE_GLOBAL_EDITS_PER_SEC)
+        self.paused_until = 0.0
+        self.skipped_identical = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def open(self, key: str, message: Message, version_fn: Callable[[], Hashable],
+             render_fn: Callable[[], Awaitable[tuple[str, InlineKeyboardMarkup]]], text: Optional[str] = None) -> None:
+        """Starts live mode for a message; ``text`` is what the message shows right now."""
+        chat_id = message.chat_id
+        self.views[chat_id] = LiveView(key, message, version_fn, render_fn, version=version_fn(), text=text)
+        self.last_edit.setdefault(chat_id, time.monotonic())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def close(self, chat_id: int, message_id: Optional[int] = None) -> bool:
+        view = self.views.get(chat_id)
+        if view is None or (message_id is not None and view.message.message_id != message_id):
+            return False
+        del self.views[chat_id]
+        logger.debug(f"Live view {view.key} closed after {view.renders} renders, {view.edits} edits")
+        return True
+
+    def on_callback(self, update, action) -> None:
+        """Router hook: any other button pressed on a live message ends live mode."""
+        message = update.callback_query.message
+        if message and action.name != 'LIVE':
+            self.close(message.chat_id, message.message_id)
+
+    def is_live(self, chat_id: int, message_id: int) -> bool:
+        view = self.views.get(chat_id)
+        return view is not None and view.message.message_id == message_id
+
+    def _refill(self, now: float, last: float) -> None:
+        self.tokens = min(float(LIVE_GLOBAL_EDITS_PER_SEC), self.tokens + (now - last) * LIVE_GLOBAL_EDITS_PER_SEC)
+
+    async def _run(self) -> None:
+        last = time.monotonic()
+        while self.views:
+            await asyncio.sleep(LIVE_TICK)
+            now = time.monotonic()
+            self._refill(now, last)
+            last = now
+            try:
+                await self._tick(now)
+            except Exception as e:
+                logger.exception(f"Live view tick failed: {e}")
+
+    async def _tick(self, now: float) -> None:
+        for chat_id, view in list(self.views.items()):
+            if now - view.opened_at > LIVE_VIEW_TTL:
+                self.close(chat_id)
+                continue
+            try:
+                version = view.version_fn()
+            except Exception as e:
+                self._fail(chat_id, view, e)
+                continue
+            if version != view.version:
+                view.version = version
+                view.dirty_since = view.dirty_since or now
+
+        if now < self.paused_until:
+            return
+        # Longest-waiting dashboards are served first when the global budget runs short
+        dirty = sorted((v for v in self.views.values() if v.dirty_since), key=lambda v: v.dirty_since)
+        edits = []
+        for view in dirty:
+            chat_id = view.message.chat_id
+            if now - self.last_edit.get(chat_id, 0.0) < LIVE_CHAT_MIN_INTERVAL:
+                continue
+            if self.tokens < 1:
+                break
+            view.dirty_since = None
+            view.renders += 1
+            try:
+                text, keyboard = await view.render_fn()
+            except Exception as e:
+                self._fail(chat_id, view, e)
+                continue
+            if text == view.text:
+                self.skipped_identical += 1
+                continue
+            self.tokens -= 1
+            self.last_edit[chat_id] = now
+            edits.append(self._edit(view, chat_id, text, keyboard, now))
+        # Edits of one tick go out together instead of one round trip after another
+        await asyncio.gather(*edits)
+
+    def _fail(self, chat_id: int, view: LiveView, error: Exception) -> None:
+        # The screen's subject is usually gone (e.g. a deleted bot); it would fail on every tick
+        if self.close(chat_id):
+            logger.warning(f"Live view {view.key} closed, rendering failed: {type(error).__name__}: {error}")
+
+    async def _edit(self, view: LiveView, chat_id: int, text: str, keyboard: InlineKeyboardMarkup, now: float) -> None:
+        try:
+            await view.message.edit_text(text, reply_markup=keyboard)
+            view.text = text
+            view.edits += 1
+        except RetryAfter as e:
+            # Flood control applies to the whole bot, so every view waits
+            retry = e.retry_after
+            self.paused_until = time.monotonic() + (retry.total_seconds() if hasattr(retry, 'total_seconds') else retry)
+            view.dirty_since = now
+            logger.warning(f"Live views paused for {e.retry_after}s by flood control")
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                view.text = text
+            else:
+                # Message deleted or no longer editable
+                self.close(chat_id)
+        except TelegramError as e:
+            logger.debug(f"Live view {view.key} edit failed: {e}")
+            view.dirty_since = now
+
+
+def live_toggle_button(screen: str, target: str, live: bool) -> InlineKeyboardButton:
+    """Button that turns live mode of a screen on, or off when it is already live."""
+    if live:
+        return InlineKeyboardButton("⏸ إيقاف التحديث المباشر", callback_data=f"LIVE_STOP|{screen}|{target}")
+    return InlineKeyboardButton("🔴 عرض مباشر", callback_data=f"LIVE|{screen}|{target}")
+
+
+LIVE_VIEWS = LiveViewScheduler()
@@ -0,0 +1,243 @@
+import os
+import json
+import lzma
+import zlib
+import time
+import shutil
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from config import (
+    LOG_ARCHIVE_DIR, LOG_ARCHIVE_CODEC, LOG_ARCHIVE_LEVEL, LOG_ARCHIVE_BLOCK_BYTES, LOG_ARCHIVE_SEGMENT_LINES,
+    LOG_ARCHIVE_SEGMENT_SECONDS, LOG_ARCHIVE_KEEP_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+CODECS = {
+    'zlib': (lambda data, level: zlib.compress(data, level), zlib.decompress),
+    'lzma': (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+INDEX_SUFFIX = '.idx'
+SEGMENT_SUFFIX = '.seg'
+
+# One writer thread for all bots: segments of a bot are written in order and
+# compression never competes with the event loop (zlib and lzma release the GIL)
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log_archive')
+
+
+@dataclass
+class ArchiveStats:
+    segments: int = 0
+    blocks: int = 0
+    raw_bytes: int = 0
+    compressed_bytes: int = 0
+    compress_seconds: float = 0.0
+    blocks_read: int = 0
+
+    @property
+    def ratio(self) -> float:
+        return self.raw_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Raw bytes compressed per second of compression time."""
+        return self.raw_bytes / self.compress_seconds if self.compress_seconds else 0.0
+
+
+@dataclass
+class ArchivedLine:
+    number: int
+    timestamp: float
+    text: str
+
+
+def _segment_name(first_ts: float, last_ts: float, first_line: int) -> str:
+    # The time range is in the name, so reads skip segments without opening their index
+    return f"{int(first_ts * 1000):013d}-{int(last_ts * 1000):013d}-{first_line}"
+
+
+def _parse_segment_name(name: str) -> tuple[float, float]:
+    first, last, _ = name.split('-', 2)
+    return int(first) / 1000, int(last) / 1000
+
+
+def write_segment(directory: str, first_line: int, entries: list[tuple[float, str]],
+                  codec: str = LOG_ARCHIVE_CODEC, level: int = LOG_ARCHIVE_LEVEL) -> dict:
+    """Writes ``entries`` as a segment of independently compressed blocks plus its index.
+
+    Blocks hold about LOG_ARCHIVE_BLOCK_BYTES of ``timestamp<TAB>line`` rows.
+    The index lists each block's offset, length, time range and first line
+    number; it is written last, so a segment without one is ignored.
+    """
+    compress = CODECS[codec][0]
+    name = _segment_name(entries[0][0], entries[-1][0], first_line)
+    os.makedirs(directory, exist_ok=True)
+    segment_path = os.path.join(directory, name + SEGMENT_SUFFIX)
+    blocks = []
+    offset = raw_total = 0
+    with open(segment_path + '.tmp', 'wb') as f:
+        start = 0
+        while start < len(entries):
+            rows, size, end = [], 0, start
+            while end < len(entries) and (size < LOG_ARCHIVE_BLOCK_BYTES or not rows):
+                row = f"{entries[end][0]:.3f}\t{entries[end][1]}\n".encode('utf-8', errors='replace')
+                rows.append(row)
+                size += len(row)
+                end += 1
+            data = compress(b"".join(rows), level)
+            f.write(data)
+            blocks.append({'offset': offset, 'length': len(data), 'raw': size, 'first_line': first_line + start,
+                           'lines': end - start, 'first_ts': entries[start][0], 'last_ts': entries[end - 1][0]})
+            offset += len(data)
+            raw_total += size
+            start = end
+    os.replace(segment_path + '.tmp', segment_path)
+
+    index = {'codec': codec, 'first_line': first_line, 'lines': len(entries), 'blocks': blocks}
+    index_path = os.path.join(directory, name + INDEX_SUFFIX)
+    with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.tmp', index_path)
+    return {'name': name, 'blocks': len(blocks), 'raw': raw_total, 'compressed': offset}
+
+
+class LogArchive:
+    """Compressed on-disk history of one bot's captured log lines.
+
+    Lines collect in memory and are handed to the archive thread as a
+    segment once LOG_ARCHIVE_SEGMENT_LINES are pending or the oldest is
+    LOG_ARCHIVE_SEGMENT_SECONDS old (checked as lines arrive), and when the
+    bot's output closes. Line numbers continue across segments and restarts.
+    """
+    def __init__(self, bot_id: str, root: str = LOG_ARCHIVE_DIR):
+        self.bot_id = bot_id
+        self.directory = os.path.join(root, bot_id)
+        self.stats = ArchiveStats()
+        self._pending: list[tuple[float, str]] = []
+        self._next_line: Optional[int] = None
+        self._stats_lock = threading.Lock()
+        self._deleted = False
+
+    def append(self, lines: list[str]) -> None:
+        now = time.time()
+        self._pending.extend((now, line) for line in lines)
+        if len(self._pending) >= LOG_ARCHIVE_SEGMENT_LINES or now - self._pending[0][0] >= LOG_ARCHIVE_SEGMENT_SECONDS:
+            self.rotate()
+
+    def rotate(self) -> Optional[Future]:
+        """Sends the pending lines to be compressed in the background."""
+        if not self._pending or self._deleted:
+            return None
+        entries, self._pending = self._pending, []
+        return _EXECUTOR.submit(self._write, entries)
+
+    def _write(self, entries: list[tuple[float, str]]) -> None:
+        try:
+            if self._next_line is None:
+                self._next_line = self._last_line()
+            started = time.perf_counter()
+            summary = write_segment(self.directory, self._next_line, entries)
+            elapsed = time.perf_counter() - started
+            self._next_line += len(entries)
+            with self._stats_lock:
+                self.stats.segments += 1
+                self.stats.blocks += summary['blocks']
+                self.stats.raw_bytes += summary['raw']
+                self.stats.compressed_bytes += summary['compressed']
+                self.stats.compress_seconds += elapsed
+            self._prune()
+        except Exception as e:
+            logger.exception(f"Could not archive logs of bot {self.bot_id}: {e}")
+
+    def _indexes(self) -> list[str]:
+        try:
+            return sorted(name[:-len(INDEX_SUFFIX)] for name in os.listdir(self.directory) if name.endswith(INDEX_SUFFIX))
+        except FileNotFoundError:
+            return []
+
+    def _last_line(self) -> int:
+        names = self._indexes()
+        if not names:
+            return 1
+        with open(os.path.join(self.directory, names[-1] + INDEX_SUFFIX), encoding='utf-8') as f:
+            index = json.load(f)
+        return index['first_line'] + index['lines']
+
+    def _prune(self) -> None:
+        cutoff = time.time() - LOG_ARCHIVE_KEEP_DAYS * 86400
+        for name in self._indexes():
+            if _parse_segment_name(name)[1] >= cutoff:
+                break
+            for suffix in (INDEX_SUFFIX, SEGMENT_SUFFIX):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def read_range(self, start_ts: float, end_ts: float, limit: Optional[int] = None,
+                   max_bytes: Optional[int] = None, newest: bool = False) -> list[ArchivedLine]:
+        """Archived lines captured between ``start_ts`` and ``end_ts``, oldest first.
+
+        Only the blocks whose time range overlaps the request are read and
+        decompressed. ``limit`` (lines) and ``max_bytes`` (text) cap the
+        result; with ``newest`` the range is read backwards, so the caps keep
+        its most recent part. Blocking; run it off the event loop.
+        """
+        lines: list[ArchivedLine] = []
+        size = 0
+        names = self._indexes()
+        for name in (reversed(names) if newest else names):
+            first_ts, last_ts = _parse_segment_name(name)
+            # Names round down to the millisecond
+            if last_ts < start_ts - 0.001 or first_ts > end_ts:
+                continue
+            with open(os.path.join(self.directory, name + INDEX_SUFFIX), encoding='utf-8') as f:
+                index = json.load(f)
+            decompress = CODECS[index['codec']][1]
+            blocks = index['blocks']
+            with open(os.path.join(self.directory, name + SEGMENT_SUFFIX), 'rb') as seg:
+                for block in (reversed(blocks) if newest else blocks):
+                    if block['last_ts'] < start_ts or block['first_ts'] > end_ts:
+                        continue
+                    seg.seek(block['offset'])
+                    rows = decompress(seg.read(block['length'])).decode('utf-8', errors='replace').split('\n')
+                    with self._stats_lock:
+                        self.stats.blocks_read += 1
+                    numbered = list(enumerate(rows[:block['lines']], block['first_line']))
+                    for number, row in (reversed(numbered) if newest else numbered):
+                        ts, _, text = row.partition('\t')
+                        if start_ts <= float(ts) <= end_ts:
+                            lines.append(ArchivedLine(number, float(ts), text))
+                            size += len(text) + 1
+                            if (limit and len(lines) >= limit) or (max_bytes and size >= max_bytes):
+                                return lines[::-1] if newest else lines
+        return lines[::-1] if newest else lines
+
+    def delete(self) -> None:
+        """Removes the bot's archive; lines arriving afterwards are not archived."""
+        self._deleted = True
+        self._pending = []
+        _EXECUTOR.submit(shutil.rmtree, self.directory, True)
+
+
+def flush_archives(archives: list[LogArchive], timeout: float = 30) -> None:
+    """Archives every pending line and waits for the writer; used at shutdown."""
+    futures = [future for future in (archive.rotate() for archive in archives) if future]
+    for future in futures:
+        future.result(timeout)
+
+
+def render_prometheus(stats: dict[str, ArchiveStats]) -> str:
+    """Per-bot archive counters in the Prometheus text exposition format."""
+    lines = ["# TYPE bot_log_archive_bytes_total counter", "# TYPE bot_log_archive_compress_seconds_total counter",
+             "# TYPE bot_log_archive_blocks_read_total counter"]
+    for bot_id, s in sorted(stats.items()):
+        lines.append(f'bot_log_archive_bytes_total{{bot="{bot_id}",kind="raw"}} {s.raw_bytes}')
+        lines.append(f'bot_log_archive_bytes_total{{bot="{bot_id}",kind="compressed"}} {s.compressed_bytes}')
+        lines.append(f'bot_log_archive_compress_seconds_total{{bot="{bot_id}"}} {s.compress_seconds:.6f}')
+        lines.append(f'bot_log_archive_blocks_read_total{{bot="{bot_id}"}} {s.blocks_read}')
+    return "\n".join(lines) + "\n"
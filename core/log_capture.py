@@ -0,0 +1,137 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from config import (
+    LOG_RATE_LINES_PER_SEC, LOG_RATE_BYTES_PER_SEC, LOG_BURST_SECONDS, LOG_OVERFLOW_MODE, LOG_SAMPLE_EVERY,
+    LOG_MAX_LINE_BYTES
+)
+from core.crash_analytics import TracebackDetector, TRACEBACK_START, FAULT_START
+
+
+@dataclass
+class LogLimits:
+    """Captured log volume allowed for one bot; a rate of 0 means unlimited."""
+    lines_per_sec: float = LOG_RATE_LINES_PER_SEC
+    bytes_per_sec: float = LOG_RATE_BYTES_PER_SEC
+    mode: str = LOG_OVERFLOW_MODE
+
+    @classmethod
+    def from_config(cls, bot_config: dict) -> 'LogLimits':
+        """Defaults from config.py overridden by the bot's own ``log_limits`` entry."""
+        overrides = bot_config.get('log_limits') or {}
+        return cls(**{k: v for k, v in overrides.items() if k in cls.__dataclass_fields__})
+
+    @property
+    def unlimited(self) -> bool:
+        return not self.lines_per_sec and not self.bytes_per_sec
+
+
+@dataclass
+class LogStats:
+    captured_lines: int = 0
+    captured_bytes: int = 0
+    dropped_lines: int = 0
+    dropped_bytes: int = 0
+    sampled_lines: int = 0
+
+
+class LogRateLimiter:
+    """Token buckets for lines and bytes, refilled continuously up to LOG_BURST_SECONDS of budget."""
+    def __init__(self, limits: LogLimits):
+        self.limits = limits
+        self.lines = limits.lines_per_sec * LOG_BURST_SECONDS
+        self.bytes = limits.bytes_per_sec * LOG_BURST_SECONDS
+        self.updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        limits = self.limits
+        self.lines = min(self.lines + elapsed * limits.lines_per_sec, limits.lines_per_sec * LOG_BURST_SECONDS)
+        self.bytes = min(self.bytes + elapsed * limits.bytes_per_sec, limits.bytes_per_sec * LOG_BURST_SECONDS)
+
+    @property
+    def exhausted(self) -> bool:
+        limits = self.limits
+        return (limits.lines_per_sec and self.lines < 1) or (limits.bytes_per_sec and self.bytes < 1)
+
+    def allow(self, size: int) -> bool:
+        if self.exhausted:
+            return False
+        # A line is let through while any byte budget is left, so one long line is never starved
+        self.lines -= 1
+        self.bytes -= size
+        return True
+
+
+class LogCapture:
+    """Turns raw output chunks of one bot into log lines within its rate limit.
+
+    Lines over the limit are never decoded: in ``drop`` mode they are only
+    counted, in ``sample`` mode one in LOG_SAMPLE_EVERY is kept and marked.
+    Counters survive restarts of the bot.
+    """
+    def __init__(self, limits: Optional[LogLimits] = None, detector: Optional[TracebackDetector] = None):
+        self.stats = LogStats()
+        self.set_limits(limits or LogLimits())
+        self.detector = detector
+        self._excess = 0
+
+    def set_limits(self, limits: LogLimits) -> None:
+        self.limits = limits
+        self.limiter = None if limits.unlimited else LogRateLimiter(limits)
+
+    def feed(self, data: bytes, prefix: str) -> tuple[list[str], bytes]:
+        """Splits ``data`` into lines; returns the accepted log lines and the unfinished last line."""
+        *complete, partial = data.split(b'\n')
+        if len(partial) > LOG_MAX_LINE_BYTES:
+            complete.append(partial)
+            partial = b""
+        detector = self.detector
+        if prefix == 'STDERR' and detector is not None and (
+                detector.active or TRACEBACK_START in data or FAULT_START in data):
+            # Tracebacks are followed before rate limiting, so a crash is recognised even in a flood
+            for raw in complete:
+                detector.feed(raw)
+        limiter = self.limiter
+        if limiter is not None:
+            limiter.refill()
+            if limiter.exhausted and self.limits.mode == 'drop':
+                # Nothing can pass: count the chunk without touching its lines
+                self.stats.dropped_lines += len(complete)
+                self.stats.dropped_bytes += len(data) - len(partial)
+                return [], partial
+
+        accepted = []
+        stats = self.stats
+        for raw in complete:
+            if limiter is None or limiter.allow(len(raw)):
+                stats.captured_lines += 1
+                stats.captured_bytes += len(raw)
+                line = raw[:LOG_MAX_LINE_BYTES].decode('utf-8', errors='ignore').strip()
+                if line:
+                    accepted.append(f"[{prefix}] {line}")
+                continue
+            self._excess += 1
+            if self.limits.mode == 'sample' and self._excess % LOG_SAMPLE_EVERY == 0:
+                stats.sampled_lines += 1
+                line = raw[:LOG_MAX_LINE_BYTES].decode('utf-8', errors='ignore').strip()
+                if line:
+                    accepted.append(f"[{prefix}] [عينة] {line}")
+            else:
+                stats.dropped_lines += 1
+                stats.dropped_bytes += len(raw)
+        return accepted, partial
+
+
+def render_prometheus(stats: dict[str, LogStats]) -> str:
+    """Per-bot log capture counters in the Prometheus text exposition format."""
+    lines = ["# TYPE bot_log_lines_total counter", "# TYPE bot_log_bytes_total counter"]
+    for bot_id, s in sorted(stats.items()):
+        lines.append(f'bot_log_lines_total{{bot="{bot_id}",outcome="captured"}} {s.captured_lines}')
+        lines.append(f'bot_log_lines_total{{bot="{bot_id}",outcome="sampled"}} {s.sampled_lines}')
+        lines.append(f'bot_log_lines_total{{bot="{bot_id}",outcome="dropped"}} {s.dropped_lines}')
+        lines.append(f'bot_log_bytes_total{{bot="{bot_id}",outcome="captured"}} {s.captured_bytes}')
+        lines.append(f'bot_log_bytes_total{{bot="{bot_id}",outcome="dropped"}} {s.dropped_bytes}')
+    return "\n".join(lines) + "\n"
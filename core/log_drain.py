@@ -0,0 +1,56 @@
+"""Keeps reading the output pipes of detached bots after the platform exits.
+
+Started by the shutdown coordinator in detach mode as ``python log_drain.py
+<directory> <max bytes> <bot_id>:<STDOUT|STDERR>:<fd>...`` with the read ends
+of the bots' pipes inherited. Without a reader a bot would fail on its next
+write once the platform is gone. Lines are appended to <directory>/<bot_id>.log
+until each bot has written <max bytes>; the rest is read and dropped. The
+drain exits when every pipe is closed, i.e. when the next platform start has
+replaced the detached bots. Standard library only, never imported.
+"""
+import os
+import sys
+import time
+import selectors
+
+
+def main() -> None:
+    directory, max_bytes = sys.argv[1], int(sys.argv[2])
+    os.makedirs(directory, exist_ok=True)
+    selector = selectors.DefaultSelector()
+    files, written, pending = {}, {}, {}
+    for spec in sys.argv[3:]:
+        bot_id, stream, fd = spec.rsplit(':', 2)
+        fd = int(fd)
+        if bot_id not in files:
+            files[bot_id] = open(os.path.join(directory, f"{bot_id}.log"), 'ab')
+            written[bot_id] = 0
+        pending[fd] = b""
+        selector.register(fd, selectors.EVENT_READ, (bot_id, stream.encode()))
+
+    while selector.get_map():
+        for key, _ in selector.select():
+            bot_id, stream = key.data
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                selector.unregister(key.fd)
+                os.close(key.fd)
+                lines, pending[key.fd] = [pending[key.fd]] if pending[key.fd] else [], b""
+            else:
+                *lines, pending[key.fd] = (pending[key.fd] + chunk).split(b'\n')
+            if written[bot_id] >= max_bytes:
+                continue
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S').encode()
+            data = b"".join(b"%s [%s] %s\n" % (stamp, stream, line) for line in lines)
+            written[bot_id] += len(data)
+            if written[bot_id] >= max_bytes:
+                data += b"... output limit reached, the rest is dropped\n"
+            files[bot_id].write(data)
+            files[bot_id].flush()
+
+    for f in files.values():
+        f.close()
+
+
+if __name__ == '__main__':
+    main()
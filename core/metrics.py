@@ -0,0 +1,185 @@
+import time
+import logging
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Optional
+
+from telegram import Update
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler
+from telegram.request import HTTPXRequest
+
+from core.router import CallbackRouter
+
+logger = logging.getLogger(__name__)
+
+# حدود مدرجات زمن الاستجابة (ثوانٍ)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Accumulates Bot API time for the handler invocation running in the current context
+_api_time: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar('api_time', default=None)
+
+
+@dataclass
+class HandlerStats:
+    """Latency histogram and counters for one handler key."""
+    count: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    total_time: float = 0.0
+    api_time: float = 0.0
+    max_time: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def observe(self, elapsed: float, api: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += failed
+        self.total_time += elapsed
+        self.api_time += api
+        self.max_time = max(self.max_time, elapsed)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    @property
+    def local_time(self) -> float:
+        return self.total_time - self.api_time
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound below which a fraction q of the calls finished."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            seen += self.buckets[index]
+            if seen >= target:
+                return bound
+        return self.max_time
+
+
+class HandlerMetrics:
+    """Registry of per-handler statistics, shared by the bot and the health server thread.
+
+    ``name`` and ``label`` set the Prometheus metric prefix and label, so the
+    same registry can hold other keyed latencies (e.g. per-bot API calls).
+    """
+    def __init__(self, name: str = "handler", label: str = "handler"):
+        self.name = name
+        self.label = label
+        self.stats: dict[str, HandlerStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> HandlerStats:
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats.setdefault(key, HandlerStats())
+        return stats
+
+    def started(self, key: str) -> None:
+        with self._lock:
+            self._get(key).in_flight += 1
+
+    def finished(self, key: str, elapsed: float, api: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._get(key)
+            stats.in_flight -= 1
+            stats.observe(elapsed, api, failed)
+
+    def snapshot(self) -> dict[str, HandlerStats]:
+        with self._lock:
+            return {key: HandlerStats(**vars(s) | {'buckets': list(s.buckets)}) for key, s in self.stats.items()}
+
+    def render_prometheus(self) -> str:
+        """Formats the statistics in the Prometheus text exposition format."""
+        n = self.name
+        lines = [
+            f"# TYPE {n}_latency_seconds histogram",
+            f"# TYPE {n}_api_seconds_total counter",
+            f"# TYPE {n}_errors_total counter",
+            f"# TYPE {n}_in_flight gauge",
+        ]
+        for key, s in sorted(self.snapshot().items()):
+            label = f'{self.label}="{key}"'
+            cumulative = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, s.buckets):
+                cumulative += bucket
+                lines.append(f'{n}_latency_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{n}_latency_seconds_bucket{{{label},le="+Inf"}} {s.count}')
+            lines.append(f'{n}_latency_seconds_sum{{{label}}} {s.total_time:.6f}')
+            lines.append(f'{n}_latency_seconds_count{{{label}}} {s.count}')
+            lines.append(f'{n}_api_seconds_total{{{label}}} {s.api_time:.6f}')
+            lines.append(f'{n}_errors_total{{{label}}} {s.errors}')
+            lines.append(f'{n}_in_flight{{{label}}} {s.in_flight}')
+        return "\n".join(lines) + "\n"
+
+
+HANDLER_METRICS = HandlerMetrics()
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that charges the duration of each Bot API call to the calling handler."""
+    async def do_request(self, *args, **kwargs):
+        acc = _api_time.get()
+        if acc is None:
+            return await super().do_request(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().do_request(*args, **kwargs)
+        finally:
+            acc[0] += time.perf_counter() - started
+
+
+def handler_key(update: object, fallback: str) -> str:
+    """Metric key for an update: the callback data prefix, or the handler's own name."""
+    if isinstance(update, Update) and update.callback_query and update.callback_query.data:
+        return update.callback_query.data.split('|', 1)[0]
+    return fallback
+
+
+def timed(callback: Callable, fallback: str) -> Callable:
+    """Wraps a handler callback to record its latency, errors and Bot API time."""
+    @wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        key = handler_key(update, fallback)
+        acc = [0.0]
+        token = _api_time.set(acc)
+        HANDLER_METRICS.started(key)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await callback(update, context, *args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            HANDLER_METRICS.finished(key, elapsed, min(acc[0], elapsed), failed)
+            _api_time.reset(token)
+    return wrapper
+
+
+def instrument_application(application: Application) -> None:
+    """Wraps the callback of every handler registered on the application."""
+    count = 0
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            router = getattr(handler.callback, '__self__', None)
+            if isinstance(router, CallbackRouter):
+                # Routes are wrapped individually so non-blocking ones are timed to completion
+                router.wrap_callbacks(timed)
+                count += len(router.routes)
+                continue
+            if isinstance(handler, CommandHandler):
+                fallback = "/" + "/".join(sorted(handler.commands))
+            elif isinstance(handler, CallbackQueryHandler):
+                fallback = f"callback:{handler.callback.__name__}"
+            else:
+                fallback = f"message:{handler.callback.__name__}"
+            handler.callback = timed(handler.callback, fallback)
+            count += 1
+    logger.info(f"Instrumented {count} handlers")
@@ -6,9 +6,24 @@ import logging
 import time
 import gc
 import signal
+from collections import deque
 from typing import Optional
 from database.config_manager import get_config, save_config
 from utils.file_utils import get_bot_path
+from core.webhook_gateway import (
+    WEBHOOK_GATEWAY, gateway_enabled, hosted_webhook_url, allocate_bot_port, new_webhook_secret
+)
+from core.api_proxy import API_PROXY, api_proxy_enabled, api_proxy_env
+from core.log_capture import LogCapture, LogLimits
+from core.crash_analytics import CRASHES, TracebackDetector
+from core.log_archive import LogArchive
+from core.cpu_scheduler import CPU_SCHEDULER, cpu_scheduler_enabled
+from core.bot_profiling import profile_args
+from core.heartbeat import HEARTBEATS, heartbeat_env, heartbeats_enabled
+from config import (
+    LOG_BUFFER_LINES, LOG_CAPTURE_CHUNK, CRASH_CONTEXT_LINES, CRASH_TRACEBACK_WINDOW, LOG_ARCHIVE_ENABLED,
+    CPU_DEFAULT_PRIORITY, PROFILE_RUN_MAX_SECONDS
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +35,64 @@ class BotProcessManager:
         self.config_all = get_config()
         self.config = self.config_all.get(bot_id, {})
         self.process: Optional[asyncio.subprocess.Process] = None
-        self.log_buffer: list[str] = []
+        self.log_buffer: deque[str] = deque(maxlen=LOG_BUFFER_LINES)
+        # حد معدل السجلات وعدادات الأسطر الملتقطة والمُسقطة
+        # تتبع الـ traceback في STDERR لتجميع الأعطال
+        self.crash_detector = TracebackDetector(self.log_buffer)
+        self.log_capture = LogCapture(LogLimits.from_config(self.config), self.crash_detector)
+        # الأرشيف المضغوط على القرص لما يتجاوز ذاكرة السجلات
+        self.log_archive = LogArchive(bot_id) if LOG_ARCHIVE_ENABLED else None
+        # يزداد مع كل سطر سجل جديد
+        self.log_version = 0
         self.log_task: Optional[asyncio.Task] = None
         self.monitor_task: Optional[asyncio.Task] = None
         self.start_time = self.config.get('start_time')
+        # (الوضع، ملف الإخراج) للتشغيلة التالية تحت المحلل؛ يُستهلك عند التشغيل فتعود التالية عادية
+        self.profile_mode: Optional[tuple[str, str]] = None
+        self.profiling = False
+        # يزداد مع كل تشغيل أو إيقاف، فتعرف المهام المؤجلة إن سبقها إجراء آخر
+        self.generation = 0
+        # Lifecycle actions on one bot run one at a time; identical pending actions are shared
+        self._action_lock = asyncio.Lock()
+        self._pending_actions: dict[str, asyncio.Future] = {}
+
+    async def _locked(self, fn) -> str:
+        async with self._action_lock:
+            return await fn()
+
+    async def _serialized(self, action: str, fn) -> str:
+        """Queues a lifecycle action behind the bot's lock, joining an identical one already pending."""
+        task = self._pending_actions.get(action)
+        if task is None:
+            task = asyncio.ensure_future(self._locked(fn))
+            self._pending_actions[action] = task
+            task.add_done_callback(lambda t: self._pending_actions.pop(action, None)
+                                   if self._pending_actions.get(action) is t else None)
+        else:
+            logger.info(f"Bot {self.bot_id}: joining pending {action}")
+        # A caller going away must not cancel an action other callers are waiting for
+        return await asyncio.shield(task)
+
+    @property
+    def busy(self) -> bool:
+        return self._action_lock.locked() or bool(self._pending_actions)
 
     async def start(self) -> str:
         """Starts the bot process."""
+        return await self._serialized('start', self._start)
+
+    async def stop(self) -> str:
+        """Stops the bot process."""
+        return await self._serialized('stop', self._stop)
+
+    async def restart(self) -> str:
+        """Restarts the bot process."""
+        return await self._serialized('restart', self._restart)
+
+    async def _start(self) -> str:
         if self.process and self.process.returncode is None:
             return "البوت قيد التشغيل بالفعل."
+        self.generation += 1
 
         try:
             bot_root = get_bot_path(self.bot_id)
@@ -74,9 +138,24 @@ class BotProcessManager:
             env['PYTHONUNBUFFERED'] = '1'
             # حاول تعطيل الوصول لـ GPU في البوت المستضاف إن لم يكن مطلوباً
             env.setdefault('CUDA_VISIBLE_DEVICES', '')
+            # faulthandler يطبع مكدس الاستدعاءات عند الانهيارات الصلبة (segfault وما شابه)
+            env.setdefault('PYTHONFAULTHANDLER', '1')
+            if gateway_enabled() and self.config.get('webhook'):
+                env.update(self._webhook_env())
+            if api_proxy_enabled():
+                # طلبات Bot API تمر عبر الوكيل المحلي المشترك بدلاً من اتصالات TLS خاصة بكل بوت
+                API_PROXY.register(self.bot_id, env['BOT_TOKEN'])
+                env.update(api_proxy_env())
+            if heartbeats_enabled():
+                # رمز نبضات جديد لكل تشغيل، ووحدة المساعدة hosting_heartbeat في مسار الاستيراد
+                env.update(heartbeat_env(self.bot_id, env))
 
             # استخدم وضع التشغيل غير المخبأ (-u) لتحسين إخراج السجلات الفوري
             args = [sys.executable, '-u', script_path]
+            if self.profile_mode:
+                # الغلاف يشغّل السكربت نفسه تحت المحلل دون تعديل ملفات البوت
+                args = profile_args(self.profile_mode[0], self.profile_mode[1], script_path)
+                self.profile_mode = None
 
             # استخدم setsid لبدء مجموعة عمليات جديدة حتى يسهل إيقافها لاحقاً
             preexec = None if os.name == 'nt' else os.setsid
@@ -89,6 +168,13 @@ class BotProcessManager:
                 env=env,
                 preexec_fn=preexec
             )
+            if cpu_scheduler_enabled():
+                # فئة الأولوية والأنوية تُطبق فوراً، قبل أن يبدأ البوت عمله أو ينشئ عمليات فرعية
+                try:
+                    await CPU_SCHEDULER.place(self.bot_id, self.process.pid,
+                                              self.config.get('priority', CPU_DEFAULT_PRIORITY))
+                except Exception as e:
+                    logger.warning(f"CPU placement failed for bot {self.bot_id}: {e}")
 
             self.config['status'] = 'starting'
             self.config['pid'] = self.process.pid
@@ -99,38 +185,64 @@ class BotProcessManager:
             # تنظيف الذاكرة
             gc.collect()
 
-            if self.log_task is None:
-                self.log_task = asyncio.create_task(self._capture_logs())
-            if self.log_task is None:
-                self.log_task = asyncio.create_task(self._capture_logs())
-            if self.monitor_task is None:
+            # المهام السابقة قد تكون انتهت مع العملية القديمة
+            # مهمة الالتقاط مرتبطة بالعملية؛ القديمة تنتهي وحدها عند إغلاق مخرجاتها
+            self.log_capture.set_limits(LogLimits.from_config(self.config))
+            self.crash_detector.reset()
+            self.log_task = asyncio.create_task(self._capture_logs(self.process))
+            if self.monitor_task is None or self.monitor_task.done():
                 self.monitor_task = asyncio.create_task(self._monitor_process())
 
             # تحقق قصير متزامن: انتظر لحظة صغيرة للتأكد من أن العملية لم تنهَر فوراً
             await asyncio.sleep(0.5)
             if self.process.returncode is not None:
                 # اجمع بعض رسائل الخطأ المبكرة إن وُجدت وأعد الحالة
-                stderr_text = ""
                 try:
-                    stderr = await self.process.stderr.read()
-                    if stderr:
-                        stderr_text = stderr.decode('utf-8', errors='ignore').strip()
-                except Exception:
+                    await asyncio.wait_for(asyncio.shield(self.log_task), timeout=1)
+                except asyncio.TimeoutError:
                     pass
+                stderr_text = "\n".join(line[len("[STDERR] "):] for line in list(self.log_buffer)[-30:]
+                                        if line.startswith("[STDERR] "))
 
                 self.config['status'] = 'crashed'
                 self.config['pid'] = None
                 save_config()
                 logger.error(f"Bot {self.bot_id} exited immediately with code {self.process.returncode}. Stderr: {stderr_text}")
-                return f"❌ فشل تشغيل البوت. خرجت العملية فوراً. رسالة الخطأ:
-{stderr_text[:800]}"
+                return f"❌ فشل تشغيل البوت. خرجت العملية فوراً. رسالة الخطأ:\n{stderr_text[:800]}"
+
+            self.config['status'] = 'running'
+            save_config()
+            logger.info(f"Bot {self.bot_id} started with PID {self.process.pid}")
+            return f"✅ تم تشغيل البوت بنجاح. PID: {self.process.pid}"
+        except Exception as e:
             logger.exception(f"Error starting bot {self.bot_id}: {e}")
             self.config['status'] = 'error'
             save_config()
             return "❌ فشل تشغيل البوت"
 
-    async def stop(self) -> str:
-        """Stops the bot process."""
+    def _webhook_env(self) -> dict[str, str]:
+        """Assigns the bot a local port and secret and registers it with the webhook gateway."""
+        if not self.config.get('webhook_port'):
+            used = {c.get('webhook_port') for c in self.config_all.values()}
+            self.config['webhook_port'] = allocate_bot_port(used)
+        self.config.setdefault('webhook_secret', new_webhook_secret())
+        save_config()
+        WEBHOOK_GATEWAY.register(self.bot_id, self.config['webhook_port'], self.config['webhook_secret'])
+        # البوت يشغّل خادم ويب هوك محلياً ويسجل WEBHOOK_URL لدى تلغرام
+        return {
+            'WEBHOOK_URL': hosted_webhook_url(self.bot_id),
+            'WEBHOOK_LISTEN': '127.0.0.1',
+            'WEBHOOK_PORT': str(self.config['webhook_port']),
+            'WEBHOOK_SECRET': self.config['webhook_secret'],
+        }
+
+    def _cancel_monitor(self) -> None:
+        if self.monitor_task and self.monitor_task is not asyncio.current_task():
+            self.monitor_task.cancel()
+        self.monitor_task = None
+
+    async def _stop(self) -> str:
+        self.generation += 1
         if self.process and self.process.returncode is None:
             try:
                 # محاولة إيقاف البوت بلطف أولاً
@@ -157,15 +269,14 @@ class BotProcessManager:
 
                 self.config['status'] = 'stopped'
                 self.config['pid'] = None
+                self._clear_hibernation()
                 save_config()
 
                 # إلغاء المهام الآمنة
                 if self.log_task:
                     self.log_task.cancel()
                     self.log_task = None
-                if self.monitor_task:
-                    self.monitor_task.cancel()
-                    self.monitor_task = None
+                self._cancel_monitor()
 
                 gc.collect()
 
@@ -174,46 +285,135 @@ class BotProcessManager:
                 logger.exception(f"Error stopping bot {self.bot_id}: {e}")
                 return "❌ فشل إيقاف البوت"
 
-        return "البوت متوقف بالفعل."
-
-    async def restart(self) -> str:
-        """Restarts the bot process."""
-        await self.stop()
+        # العملية انتهت لكن المراقب قد ينتظر إعادة تشغيل تلقائية بعد انهيار؛ الإيقاف يلغيها
+        status = self.config.get('status')
+        self._cancel_monitor()
+        if status in ('stopped', None):
+            return "البوت متوقف بالفعل."
+        self.config['status'] = 'stopped'
+        self.config['pid'] = None
+        self._clear_hibernation()
+        save_config()
+        if status == 'crashed':
+            return "⏹ تم إيقاف البوت وإلغاء إعادة التشغيل التلقائي."
+        return "⏹ تم إيقاف البوت بنجاح."
+
+    def _clear_hibernation(self) -> None:
+        # البوت الموقوف يدوياً لم يعد نائماً؛ _hibernate يعيد ضبطها بعد الإيقاف
+        self.config.pop('hibernated_at', None)
+        self.config.pop('hibernated_rss_kb', None)
+
+    async def hibernate(self) -> str:
+        """Stops an idle bot until it is woken."""
+        return await self._serialized('hibernate', self._hibernate)
+
+    async def _hibernate(self) -> str:
+        # الحالة 'hibernated' تميزه عن البوت الموقوف يدوياً فيُوقظ لاحقاً
+        result = await self._stop()
+        if self.config.get('status') == 'stopped':
+            self.config['status'] = 'hibernated'
+            self.config['hibernated_at'] = time.time()
+            save_config()
+        return result
+
+    async def profile(self, mode: str, seconds: float, output: str) -> str:
+        """Runs the bot under the profiler for up to ``seconds``, then back in normal mode.
+
+        The bot is (re)started through the profiling wrapper, which writes its
+        data to ``output``; the run ends early if the bot exits by itself.
+        Stopping the profiled process sends SIGTERM, so the wrapper still gets
+        to dump its stats. Afterwards a bot that was running is restarted
+        normally and one that was stopped is stopped again, unless a stop or
+        start came in meanwhile or the monitor is restarting a crash. The
+        action lock is only held for the start and stop, so the panel stays
+        usable meanwhile.
+        """
+        if self.profiling:
+            return "⏳ يوجد تحليل أداء قيد التشغيل لهذا البوت بالفعل."
+        self.profiling = True
+        try:
+            result, process, generation, was_running = await self._locked(lambda: self._begin_profile(mode, output))
+            if process is None:
+                return result
+            try:
+                await asyncio.wait_for(process.wait(), timeout=min(seconds, PROFILE_RUN_MAX_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            logger.info(f"Bot {self.bot_id}: {mode} profiling run finished")
+            return await self._locked(lambda: self._end_profile(process, generation, was_running))
+        finally:
+            self.profile_mode = None
+            self.profiling = False
+
+    async def _begin_profile(self, mode: str, output: str) -> tuple[str, Optional[asyncio.subprocess.Process], int, bool]:
+        # The generation is read under the lock, so any later stop or start is seen as newer
+        was_running = bool(self.process and self.process.returncode is None)
+        self.profile_mode = (mode, output)
+        result = await (self._restart() if was_running else self._start())
+        started = self.profile_mode is None and self.config.get('status') == 'running'
+        return result, self.process if started else None, self.generation, was_running
+
+    async def _end_profile(self, process: asyncio.subprocess.Process, generation: int, was_running: bool) -> str:
+        # Runs under the action lock, so no stop or start can slip in between the check and the restore
+        if self.generation != generation:
+            return "⚠️ انتهى تحليل الأداء؛ تُرك البوت على آخر إجراء نُفذ أثناءه."
+        if process.returncode not in (None, 0, -signal.SIGTERM, -signal.SIGKILL):
+            # المراقب يتولى البوت المنهار ويعيد تشغيله في الوضع العادي إن كانت إعادة التشغيل التلقائي مفعلة
+            if self.config.get('auto_restart', True):
+                return "⚠️ انهار البوت أثناء تحليل الأداء؛ ستتم إعادة تشغيله تلقائياً."
+            return "⚠️ انهار البوت أثناء تحليل الأداء."
+        if was_running:
+            await self._restart()
+        else:
+            await self._stop()
+        return "✅ انتهى تحليل الأداء وعاد البوت إلى وضعه الطبيعي."
+
+    async def _restart(self) -> str:
+        await self._stop()
         await asyncio.sleep(2)
-        return await self.start()
+        return await self._start()
 
-    async def _capture_logs(self) -> None:
-        """Captures stdout and stderr from the running process."""
+    async def _capture_logs(self, process: asyncio.subprocess.Process) -> None:
+        """Captures stdout and stderr of ``process`` until both are closed."""
         try:
-            while self.process and self.process.returncode is None:
-                try:
-                    # قراءة الأسطر بصبر قصير لتجنب حجب الحلقة
-                    stdout_line = await asyncio.wait_for(self.process.stdout.readline(), timeout=0.5)
-                    if stdout_line:
-                        line = stdout_line.decode('utf-8', errors='ignore').strip()
-                        if line:
-                            self.log_buffer.append(f"[STDOUT] {line}")
-
-                    stderr_line = await asyncio.wait_for(self.process.stderr.readline(), timeout=0.5)
-                    if stderr_line:
-                        line = stderr_line.decode('utf-8', errors='ignore').strip()
-                        if line:
-                            self.log_buffer.append(f"[STDERR] {line}")
-
-                    # تقليم الذاكرة الاحتياطية
-                    if len(self.log_buffer) > 500:
-                        self.log_buffer = self.log_buffer[-500:]
-                        gc.collect()
-
-                except asyncio.TimeoutError:
-                    await asyncio.sleep(0.05)
-                except asyncio.CancelledError:
+            await asyncio.gather(self._read_stream(process.stdout, "STDOUT"), self._read_stream(process.stderr, "STDERR"))
+        finally:
+            if self.log_archive:
+                self.log_archive.rotate()
+
+    async def _read_stream(self, stream: asyncio.StreamReader, prefix: str) -> None:
+        """Reads one output stream in chunks, keeping the lines the bot's log limit allows.
+
+        The stream is always drained, so a noisy bot never blocks on a full pipe;
+        the limiter decides how much of it is decoded and kept. After every
+        chunk the reader yields, so readers with pending output take turns
+        round-robin with each other and with the rest of the event loop.
+        """
+        partial = b""
+        try:
+            while True:
+                chunk = await stream.read(LOG_CAPTURE_CHUNK)
+                if not chunk:
                     break
-                except Exception as e:
-                    logger.exception(f"Log capture error for {self.bot_id}: {e}")
-                    await asyncio.sleep(1)
+                lines, partial = self.log_capture.feed(partial + chunk, prefix)
+                if lines:
+                    self.log_buffer.extend(lines)
+                    self.log_version += len(lines)
+                    if self.log_archive:
+                        self.log_archive.append(lines)
+                await asyncio.sleep(0)
+            if partial:
+                lines, _ = self.log_capture.feed(partial + b"\n", prefix)
+                self.log_buffer.extend(lines)
+                self.log_version += len(lines)
+                if self.log_archive and lines:
+                    self.log_archive.append(lines)
+            if prefix == "STDERR":
+                self.crash_detector.flush()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.exception(f"Unexpected error in _capture_logs: {e}")
+            logger.exception(f"Log capture error for {self.bot_id}: {e}")
 
     async def _monitor_process(self) -> None:
         """Monitors the process and handles auto-restart on crash."""
@@ -228,9 +428,12 @@ class BotProcessManager:
                 logger.warning(f"Bot {self.bot_id} crashed with code {return_code}. Attempting auto-restart.")
                 self.config['status'] = 'crashed'
                 save_config()
+                generation = self.generation
+                await self._record_crash(return_code)
                 await asyncio.sleep(5)
                 if self.config.get('auto_restart', True):
-                    await self.start()
+                    # بدون مشاركة الإجراء: إيقاف المستخدم يلغي إعادة التشغيل التلقائي بشكل نظيف
+                    await self._locked(lambda: self._auto_restart(generation))
             else:
                 self.config['status'] = 'stopped'
                 self.config['pid'] = None
@@ -243,9 +446,35 @@ class BotProcessManager:
         except Exception as e:
             logger.exception(f"Unexpected error in _monitor_process: {e}")
 
+    async def _auto_restart(self, generation: int) -> str:
+        # Runs under the action lock: a stop or start that got there first wins
+        if self.generation != generation or self.config.get('status') != 'crashed':
+            logger.info(f"Bot {self.bot_id}: auto-restart cancelled by a newer action")
+            return ""
+        # تُنشأ مهمة مراقبة جديدة للعملية الجديدة
+        self.monitor_task = None
+        return await self._start()
+
+    async def _record_crash(self, return_code: int) -> None:
+        """Files the crash under its fingerprint with the traceback seen shortly before the exit."""
+        exited_at = time.time()
+        try:
+            if self.log_task:
+                # The last stderr lines may still be in the pipe
+                try:
+                    await asyncio.wait_for(asyncio.shield(self.log_task), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+            since = exited_at - CRASH_TRACEBACK_WINDOW
+            group = CRASHES.record(self.bot_id, return_code, self.crash_detector.last('traceback', since),
+                                   self.crash_detector.last('fault', since), list(self.log_buffer)[-CRASH_CONTEXT_LINES:])
+            logger.warning(f"Bot {self.bot_id} crash {group.fingerprint}: {group.exc_type} ({group.count} times)")
+        except Exception as e:
+            logger.exception(f"Could not record crash of bot {self.bot_id}: {e}")
+
     def get_logs(self, limit: int = 50) -> str:
         """Returns the last N lines of the bot's logs."""
-        return "\n".join(self.log_buffer[-limit:])
+        return "\n".join(list(self.log_buffer)[-limit:])
 
     def get_uptime(self) -> str:
         """Returns the bot's uptime as a formatted string."""
@@ -277,10 +506,19 @@ def get_manager(bot_id: str) -> BotProcessManager:
 
 
 def delete_manager(bot_id: str):
+    WEBHOOK_GATEWAY.unregister(bot_id)
+    API_PROXY.unregister(bot_id)
+    HEARTBEATS.unregister(bot_id)
+    CRASHES.delete(bot_id)
+    CPU_SCHEDULER.forget(bot_id)
+    archive = LogArchive(bot_id)
     if bot_id in ACTIVE_MANAGERS:
         manager = ACTIVE_MANAGERS.pop(bot_id)
+        archive = manager.log_archive or archive
         try:
             if manager.process and manager.process.returncode is None:
                 asyncio.create_task(manager.stop())
         except Exception:
-            pass
\ No newline at end of file
+            pass
+    # السجلات المؤرشفة تُحذف مع البوت
+    archive.delete()
\ No newline at end of file
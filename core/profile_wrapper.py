@@ -0,0 +1,69 @@
+"""Runs a hosted bot's main script under a profiler.
+
+Started by BotProcessManager as ``python [-X importtime] profile_wrapper.py
+<cprofile|importtime> <output> <script> [args...]`` and never imported by the
+platform, so it only uses the standard library and leaves the bot's files as
+they are. The script runs as ``__main__`` with its own directory first on
+``sys.path``, as if it had been started directly.
+
+cprofile:   the main thread runs under cProfile; stats are dumped to
+            <output> when the script ends, crashes or gets SIGTERM.
+importtime: ``-X importtime`` lines written to stderr are moved into
+            <output>; all other stderr output still reaches the bot's log.
+"""
+import os
+import sys
+import runpy
+import signal
+import threading
+
+
+def _divert_import_times(output_path: str) -> None:
+    read_fd, write_fd = os.pipe()
+    original = os.dup(2)
+    # The interpreter writes import times to fd 2 directly, so the fd itself is swapped
+    os.dup2(write_fd, 2)
+    os.close(write_fd)
+
+    def pump() -> None:
+        pending = b""
+        with open(read_fd, 'rb', buffering=0) as source, open(output_path, 'ab') as report:
+            while True:
+                chunk = source.read(65536)
+                if not chunk:
+                    break
+                *lines, pending = (pending + chunk).split(b'\n')
+                for line in lines:
+                    if line.startswith(b'import time:'):
+                        report.write(line + b'\n')
+                    else:
+                        os.write(original, line + b'\n')
+                report.flush()
+
+    threading.Thread(target=pump, name='importtime', daemon=True).start()
+
+
+def main() -> None:
+    mode, output, script = sys.argv[1:4]
+    sys.argv = [script] + sys.argv[4:]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    # SIGTERM unwinds the bot like Ctrl+C, so the stats are still written
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    if mode == 'importtime':
+        _divert_import_times(output)
+        runpy.run_path(script, run_name='__main__')
+        return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = '|'
+
+
+class ActionError(ValueError):
+    """Raised when callback data does not match any registered action schema."""
+
+
+@dataclass(frozen=True)
+class Action:
+    """Callback data parsed once into its action name and named arguments."""
+    name: str
+    args: dict[str, str] = field(default_factory=dict)
+
+    def __getitem__(self, key: str) -> str:
+        return self.args[key]
+
+    def encode(self) -> str:
+        return SEPARATOR.join([self.name, *self.args.values()])
+
+
+@dataclass(frozen=True)
+class Route:
+    """Handler and argument schema for one action prefix.
+
+    The last parameter takes the rest of the data, so paths may contain the separator.
+    """
+    name: str
+    callback: Callable
+    params: tuple[str, ...] = ()
+    block: bool = True
+
+    def parse(self, rest: Optional[str]) -> Action:
+        if not self.params:
+            if rest is not None:
+                raise ActionError(f"{self.name} takes no arguments")
+            return Action(self.name)
+        values = rest.split(SEPARATOR, len(self.params) - 1) if rest is not None else []
+        if len(values) != len(self.params) or not all(values):
+            raise ActionError(f"{self.name} expects {SEPARATOR.join(self.params)}")
+        return Action(self.name, dict(zip(self.params, values)))
+
+
+class CallbackRouter:
+    """Dispatches every callback query through one handler and a dict keyed by action prefix."""
+    def __init__(self):
+        self.routes: dict[str, Route] = {}
+        # Called with (update, action) before every dispatch
+        self.hooks: list[Callable] = []
+
+    def register(self, name: str, callback: Callable, *params: str, block: bool = True) -> None:
+        if name in self.routes:
+            raise ValueError(f"Action {name} is already registered")
+        self.routes[name] = Route(name, callback, params, block)
+
+    def parse(self, data: str) -> Action:
+        name, sep, rest = data.partition(SEPARATOR)
+        route = self.routes.get(name)
+        if route is None:
+            raise ActionError(f"Unknown action: {name}")
+        return route.parse(rest if sep else None)
+
+    def wrap_callbacks(self, wrapper: Callable[[Callable, str], Callable]) -> None:
+        """Replaces every route callback with wrapper(callback, name)."""
+        for name, route in self.routes.items():
+            self.routes[name] = Route(name, wrapper(route.callback, name), route.params, route.block)
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        try:
+            action = self.parse(query.data or '')
+        except ActionError as e:
+            logger.warning(f"Rejected callback data {query.data!r}: {e}")
+            await query.answer("❌ إجراء غير معروف.", show_alert=True)
+            return
+
+        context.action = action
+        for hook in self.hooks:
+            hook(update, action)
+        route = self.routes[action.name]
+        if route.block:
+            await route.callback(update, context)
+        else:
+            # Same semantics as block=False on a CallbackQueryHandler
+            context.application.create_task(route.callback(update, context), update=update)
+
+    def handler(self) -> CallbackQueryHandler:
+        return CallbackQueryHandler(self.dispatch)
+
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+
+from config import PROFILER_MAX_SECONDS, PROFILER_MAX_HZ
+
+# Python leaf frames that mean the thread is blocked in a C call waiting, not working
+# (event loop selector, condition waits, idle executor workers)
+IDLE_LEAVES = ('select', 'poll', 'wait', 'accept', 'serve_forever', '_worker')
+MAX_STACK_DEPTH = 128
+
+_PROFILE_LOCK = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, 'co_qualname', code.co_name)
+    # Collapsed stacks separate frames with ';'
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+@dataclass
+class ProfileResult:
+    seconds: float
+    hz: float
+    samples: int = 0
+    sampling_seconds: float = 0.0
+    stacks: Counter = field(default_factory=Counter)
+    own: Counter = field(default_factory=Counter)
+    total: Counter = field(default_factory=Counter)
+    idle: Counter = field(default_factory=Counter)
+    threads: Counter = field(default_factory=Counter)
+
+    @property
+    def overhead(self) -> float:
+        """Share of the profiled time the sampler itself was running."""
+        return self.sampling_seconds / self.seconds if self.seconds else 0.0
+
+    def collapsed(self) -> str:
+        """``thread;outer;...;inner count`` lines, the input format of flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 15) -> list[tuple[str, int, int]]:
+        """(function, own samples, total samples) of the busiest functions, idle waits excluded."""
+        return [(label, count, self.total[label]) for label, count in self.own.most_common(limit)]
+
+
+def profile(seconds: float, hz: float) -> ProfileResult:
+    """Samples the stacks of every other thread of this process for ``seconds`` at ``hz`` per second.
+
+    Each tick takes one ``sys._current_frames()`` snapshot; no tracing hooks
+    are installed, so untouched threads run at full speed. Duration and
+    rate are capped by PROFILER_MAX_SECONDS and PROFILER_MAX_HZ, and only one
+    profile runs at a time. Blocking: call it from a thread of its own.
+
+    The sampler needs the GIL to take a snapshot, so bursts of work shorter
+    than the interpreter switch interval (5 ms) are under-counted; the long
+    stalls that make the bot sluggish are caught.
+    """
+    seconds = max(0.1, min(float(seconds), PROFILER_MAX_SECONDS))
+    hz = max(1.0, min(float(hz), PROFILER_MAX_HZ))
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        result = ProfileResult(seconds, hz)
+        me = threading.get_ident()
+        interval = 1.0 / hz
+        started = time.perf_counter()
+        deadline = started + seconds
+        next_tick = started
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if not labels:
+                    continue
+                thread = names.get(ident, f"thread-{ident}").replace(';', ',').replace(' ', '_')
+                labels.reverse()
+                result.stacks[";".join([thread] + labels)] += 1
+                result.threads[thread] += 1
+                leaf = labels[-1]
+                if leaf.split(' ', 1)[0].rsplit('.', 1)[-1] in IDLE_LEAVES:
+                    result.idle[thread] += 1
+                else:
+                    result.own[leaf] += 1
+                    for label in set(labels):
+                        result.total[label] += 1
+            result.samples += 1
+            result.sampling_seconds += time.perf_counter() - now
+            next_tick += interval
+            # A slow snapshot skips ticks instead of sampling in a burst to catch up
+            next_tick = max(next_tick, time.perf_counter())
+            time.sleep(max(0.0, min(next_tick, deadline) - time.perf_counter()))
+        result.seconds = time.perf_counter() - started
+        return result
+    finally:
+        _PROFILE_LOCK.release()
+
+
+def render_summary(result: ProfileResult, limit: int = 15) -> str:
+    """Plain-text report: sampling figures, time per thread and the top functions."""
+    lines = [f"samples: {result.samples} over {result.seconds:.1f}s at {result.hz:g} Hz "
+             f"(sampler overhead {result.overhead * 100:.2f}%)", "", "threads (busy / idle samples):"]
+    for thread, count in result.threads.most_common():
+        idle = result.idle[thread]
+        lines.append(f"  {thread}: {count - idle} / {idle}")
+    lines += ["", "top functions (own / total samples):"]
+    for label, own, total in result.top(limit):
+        lines.append(f"  {own:6d} {total:6d}  {label}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import logging
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+
+from config import (
+    SHUTDOWN_GRACE_SECONDS, SHUTDOWN_KILL_WAIT, SHUTDOWN_DETACH, SHUTDOWN_DRAIN_MAX_BYTES, LOG_ARCHIVE_DIR
+)
+from database.config_manager import get_config, save_config
+from core.process_manager import ACTIVE_MANAGERS, BotProcessManager, get_manager
+from core.log_archive import flush_archives
+
+logger = logging.getLogger(__name__)
+
+DRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'log_drain.py')
+DRAIN_DIR = os.path.join(LOG_ARCHIVE_DIR, 'detached')
+
+
+def _start_ticks(pid: int) -> Optional[int]:
+    """Process start time in clock ticks since boot, which tells a live bot from a reused pid."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return None if fields[0] == 'Z' else int(fields[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _signal_group(pid: int, sig: int) -> None:
+    try:
+        # Bots are started with setsid, so the group id is the bot's pid
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _can_release(process: asyncio.subprocess.Process) -> bool:
+    """Whether this asyncio still has the private subprocess internals _release relies on."""
+    transport = getattr(process, '_transport', None)
+    return transport is not None and hasattr(transport, '_proc') and hasattr(transport, 'get_pipe_transport')
+
+
+def _release(process: asyncio.subprocess.Process) -> dict[str, int]:
+    """Detaches asyncio from a running child and returns the fds of its output pipes.
+
+    asyncio keeps the pipes on the subprocess transport only, and closing the
+    transport (which happens at the latest when the loop is torn down) kills
+    a child that is still running, so the transport forgets the child.
+    """
+    transport = getattr(process, '_transport', None)
+    if transport is None:
+        return {}
+    fds = {}
+    for fd, stream in ((1, 'STDOUT'), (2, 'STDERR')):
+        pipe = transport.get_pipe_transport(fd)
+        pipe_file = pipe.get_extra_info('pipe') if pipe else None
+        if pipe_file:
+            # The loop stops reading, so nothing written from now on is lost in the platform's buffers
+            pipe.pause_reading()
+            fds[stream] = pipe_file.fileno()
+    transport._proc = None
+    return fds
+
+
+@dataclass
+class ShutdownReport:
+    mode: str
+    bots: int = 0
+    graceful: int = 0
+    killed: int = 0
+    detached: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return f"Shutdown ({self.mode}) of {self.bots} bots in {self.seconds:.2f}s: {self.graceful} exited on SIGTERM, " \
+               f"{self.killed} killed, {self.detached} left running"
+
+
+class ShutdownCoordinator:
+    """Brings the hosted bots down together when the platform exits.
+
+    In stop mode every bot's process group gets SIGTERM at the same moment
+    and the whole fleet shares one SHUTDOWN_GRACE_SECONDS deadline, after
+    which the groups still alive get SIGKILL. In detach mode the bots keep
+    running: their pipes are handed to a log drain process and their pids
+    recorded, and the next platform start replaces them with fresh processes.
+    Either way the bots keep the status ``running`` so ``restore`` starts them
+    again, and the log archives and the config file are written once at the
+    end, whatever the number of bots. Runs at most once per process.
+    """
+    def __init__(self):
+        self.last_report: Optional[ShutdownReport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def shutdown(self, detach: bool = SHUTDOWN_DETACH, grace: float = SHUTDOWN_GRACE_SECONDS) -> asyncio.Task:
+        if self._task is None:
+            self._task = asyncio.create_task(self._shutdown(detach, grace))
+        return self._task
+
+    async def _shutdown(self, detach: bool, grace: float) -> ShutdownReport:
+        started = time.perf_counter()
+        deadline = time.monotonic() + grace
+        managers = list(ACTIVE_MANAGERS.values())
+        running = [m for m in managers if m.process and m.process.returncode is None]
+        if detach and not all(_can_release(m.process) for m in running):
+            # Closing a transport that still owns its child kills it, so detaching half-way is worse than stopping
+            logger.warning("This Python's asyncio hides the subprocess internals detach mode needs; "
+                           "stopping the bots instead")
+            detach = False
+        report = ShutdownReport('detach' if detach else 'stop', bots=len(running))
+        # Monitors would save the config once per exiting bot and restart crashed ones
+        for manager in managers:
+            if manager.monitor_task:
+                manager.monitor_task.cancel()
+                manager.monitor_task = None
+
+        try:
+            if detach:
+                report.detached = await self._detach(running)
+            else:
+                await self._stop(running, deadline, report)
+        except Exception as e:
+            logger.exception(f"Shutdown of hosted bots failed: {e}")
+
+        try:
+            archives = [m.log_archive for m in managers if m.log_archive]
+            await asyncio.to_thread(flush_archives, archives, max(deadline - time.monotonic(), 1.0))
+        except Exception as e:
+            logger.error(f"Could not flush log archives at shutdown: {e}")
+        save_config()
+
+        report.seconds = time.perf_counter() - started
+        self.last_report = report
+        logger.info(report.summary())
+        return report
+
+    async def _stop(self, running: list[BotProcessManager], deadline: float, report: ShutdownReport) -> None:
+        for manager in running:
+            _signal_group(manager.process.pid, signal.SIGTERM)
+        waits = {asyncio.ensure_future(m.process.wait()): m for m in running}
+        if waits:
+            _, pending = await asyncio.wait(waits, timeout=max(deadline - time.monotonic(), 0))
+            report.graceful = len(waits) - len(pending)
+            report.killed = len(pending)
+            # Every group is killed, not only the slow leaders: children may outlive a leader that exited
+            for manager in running:
+                _signal_group(manager.process.pid, signal.SIGKILL)
+            if pending:
+                await asyncio.wait(pending, timeout=SHUTDOWN_KILL_WAIT)
+        # Readers reach EOF once the groups are gone and hand their last lines to the archive
+        log_tasks = [m.log_task for m in running if m.log_task]
+        if log_tasks:
+            await asyncio.wait(log_tasks, timeout=SHUTDOWN_KILL_WAIT)
+        for manager in running:
+            manager.config['pid'] = None
+            manager.log_task = None
+
+    async def _detach(self, running: list[BotProcessManager]) -> int:
+        specs = []
+        for manager in running:
+            manager.config['detached'] = {'pid': manager.process.pid, 'start_ticks': _start_ticks(manager.process.pid)}
+            specs += [(manager.bot_id, stream, fd) for stream, fd in _release(manager.process).items()]
+            # The pipes are paused now: readers consume what asyncio already read, keep a trailing partial line, then stop
+            for stream in (manager.process.stdout, manager.process.stderr):
+                if stream:
+                    stream.feed_eof()
+        log_tasks = [m.log_task for m in running if m.log_task]
+        if log_tasks:
+            _, pending = await asyncio.wait(log_tasks, timeout=SHUTDOWN_KILL_WAIT)
+            for task in pending:
+                task.cancel()
+        for manager in running:
+            manager.log_task = None
+        if specs:
+            # The drain outlives the platform in its own session, holding the inherited read ends
+            subprocess.Popen(
+                [sys.executable, DRAIN_SCRIPT, DRAIN_DIR, str(SHUTDOWN_DRAIN_MAX_BYTES)]
+                + [f"{bot_id}:{stream}:{fd}" for bot_id, stream, fd in specs],
+                pass_fds=[fd for _, _, fd in specs], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, start_new_session=True
+            )
+        logger.info(f"Detached {len(running)} bots; their output goes to {DRAIN_DIR}")
+        return len(running)
+
+    async def restore(self, grace: float = SHUTDOWN_GRACE_SECONDS) -> None:
+        """Starts the bots left running by the last shutdown, replacing those that were detached."""
+        config_all = get_config()
+        detached = {bot_id: config.pop('detached') for bot_id, config in config_all.items() if config.get('detached')}
+        alive = [record['pid'] for record in detached.values()
+                 if record.get('start_ticks') is not None and _start_ticks(record['pid']) == record['start_ticks']]
+        for pid in alive:
+            _signal_group(pid, signal.SIGTERM)
+        deadline = time.monotonic() + grace
+        while alive and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            alive = [pid for pid in alive if _start_ticks(pid) is not None]
+        for pid in alive:
+            _signal_group(pid, signal.SIGKILL)
+        if detached:
+            save_config()
+            logger.info(f"Replacing {len(detached)} bots detached by the last shutdown")
+
+        # A manager for a bot marked running starts it
+        for bot_id, config in list(config_all.items()):
+            if config.get('status') in ('running', 'starting') and bot_id not in ACTIVE_MANAGERS:
+                config['status'] = 'running'
+                get_manager(bot_id)
+
+
+SHUTDOWN = ShutdownCoordinator()
@@ -0,0 +1,143 @@
+import os
+import time
+import signal
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from config import WATCHDOG_TIMEOUT, WATCHDOG_FALLBACK_SECONDS, WATCHDOG_CHECK_INTERVAL, WATCHDOG_DUMP_WAIT
+from database.config_manager import get_config, save_config
+from core.cpu_scheduler import group_members
+from core.heartbeat import HEARTBEATS, heartbeats_enabled
+from core.process_manager import ACTIVE_MANAGERS, BotProcessManager
+
+logger = logging.getLogger(__name__)
+
+
+def watchdog_enabled() -> bool:
+    return heartbeats_enabled() and os.path.isdir('/proc')
+
+
+@dataclass
+class Activity:
+    pid: int
+    ticks: int
+    log_version: int
+    active_at: float
+
+
+class Watchdog:
+    """Restarts hosted bots that are alive but no longer working.
+
+    A bot that has sent a heartbeat since it started (see bot_sdk/
+    hosting_heartbeat.py) is hung once none has arrived for WATCHDOG_TIMEOUT
+    seconds. Bots without heartbeats that opted in with the ``watchdog`` key
+    fall back to a heuristic: hung once neither their process group's CPU
+    time nor their log has moved for WATCHDOG_FALLBACK_SECONDS. A spinning
+    bot burns CPU and escapes the fallback; only heartbeats catch it.
+
+    A hung bot gets SIGABRT first, so faulthandler (enabled for every bot)
+    prints every thread's stack; the dump lands in crash analytics with the
+    exit and the monitor restarts the bot. Detections are counted per bot in
+    its config (``watchdog_hangs``).
+    """
+    def __init__(self):
+        self.activity: dict[str, Activity] = {}
+        self.detections = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None or self._task.done():
+            await HEARTBEATS.start()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await HEARTBEATS.stop()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(WATCHDOG_CHECK_INTERVAL)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.exception(f"Watchdog check failed: {e}")
+
+    async def check(self) -> None:
+        config_all = get_config()
+        now = time.monotonic()
+        # Bots mid-action (starting, stopping, being profiled) are left alone
+        candidates = {bot_id: m for bot_id, m in list(ACTIVE_MANAGERS.items())
+                      if m.process and m.process.returncode is None and not m.busy and not m.profiling
+                      and config_all.get(bot_id, {}).get('status') == 'running'}
+        for bot_id in set(self.activity) - set(candidates):
+            del self.activity[bot_id]
+
+        hung = []
+        fallback = {bot_id: m for bot_id, m in candidates.items()
+                    if bot_id not in HEARTBEATS.last_beat and config_all[bot_id].get('watchdog')}
+        for bot_id in set(candidates) - set(fallback):
+            self.activity.pop(bot_id, None)
+            last = HEARTBEATS.last_beat.get(bot_id)
+            if last is not None and now - last > WATCHDOG_TIMEOUT:
+                hung.append((bot_id, f"no heartbeat for {now - last:.0f}s"))
+
+        if fallback:
+            members = await asyncio.to_thread(group_members, {m.process.pid for m in fallback.values()})
+            now = time.monotonic()
+            for bot_id, manager in fallback.items():
+                pid = manager.process.pid
+                ticks = sum(t for _, t in members.get(pid) or [])
+                state = self.activity.get(bot_id)
+                if state is None or state.pid != pid or ticks != state.ticks or manager.log_version != state.log_version:
+                    self.activity[bot_id] = Activity(pid, ticks, manager.log_version, now)
+                elif now - state.active_at > WATCHDOG_FALLBACK_SECONDS:
+                    hung.append((bot_id, f"no CPU time or log output for {now - state.active_at:.0f}s"))
+
+        for bot_id, reason in hung:
+            await self.recover(candidates[bot_id], reason)
+
+    async def recover(self, manager: BotProcessManager, reason: str) -> None:
+        bot_id = manager.bot_id
+        process = manager.process
+        self.detections += 1
+        self.activity.pop(bot_id, None)
+        HEARTBEATS.last_beat.pop(bot_id, None)
+        manager.config['watchdog_hangs'] = manager.config.get('watchdog_hangs', 0) + 1
+        save_config()
+        logger.warning(f"Bot {bot_id} is hung ({reason}); dumping its stacks and restarting it")
+        try:
+            os.kill(process.pid, signal.SIGABRT)
+            await asyncio.wait_for(process.wait(), timeout=WATCHDOG_DUMP_WAIT)
+        except (ProcessLookupError, asyncio.TimeoutError):
+            pass
+        # The monitor restarts crashed bots on its own unless auto-restart is off,
+        # or if the bot did not even die from SIGABRT
+        if manager.process is process and (process.returncode is None or not manager.config.get('auto_restart', True)):
+            await manager.restart()
+
+    def render(self) -> str:
+        """Watchdog summary for the system status screen."""
+        config_all = get_config()
+        watched = sum(1 for bot_id in ACTIVE_MANAGERS if bot_id in HEARTBEATS.last_beat
+                      or config_all.get(bot_id, {}).get('watchdog'))
+        hangs = sorted(((c.get('watchdog_hangs', 0), c.get('name', bot_id)) for bot_id, c in config_all.items()
+                        if c.get('watchdog_hangs')), reverse=True)
+        text = f"--- المراقبة ---\nبوتات مراقبة: {watched} (نبضات: {len(HEARTBEATS.last_beat)}) | " \
+               f"تعليقات مكتشفة منذ التشغيل: {self.detections}\n"
+        if hangs:
+            text += "الأكثر تعليقاً: " + ", ".join(f"{name} ×{count}" for count, name in hangs[:5]) + "\n"
+        return text
+
+    def render_prometheus(self) -> str:
+        lines = ["# TYPE bot_watchdog_hangs_total counter"]
+        for bot_id, config in sorted(get_config().items()):
+            lines.append(f'bot_watchdog_hangs_total{{bot="{bot_id}"}} {config.get("watchdog_hangs", 0)}')
+        return "\n".join(lines) + "\n"
+
+
+WATCHDOG = Watchdog()
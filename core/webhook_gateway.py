@@ -0,0 +1,237 @@
+import socket
+import asyncio
+import logging
+import secrets
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+from config import (
+    USE_WEBHOOK, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_URL, WEBHOOK_GATEWAY, WEBHOOK_BOT_PORT_BASE,
+    WEBHOOK_QUEUE_SIZE, WEBHOOK_MAX_BODY, WEBHOOK_FORWARD_TIMEOUT
+)
+from core.http_util import HttpError, HttpRequest, read_request, write_response, format_request, read_response
+
+logger = logging.getLogger(__name__)
+
+HOOK_PREFIX = '/hook/'
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+RETRY_DELAYS = (0.5, 1, 2, 5)
+
+
+@dataclass
+class BotRoute:
+    """Forwarding target and queue of one hosted bot."""
+    bot_id: str
+    port: int
+    secret: str
+    queue: asyncio.Queue
+    task: Optional[asyncio.Task] = None
+    delivered: int = 0
+    rejected: int = 0
+    retries: int = 0
+    last_error: Optional[str] = None
+
+
+@dataclass
+class QueuedUpdate:
+    path: str
+    body: bytes
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def gateway_enabled() -> bool:
+    return bool(USE_WEBHOOK and WEBHOOK_URL and WEBHOOK_GATEWAY)
+
+
+def hosted_webhook_url(bot_id: str) -> str:
+    """Public URL Telegram should post a hosted bot's updates to."""
+    parts = urlsplit(WEBHOOK_URL or '')
+    return f"{parts.scheme}://{parts.netloc}{HOOK_PREFIX}{bot_id}"
+
+
+def allocate_bot_port(used: set[int]) -> int:
+    """Lowest local port from WEBHOOK_BOT_PORT_BASE that no other bot uses and that is free."""
+    port = WEBHOOK_BOT_PORT_BASE
+    while True:
+        if port not in used:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                try:
+                    s.bind(('127.0.0.1', port))
+                    return port
+                except OSError:
+                    pass
+        port += 1
+
+
+def new_webhook_secret() -> str:
+    return secrets.token_urlsafe(24)
+
+
+class WebhookGateway:
+    """One HTTP listener for the platform and all hosted bots.
+
+    ``/hook/<bot_id>[/<path>]`` is queued for that bot and forwarded to
+    ``127.0.0.1:<port>/<path>`` where the bot runs its own webhook server.
+    Each bot has a bounded queue drained by one forwarder task, so updates
+    keep their order. A full queue answers 503 and Telegram redelivers later,
+    which is the backpressure. The platform's own path goes to
+    ``platform_handler`` instead.
+    """
+    def __init__(self, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT, queue_size: int = WEBHOOK_QUEUE_SIZE):
+        self.listen = listen
+        self.port = port
+        self.queue_size = queue_size
+        self.routes: dict[str, BotRoute] = {}
+        self.platform_path: Optional[str] = None
+        self.platform_handler: Optional[Callable[[bytes], Awaitable[None]]] = None
+        # Called with the bot id for every update accepted for a hosted bot
+        self.hooks: list[Callable[[str], None]] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def set_platform_handler(self, path: str, handler: Callable[[bytes], Awaitable[None]]) -> None:
+        self.platform_path = path if path.startswith('/') else f"/{path}"
+        self.platform_handler = handler
+
+    def register(self, bot_id: str, port: int, secret: str) -> None:
+        """Adds or updates a bot's forwarding target; queued updates are kept."""
+        route = self.routes.get(bot_id)
+        if route is None:
+            route = self.routes[bot_id] = BotRoute(bot_id, port, secret, asyncio.Queue(maxsize=self.queue_size))
+        route.port, route.secret = port, secret
+        if self._server is not None and (route.task is None or route.task.done()):
+            route.task = asyncio.create_task(self._forward_loop(route))
+
+    def unregister(self, bot_id: str) -> None:
+        route = self.routes.pop(bot_id, None)
+        if route and route.task:
+            route.task.cancel()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        for route in self.routes.values():
+            if route.task is None or route.task.done():
+                route.task = asyncio.create_task(self._forward_loop(route))
+        logger.info(f"Webhook gateway listening on {self.listen}:{self.port} for {len(self.routes)} hosted bots")
+
+    @property
+    def bound_port(self) -> Optional[int]:
+        """Actual listening port (useful when started with port 0)."""
+        if not self._server or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        tasks = [route.task for route in self.routes.values() if route.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, WEBHOOK_MAX_BODY)
+                except HttpError as e:
+                    write_response(writer, e.status, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, headers = await self._dispatch(request)
+                write_response(writer, status, headers=headers, keep_alive=request.keep_alive)
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: HttpRequest) -> tuple[int, Optional[dict]]:
+        if request.method != 'POST':
+            return 405, None
+        if request.path == self.platform_path and self.platform_handler:
+            try:
+                await self.platform_handler(request.body)
+            except ValueError as e:
+                logger.warning(f"Invalid update for the platform bot: {e}")
+                return 400, None
+            return 200, None
+        if not request.path.startswith(HOOK_PREFIX):
+            return 404, None
+
+        bot_id, _, rest = request.path[len(HOOK_PREFIX):].partition('/')
+        route = self.routes.get(bot_id)
+        if route is None:
+            return 404, None
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ''), route.secret):
+            return 403, None
+        try:
+            route.queue.put_nowait(QueuedUpdate(f"/{rest}", request.body, {SECRET_HEADER: route.secret}))
+        except asyncio.QueueFull:
+            route.rejected += 1
+            return 503, {"Retry-After": "1"}
+        for hook in self.hooks:
+            hook(bot_id)
+        return 200, None
+
+    async def _post(self, route: BotRoute, conn: list, item: QueuedUpdate) -> int:
+        """Posts one update over the route's keep-alive connection, reconnecting when needed."""
+        if conn[0] is None:
+            conn[0] = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', route.port), WEBHOOK_FORWARD_TIMEOUT)
+        reader, writer = conn[0]
+        try:
+            writer.write(format_request('POST', item.path, item.body,
+                                        {**item.headers, 'Content-Type': 'application/json'}))
+            await writer.drain()
+            status, headers, _ = await asyncio.wait_for(read_response(reader, WEBHOOK_MAX_BODY),
+                                                        WEBHOOK_FORWARD_TIMEOUT)
+        except BaseException:
+            writer.close()
+            conn[0] = None
+            raise
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+            conn[0] = None
+        return status
+
+    async def _forward_loop(self, route: BotRoute) -> None:
+        # One persistent connection per bot; a plain stream is much cheaper than a full HTTP client here
+        conn: list = [None]
+        try:
+            while True:
+                item = await route.queue.get()
+                attempt = 0
+                # The head of the queue is retried until the bot accepts it, keeping order
+                while True:
+                    try:
+                        status = await self._post(route, conn, item)
+                        if status < 500:
+                            route.delivered += 1
+                            if status >= 400:
+                                logger.warning(f"Bot {route.bot_id} rejected an update with {status}")
+                            break
+                        route.last_error = f"HTTP {status}"
+                    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HttpError) as e:
+                        route.last_error = type(e).__name__
+                    route.retries += 1
+                    await asyncio.sleep(RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)])
+                    attempt += 1
+                route.queue.task_done()
+        finally:
+            if conn[0] is not None:
+                conn[0][1].close()
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            bot_id: {'port': r.port, 'queued': r.queue.qsize(), 'delivered': r.delivered,
+                     'rejected': r.rejected, 'retries': r.retries, 'last_error': r.last_error}
+            for bot_id, r in self.routes.items()
+        }
+
+
+WEBHOOK_GATEWAY = WebhookGateway()
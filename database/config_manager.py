@@ -6,6 +6,8 @@ from config import CONFIG_FILE
 logger = logging.getLogger(__name__)
 
 BOT_CONFIG = {}
+# يزداد مع كل حفظ؛ تستخدمه الشاشات المباشرة لمعرفة تغير الحالة
+_config_version = 0
 
 def load_config():
     """Loads bot configuration from the JSON file."""
@@ -25,6 +27,8 @@ def load_config():
 
 def save_config():
     """Saves bot configuration to the JSON file."""
+    global _config_version
+    _config_version += 1
     try:
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(BOT_CONFIG, f, indent=4)
@@ -33,4 +37,7 @@ def save_config():
         logger.error(f"Error saving config: {e}")
 
 def get_config():
-    return BOT_CONFIG
\ No newline at end of file
+    return BOT_CONFIG
+
+def config_version() -> int:
+    return _config_version
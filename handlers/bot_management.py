@@ -1,28 +1,55 @@
 import os
+import gzip
+import time
 import shutil
 import zipfile
 import logging
 from datetime import datetime
+from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
 
-from config import BOTS_DIR, ADMIN_ID
+from config import (
+    BOTS_DIR, ADMIN_ID, LOG_LIMIT_PRESETS, CPU_PRIORITY_CLASSES, CPU_DEFAULT_PRIORITY, PROFILE_RUN_SECONDS,
+    PROFILE_IMPORTTIME_SECONDS, PREFLIGHT_ENABLED, PREFLIGHT_BLOCK_ON_ERRORS, LOG_EXPORT_MAX_LINES,
+    LOG_EXPORT_MAX_BYTES, LOG_EXPORT_PART_BYTES, LOG_EXPORT_GZIP_OVER
+)
 import tempfile
-import zipfile
 import asyncio
 from database.config_manager import get_config, save_config
 from core.process_manager import get_manager, delete_manager
-from utils.file_utils import get_bot_path, get_bot_size, create_backup, find_token_in_files
+from core.jobs import JOB_MANAGER, JobCancelled
+from core.live_view import live_toggle_button
+from core.webhook_gateway import gateway_enabled
+from core.api_proxy import API_PROXY, api_proxy_enabled
+from core.log_capture import LogLimits
+from core.crash_analytics import CRASHES
+from core.cpu_scheduler import CPU_SCHEDULER, PRIORITY_LABELS, cpu_scheduler_enabled
+from core.hibernation import HIBERNATION, hibernation_enabled, next_wake
+from core.bot_profiling import PROFILE_MODES, build_report
+from core.heartbeat import HEARTBEATS
+from core.watchdog import watchdog_enabled
+from utils.file_utils import get_bot_path, get_bot_size, find_token_candidates
+from utils.backup_store import create_backup
+from utils.zip_utils import extract_zip_streaming
+from utils.release_store import (
+    build_release, publish_release, hold_release, release_path, delete_bot_files, list_releases, current_release,
+    activate_release
+)
+from utils.preflight import run_preflight
 from handlers.start_handler import get_main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 
+STATUS_EMOJI = {'running': "🟢", 'stopped': "🔴", 'hibernated': "💤"}
+
 def get_bot_list_keyboard() -> InlineKeyboardMarkup:
     """Generates the list of hosted bots keyboard."""
     BOT_CONFIG = get_config()
     keyboard = []
     for bot_id, config in BOT_CONFIG.items():
-        status_emoji = "🟢" if config.get('status') == 'running' else "🔴"
+        status_emoji = STATUS_EMOJI.get(config.get('status'), "🔴")
         keyboard.append([
             InlineKeyboardButton(f"{status_emoji} {config.get('name', bot_id)}", callback_data=f"BOT_PANEL|{bot_id}")
         ])
@@ -45,31 +72,54 @@ async def bot_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         reply_markup=get_bot_list_keyboard()
     )
 
-def get_bot_panel_keyboard(bot_id: str) -> tuple[str, InlineKeyboardMarkup]:
-    """Generates the control panel for a specific bot."""
+def get_bot_panel_keyboard(bot_id: str, live: bool = False,
+                           bot_size: Optional[float] = None) -> tuple[str, InlineKeyboardMarkup]:
+    """Generates the control panel for a specific bot; ``bot_size`` (MB) is computed here if not given."""
     BOT_CONFIG = get_config()
     config = BOT_CONFIG.get(bot_id, {})
     status = config.get('status', 'stopped')
     name = config.get('name', bot_id)
-    status_emoji = "🟢" if status == 'running' else ("🔴" if status == 'stopped' else "🟡")
+    status_emoji = STATUS_EMOJI.get(status, "🟡")
     
     manager = get_manager(bot_id)
     uptime = manager.get_uptime()
-    bot_size = get_bot_size(bot_id)
+    if bot_size is None:
+        bot_size = get_bot_size(bot_id)
     
     keyboard = [
         [InlineKeyboardButton(f"📁 إدارة الملفات", callback_data=f"FILE_MANAGER|{bot_id}|.")],
         [InlineKeyboardButton(f"📄 عرض السجلات", callback_data=f"VIEW_LOGS|{bot_id}")],
         [InlineKeyboardButton(f"🔄 تحديث (إعادة تشغيل)", callback_data=f"RESTART_BOT|{bot_id}")],
         [InlineKeyboardButton(f"💾 نسخ احتياطي", callback_data=f"BACKUP_BOT|{bot_id}")],
+        [InlineKeyboardButton(f"🕘 الإصدارات", callback_data=f"RELEASES|{bot_id}")],
+        [InlineKeyboardButton(f"💥 الأعطال ({CRASHES.total(bot_id)})", callback_data=f"CRASHES|{bot_id}")],
+        [InlineKeyboardButton(f"🔬 تحليل الأداء", callback_data=f"PROFILE_MENU|{bot_id}")],
         [InlineKeyboardButton(f"🗑 حذف البوت", callback_data=f"DELETE_BOT_CONFIRM|{bot_id}")],
         [InlineKeyboardButton(f"⬅ رجوع", callback_data="BOT_LIST")]
     ]
     
     if status == 'running':
         keyboard.insert(0, [InlineKeyboardButton("⏹ إيقاف", callback_data=f"STOP_BOT|{bot_id}")])
+    elif status == 'hibernated':
+        # الإيقاف يخرج البوت من السبات نهائياً فلا يوقظه الجدول أو الطلبات الواردة
+        keyboard.insert(0, [InlineKeyboardButton("▶ إيقاظ", callback_data=f"START_BOT|{bot_id}"),
+                            InlineKeyboardButton("⏹ إيقاف", callback_data=f"STOP_BOT|{bot_id}")])
     else:
         keyboard.insert(0, [InlineKeyboardButton("▶ تشغيل", callback_data=f"START_BOT|{bot_id}")])
+    keyboard.insert(-1, [live_toggle_button("BOT_PANEL", bot_id, live)])
+    if hibernation_enabled():
+        label = "💤 السبات التلقائي: مفعل" if config.get('hibernate') else "💤 السبات التلقائي: معطل"
+        keyboard.insert(-1, [InlineKeyboardButton(label, callback_data=f"HIBERNATE_TOGGLE|{bot_id}")])
+    if watchdog_enabled():
+        label = "🐶 مراقبة التعليق: مفعلة" if config.get('watchdog') else "🐶 مراقبة التعليق: بالنبضات فقط"
+        keyboard.insert(-1, [InlineKeyboardButton(label, callback_data=f"WATCHDOG_TOGGLE|{bot_id}")])
+    if cpu_scheduler_enabled():
+        priority = config.get('priority', CPU_DEFAULT_PRIORITY)
+        keyboard.insert(-1, [InlineKeyboardButton(f"🎚 الأولوية: {PRIORITY_LABELS.get(priority, priority)}",
+                                                  callback_data=f"CPU_PRIORITY|{bot_id}")])
+    if gateway_enabled():
+        label = "🌐 الويب هوك: مفعل" if config.get('webhook') else "🌐 الويب هوك: معطل (Polling)"
+        keyboard.insert(-1, [InlineKeyboardButton(label, callback_data=f"WEBHOOK_TOGGLE|{bot_id}")])
         
     text = f"⚙️ لوحة تحكم البوت: **{name}**\n" \
            f"الحالة: {status_emoji} {status.upper()}\n" \
@@ -77,6 +127,25 @@ def get_bot_panel_keyboard(bot_id: str) -> tuple[str, InlineKeyboardMarkup]:
            f"PID: {config.get('pid', 'N/A')}\n" \
            f"وقت التشغيل: {uptime}\n" \
            f"حجم البوت: {bot_size:.2f} MB"
+    if status == 'hibernated':
+        slept = datetime.fromtimestamp(config.get('hibernated_at') or 0).strftime('%Y-%m-%d %H:%M')
+        text += f"\n💤 نائم منذ {slept} | ذاكرة مستعادة: {config.get('hibernated_rss_kb', 0) / 1024:.1f} MB"
+        due = next_wake(config)
+        if due:
+            text += f" | الإيقاظ: {datetime.fromtimestamp(due):%Y-%m-%d %H:%M}"
+    last_beat = HEARTBEATS.last_beat.get(bot_id)
+    if last_beat is not None or config.get('watchdog_hangs'):
+        text += "\n🐶 المراقبة: "
+        text += f"آخر نبضة قبل {time.monotonic() - last_beat:.0f}s" if last_beat is not None else "لا نبضات"
+        text += f" | مرات التعليق: {config.get('watchdog_hangs', 0)}"
+    placement = CPU_SCHEDULER.placements.get(bot_id)
+    if placement:
+        text += f"\nالمعالج: CPU {','.join(str(c) for c in placement.cpus)} | استهلاك {placement.usage * 100:.0f}%"
+    proxy = API_PROXY.stats(bot_id) if api_proxy_enabled() else None
+    if proxy:
+        text += f"\nطلبات Bot API: {proxy['requests']} (أخطاء: {proxy['errors']}) | " \
+                f"p50 {proxy['p50'] * 1000:.0f}ms p99 {proxy['p99'] * 1000:.0f}ms | " \
+                f"مؤجلة بالحد: {proxy['throttled']} | 429: {proxy['upstream_429']}"
            
     return text, InlineKeyboardMarkup(keyboard)
 
@@ -85,7 +154,7 @@ async def bot_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     
-    bot_id = query.data.split('|')[1]
+    bot_id = context.action['bot_id']
     BOT_CONFIG = get_config()
     
     if bot_id not in BOT_CONFIG:
@@ -104,7 +173,7 @@ async def handle_bot_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     
-    action, bot_id = query.data.split('|')
+    action, bot_id = context.action.name, context.action['bot_id']
     BOT_CONFIG = get_config()
 
     if bot_id not in BOT_CONFIG:
@@ -115,7 +184,9 @@ async def handle_bot_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     message = ""
     try:
-        if action == "START_BOT":
+        if action == "START_BOT" and BOT_CONFIG[bot_id].get('status') == 'hibernated':
+            message = await HIBERNATION.wake_soon(bot_id, 'admin')
+        elif action == "START_BOT":
             message = await manager.start()
         elif action == "STOP_BOT":
             message = await manager.stop()
@@ -194,19 +265,57 @@ async def handle_bot_file_upload(update: Update, context: ContextTypes.DEFAULT_T
         context.user_data['bot_name'] = file_name.replace('.py', '').replace('.zip', '')
         context.user_data['temp_dir'] = temp_dir
         
-        # فحص التوكن في خيط منفصل لتجنب حجب حلقة الأحداث
-        found_token = await asyncio.to_thread(find_token_in_files, temp_path)
+        # فحص التوكن كمهمة خلفية لتجنب حجب حلقة الأحداث
+        status_message = await message.reply_text("⏳ جاري معالجة الملف...")
+        if file_name.endswith('.zip'):
+            # استخراج الأرشيف مرة واحدة إلى مجلد تجهيز مع فحص التوكن أثناء القراءة
+            staging_dir = os.path.join(temp_dir, 'staging')
+            try:
+                candidates = await JOB_MANAGER.run(
+                    'extract', file_name, extract_zip_streaming, temp_path, staging_dir, message=status_message
+                )
+            except (zipfile.BadZipFile, JobCancelled) as e:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                context.user_data.pop('temp_bot_file', None)
+                context.user_data.pop('temp_dir', None)
+                if isinstance(e, JobCancelled):
+                    await status_message.edit_text("✖️ تم إلغاء معالجة الملف. يمكنك إرسال ملف آخر.")
+                else:
+                    await status_message.edit_text(f"❌ ملف ZIP تالف أو غير آمن: {e}\nيرجى إرسال ملف صحيح.")
+                return
+            # لم نعد بحاجة للأرشيف بعد استخراجه
+            os.remove(temp_path)
+            context.user_data['staging_dir'] = staging_dir
+        else:
+            candidates = await JOB_MANAGER.run(
+                'token_scan', file_name, find_token_candidates, temp_path, report_progress=False
+            )
+            # الملف المفرد يوضع في مجلد التجهيز ليُنشر كإصدار مثل الملفات المضغوطة
+            staging_dir = os.path.join(temp_dir, 'staging')
+            os.makedirs(staging_dir, exist_ok=True)
+            os.replace(temp_path, os.path.join(staging_dir, f"{context.user_data['bot_name']}.py"))
+            context.user_data['staging_dir'] = staging_dir
         
-        if found_token:
+        if candidates:
             context.user_data['state'] = 'AWAITING_BOT_TOKEN'
-            context.user_data['found_token'] = found_token
-            
+            context.user_data['found_token'] = candidates[0].token
+            context.user_data['found_tokens'] = [c.token for c in candidates]
+
+            # عرض التوكنات مخفية جزئياً مع أماكن ظهورها ليختار المسؤول بينها
+            lines = []
+            for i, candidate in enumerate(candidates[:10], start=1):
+                mark = "✅" if candidate.validated else "❔"
+                where = ", ".join(candidate.locations[:3])
+                lines.append(f"{i}. {mark} {candidate.masked()} — {where}")
+
             reply_text = (
                 f"✅ تم استقبال الملف: {file_name}\n"
-                f"✅ تم العثور على التوكن تلقائياً\n\n"
-                f"اختر:\n"
-                f"1️⃣ أرسل 'نعم' أو 'yes' لاستخدام التوكن المكتشف\n"
-                f"2️⃣ أرسل توكن مختلف إذا أردت تغييره"
+                f"✅ تم العثور على {len(candidates)} توكن محتمل:\n\n"
+                + "\n".join(lines) +
+                f"\n\nاختر:\n"
+                f"1️⃣ أرسل 'نعم' أو 'yes' لاستخدام التوكن الأول\n"
+                f"2️⃣ أرسل رقم التوكن من القائمة لاختياره\n"
+                f"3️⃣ أرسل توكن مختلف إذا أردت تغييره"
             )
             await message.reply_text(reply_text)
         else:
@@ -225,26 +334,42 @@ async def handle_bot_file_upload(update: Update, context: ContextTypes.DEFAULT_T
         except:
             pass
 
+def new_bot_config(name: str, token: str, bot_root: str) -> dict:
+    """Initial configuration entry of a newly uploaded bot."""
+    return {
+        'name': name,
+        'token': token,
+        'directory': bot_root,
+        'status': 'stopped',
+        'pid': None,
+        'auto_restart': True,
+        'created_at': datetime.now().isoformat()
+    }
+
 async def handle_bot_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles the bot token and finalizes deployment."""
     if context.user_data.get('state') != 'AWAITING_BOT_TOKEN':
         return
     
     try:
-        user_input = update.message.text.strip().lower()
-        temp_path = context.user_data.get('temp_bot_file')
+        raw_input = update.message.text.strip()
+        user_input = raw_input.lower()
+        staging_dir = context.user_data.get('staging_dir')
         bot_name = context.user_data.get('bot_name')
         found_token = context.user_data.get('found_token')
+        found_tokens = context.user_data.get('found_tokens', [])
         
-        if not temp_path:
+        if not staging_dir or not os.path.isdir(staging_dir):
             await update.message.reply_text("❌ حدث خطأ في عملية الرفع. يرجى البدء من جديد.", reply_markup=get_main_menu_keyboard())
             context.user_data.clear()
             return
         
         if found_token and user_input in ['نعم', 'yes', 'y', 'ن']:
             token = found_token
+        elif user_input.isdigit() and 1 <= int(user_input) <= len(found_tokens):
+            token = found_tokens[int(user_input) - 1]
         else:
-            token = user_input
+            token = raw_input
         
         # التحقق من صيغة التوكن
         try:
@@ -259,82 +384,73 @@ async def handle_bot_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         bot_id = token.split(':')[0]
         BOT_CONFIG = get_config()
         
-        if bot_id in BOT_CONFIG:
-            await update.message.reply_text("❌ البوت بهذا التوكن موجود بالفعل. يرجى استخدام توكن آخر", reply_markup=get_main_menu_keyboard())
-            if os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
-            context.user_data.clear()
-            return
-            
+        # البوت الموجود مسبقاً يحصل على إصدار جديد بدلاً من رفض الرفع
+        redeploy = bot_id in BOT_CONFIG
+        if redeploy and BOT_CONFIG[bot_id].get('token') != token:
+            BOT_CONFIG[bot_id]['token'] = token
         bot_root = get_bot_path(bot_id)
-        os.makedirs(bot_root, exist_ok=True)
-
-        # استخراج أو نقل الملفات بأمان داخل مجلد مؤقت ثم نقلها
-        temp_dir_for_upload = os.path.dirname(temp_path)
-        message_text = ""
+        status_message = await update.message.reply_text("⏳ جاري تجهيز إصدار جديد...")
+        stopped_for_switch = False
 
-        # تنفيذ عمليات الملفات الثقيلة في خيط منفصل لتجنب حجب الحلقة
-        def _install_files(src_path: str, dest_root: str, name: str) -> str:
-            # يعالج كل من ملف zip أو ملف py مفرد
-            if src_path.endswith('.zip'):
+        try:
+            # يُبنى الإصدار كاملاً في مجلد منفصل ثم يُبدَّل الرابط الرمزي دفعة واحدة
+            release_id = await JOB_MANAGER.run(
+                'install', bot_name, build_release, bot_id, staging_dir, message=status_message
+            )
+            preflight = None
+            if PREFLIGHT_ENABLED:
                 try:
-                    with zipfile.ZipFile(src_path, 'r') as zip_ref:
-                        for member in zip_ref.namelist():
-                            if member.startswith('/') or '..' in member:
-                                raise zipfile.BadZipFile('Unsafe zip member')
-                        extract_dir = tempfile.mkdtemp(prefix='extract_', dir=os.path.dirname(src_path))
-                        zip_ref.extractall(extract_dir)
-
-                    for root, dirs, files in os.walk(extract_dir):
-                        rel = os.path.relpath(root, extract_dir)
-                        target_dir = os.path.join(dest_root, rel) if rel != '.' else dest_root
-                        os.makedirs(target_dir, exist_ok=True)
-                        for f in files:
-                            src = os.path.join(root, f)
-                            dst = os.path.join(target_dir, f)
-                            shutil.move(src, dst)
-
-                    try:
-                        shutil.rmtree(extract_dir)
-                    except Exception:
-                        pass
-
-                    return f"✅ تم استخراج ملفات البوت {name} بنجاح."
-                except zipfile.BadZipFile:
+                    # الترجمة المسبقة تكتب __pycache__ داخل الإصدار فيقلع أسرع، وتكشف أخطاء الصياغة قبل أي تشغيل
+                    preflight = await JOB_MANAGER.run(
+                        'preflight', bot_name, run_preflight, release_path(bot_id, release_id),
+                        JOB_MANAGER.cpu_executor, message=status_message
+                    )
+                except JobCancelled:
                     raise
-            else:
-                dst_file = os.path.join(dest_root, f"{name}.py")
-                shutil.move(src_path, dst_file)
-                return f"✅ تم رفع ملف البوت {name} بنجاح."
-
-        try:
-            message_text = await asyncio.to_thread(_install_files, temp_path, bot_root, bot_name)
-        except zipfile.BadZipFile:
-            await update.message.reply_text("❌ ملف ZIP تالف أو يحتوي أسماء غير آمنة. يرجى إرسال ملف صحيح.")
-            if os.path.exists(bot_root):
-                shutil.rmtree(bot_root)
+                except Exception as e:
+                    logger.warning(f"Preflight of bot {bot_id} release {release_id} failed: {e}")
+            if preflight and not preflight.ok and PREFLIGHT_BLOCK_ON_ERRORS:
+                # يُحتفظ بآخر إصدار محجوب فقط حتى لا تتراكم الرفعات الفاشلة
+                await asyncio.to_thread(hold_release, bot_id, release_id)
+                await status_message.edit_text(
+                    f"⛔ لم يُفعَّل الإصدار {release_id} للبوت {bot_name} بسبب أخطاء الصياغة، "
+                    f"والإصدار الحالي باقٍ كما هو.\n\n{preflight.render()}\n"
+                    "صحح الأخطاء وأعد الرفع، أو فعّل الإصدار يدوياً من قائمة الإصدارات."
+                )
+                shutil.rmtree(context.user_data.get('temp_dir', staging_dir), ignore_errors=True)
+                context.user_data.clear()
+                if not redeploy:
+                    BOT_CONFIG[bot_id] = new_bot_config(bot_name, token, bot_root)
+                save_config()
+                return
+            # البوت العامل يُوقف قبل التبديل حتى تنتقل بياناته كاملة إلى الإصدار الجديد
+            if redeploy:
+                manager = get_manager(bot_id)
+                stopped_for_switch = bool(manager.process and manager.process.returncode is None)
+                if stopped_for_switch:
+                    await manager.stop()
+            await asyncio.to_thread(publish_release, bot_id, release_id)
+        except JobCancelled:
+            await status_message.edit_text("✖️ تم إلغاء النشر. لم يتغير الإصدار الحالي.")
+            shutil.rmtree(context.user_data.get('temp_dir', staging_dir), ignore_errors=True)
+            context.user_data.clear()
             return
         except Exception as e:
             logger.exception(f"Error installing files for bot {bot_id}: {e}")
-            if os.path.exists(bot_root):
-                shutil.rmtree(bot_root)
-            await update.message.reply_text(f"❌ فشل معالجة الملف: {e}")
+            if stopped_for_switch:
+                await get_manager(bot_id).start()
+            await status_message.edit_text(f"❌ فشل معالجة الملف: {e}")
             return
 
-        # حفظ إعدادات البوت
-        BOT_CONFIG[bot_id] = {
-            'name': bot_name,
-            'token': token,
-            'directory': bot_root,
-            'status': 'stopped',
-            'pid': None,
-            'auto_restart': True,
-            'created_at': datetime.now().isoformat()
-        }
+        if redeploy:
+            message_text = f"🚀 تم نشر الإصدار {release_id} للبوت {bot_name}."
+        else:
+            message_text = f"✅ تم نشر ملفات البوت {bot_name} بنجاح (الإصدار {release_id})."
+            # حفظ إعدادات البوت
+            BOT_CONFIG[bot_id] = new_bot_config(bot_name, token, bot_root)
         save_config()
+        if preflight:
+            message_text += f"\n{preflight.render()}"
         
         # cleanup temp dir if exists
         try:
@@ -348,7 +464,9 @@ async def handle_bot_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         # محاولة تشغيل البوت بشكل غير حاجِس لحلقة الأحداث
         try:
             manager = get_manager(bot_id)
-            start_task = asyncio.create_task(manager.start())
+            # الإصدار الجديد يحتاج إعادة تشغيل واحدة إن كان البوت يعمل
+            running = manager.process and manager.process.returncode is None
+            start_task = asyncio.create_task(manager.restart() if running else manager.start())
             # اعطِ عملية البدء فرصة قصيرة لاكتشاف فشل فوري
             await asyncio.sleep(0.1)
             if start_task.done():
@@ -385,13 +503,9 @@ async def handle_bot_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     except Exception as e:
         logger.error(f"Deployment error: {e}", exc_info=True)
         try:
-            if 'bot_root' in locals() and os.path.exists(bot_root):
-                shutil.rmtree(bot_root)
-        except:
-            pass
-        try:
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
+            tmp = context.user_data.get('temp_dir')
+            if tmp and os.path.exists(tmp):
+                shutil.rmtree(tmp)
         except:
             pass
         
@@ -403,36 +517,329 @@ async def handle_bot_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         context.user_data.clear()
 
 async def backup_bot_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Creates a backup of the bot."""
+    """Creates an incremental backup of the bot off the event loop, reporting progress."""
     query = update.callback_query
     await query.answer("جاري إنشاء النسخة الاحتياطية...")
     
-    bot_id = query.data.split('|')[1]
+    bot_id = context.action['bot_id']
     BOT_CONFIG = get_config()
     
     if bot_id not in BOT_CONFIG:
         await query.edit_message_text("❌ البوت غير موجود.")
         return
-    
-    backup_path = create_backup(bot_id)
-    
-    if backup_path:
-            await query.edit_message_text(
-                text=f"✅ تم إنشاء نسخة احتياطية بنجاح.\nالمسار: {backup_path}",
-                reply_markup=get_bot_list_keyboard()
-            )
+
+    name = BOT_CONFIG[bot_id].get('name', bot_id)
+    try:
+        # التجزئة والضغط تتم في مجمع العمليات، والتقدم يظهر في نفس الرسالة
+        manifest = await JOB_MANAGER.run(
+            'backup', name, create_backup, bot_id, executor=JOB_MANAGER.cpu_executor, message=query.message
+        )
+    except JobCancelled:
+        await query.edit_message_text(
+            text="✖️ تم إلغاء النسخ الاحتياطي.",
+            reply_markup=get_bot_list_keyboard()
+        )
+        return
+    except Exception as e:
+        # أعطال مجمع العمليات (BrokenProcessPool وغيرها) تصل هنا بدل معالج الأخطاء العام
+        logger.exception(f"Backup of bot {bot_id} failed: {e}")
+        manifest = None
+
+    if manifest:
+        await query.edit_message_text(
+            text=f"✅ تم إنشاء نسخة احتياطية بنجاح.\n"
+                 f"المعرّف: {manifest['backup_id']}\n"
+                 f"الملفات: {len(manifest['files'])} | الحجم: {manifest['total_size'] / (1024 * 1024):.2f} MB\n"
+                 f"بيانات جديدة مخزنة: {manifest['stored_bytes'] / (1024 * 1024):.2f} MB",
+            reply_markup=get_bot_list_keyboard()
+        )
     else:
         await query.edit_message_text(
             text="❌ فشل إنشاء النسخة الاحتياطية.",
             reply_markup=get_bot_list_keyboard()
         )
 
+async def releases_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lists the bot's deployed releases and offers switching (rollback) to an older one."""
+    query = update.callback_query
+    await query.answer()
+
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG:
+        await query.edit_message_text("❌ البوت غير موجود.")
+        return
+
+    releases = await asyncio.to_thread(list_releases, bot_id)
+    active = current_release(bot_id)
+    keyboard = []
+    if not releases:
+        text = "🕘 لا توجد إصدارات محفوظة لهذا البوت بعد (ستُنشأ مع النشر القادم)."
+    else:
+        text = f"🕘 إصدارات البوت {BOT_CONFIG[bot_id].get('name', bot_id)} (اختر إصداراً للتبديل إليه):"
+        for release in releases:
+            release_id = release['release_id']
+            if release_id == active:
+                label = f"✅ {release_id} (الحالي)"
+            elif release.get('held'):
+                label = f"⛔ {release_id} — لم يُفعَّل (أخطاء صياغة)"
+            else:
+                label = f"↩️ {release_id} — {release.get('files', 0)} ملف"
+            keyboard.append([InlineKeyboardButton(label, callback_data=f"RELEASE_ACTIVATE|{bot_id}|{release_id}")])
+    keyboard.append([InlineKeyboardButton("⬅ رجوع", callback_data=f"BOT_PANEL|{bot_id}")])
+
+    await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def release_activate_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switches the live symlink to the chosen release and restarts the bot once if it is running."""
+    query = update.callback_query
+    bot_id, release_id = context.action['bot_id'], context.action['release_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG:
+        await query.answer()
+        await query.edit_message_text("❌ البوت غير موجود.")
+        return
+    if release_id == current_release(bot_id):
+        await query.answer("هذا هو الإصدار الحالي.")
+        return
+    await query.answer("جاري التبديل...")
+
+    manager = get_manager(bot_id)
+    running = manager.process and manager.process.returncode is None
+    result = ""
+    try:
+        # البوت يُوقف أولاً فتنتقل بياناته الحالية كاملة، ثم يُبدَّل الرابط الرمزي بالشيفرة دون نسخها
+        if running:
+            await manager.stop()
+        await asyncio.to_thread(activate_release, bot_id, release_id)
+    except OSError as e:
+        logger.error(f"Release switch failed for bot {bot_id}: {e}")
+        if running:
+            await manager.start()
+        await query.edit_message_text(f"❌ فشل التبديل إلى الإصدار {release_id}: {e}")
+        return
+    if running:
+        result = await manager.start()
+
+    text, keyboard = get_bot_panel_keyboard(bot_id)
+    await query.edit_message_text(
+        text=f"↩️ تم التبديل إلى الإصدار {release_id}.\n{result}\n\n{text}",
+        reply_markup=keyboard
+    )
+
+async def crashes_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lists the bot's distinct crash signatures, most recent first."""
+    query = update.callback_query
+    await query.answer()
+
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG:
+        await query.edit_message_text("❌ البوت غير موجود.")
+        return
+
+    groups = CRASHES.groups(bot_id)
+    keyboard = []
+    if not groups:
+        text = "💥 لم يُسجَّل أي عطل لهذا البوت."
+    else:
+        text = f"💥 أعطال البوت {BOT_CONFIG[bot_id].get('name', bot_id)} ({len(groups)} نوع، اختر نوعاً للتفاصيل):\n"
+        for group in groups[:20]:
+            last = datetime.fromtimestamp(group.last_seen).strftime('%Y-%m-%d %H:%M')
+            text += f"\n• {group.exc_type} ×{group.count} — آخر مرة {last}"
+            if group.location:
+                text += f"\n  {group.location}"
+            keyboard.append([InlineKeyboardButton(f"{group.exc_type} ×{group.count}"[:60],
+                                                  callback_data=f"CRASH_VIEW|{bot_id}|{group.fingerprint}")])
+    keyboard.append([InlineKeyboardButton("⬅ رجوع", callback_data=f"BOT_PANEL|{bot_id}")])
+
+    await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def crash_view_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Shows the latest example of one crash signature: traceback, faulthandler dump and the log lines before it."""
+    query = update.callback_query
+    await query.answer()
+
+    bot_id, fingerprint = context.action['bot_id'], context.action['fingerprint']
+    group = CRASHES.get(bot_id, fingerprint)
+    keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("⬅ رجوع للأعطال", callback_data=f"CRASHES|{bot_id}")]])
+    if group is None:
+        await query.edit_message_text("❌ العطل غير موجود.", reply_markup=keyboard)
+        return
+
+    first = datetime.fromtimestamp(group.first_seen).strftime('%Y-%m-%d %H:%M')
+    last = datetime.fromtimestamp(group.last_seen).strftime('%Y-%m-%d %H:%M')
+    header = f"💥 {group.exc_type}: {group.message}\n" \
+             f"البصمة: {group.fingerprint} | التكرار: {group.count} | رمز الخروج: {group.exit_code}\n" \
+             f"أول مرة: {first} | آخر مرة: {last}\n"
+    sections = []
+    if group.traceback:
+        sections.append("📌 Traceback:\n" + "\n".join(group.traceback))
+    if group.fault:
+        sections.append("⚠️ faulthandler:\n" + "\n".join(group.fault))
+    if group.context:
+        sections.append("📄 السجل قبل العطل:\n" + "\n".join(group.context))
+    # حد رسالة تلغرام 4096 حرفاً: يُقتطع من بداية كل قسم لأن آخره هو الأهم
+    budget = max(3500 - len(header), 0) // max(len(sections), 1)
+    body = "\n\n".join(section if len(section) <= budget else "…" + section[-budget:] for section in sections)
+
+    await query.edit_message_text(text=f"{header}\n{body}", reply_markup=keyboard)
+
+async def profile_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Offers the profiling modes for a bounded run of the bot."""
+    query = update.callback_query
+    await query.answer()
+
+    bot_id = context.action['bot_id']
+    if bot_id not in get_config():
+        await query.edit_message_text("❌ البوت غير موجود.")
+        return
+
+    text = "🔬 تحليل أداء البوت\n\n" \
+           f"• cProfile: يُعاد تشغيل البوت تحت المحلل لمدة {PROFILE_RUN_SECONDS} ثانية، " \
+           "ثم يُرسل تقرير الدوال مرتباً حسب الزمن التراكمي والذاتي مع ملف .prof.\n" \
+           f"• زمن الاستيراد: يُعاد تشغيله مع -X importtime لمدة {PROFILE_IMPORTTIME_SECONDS} ثانية " \
+           "لمعرفة الوحدات التي تبطئ الإقلاع.\n\n" \
+           "بعد انتهاء المدة يعود البوت إلى وضعه الطبيعي (أو يبقى متوقفاً إن كان متوقفاً)."
+    keyboard = [[InlineKeyboardButton(label, callback_data=f"PROFILE_RUN|{bot_id}|{mode}")]
+                for mode, label in PROFILE_MODES.items()]
+    keyboard.append([InlineKeyboardButton("⬅ رجوع", callback_data=f"BOT_PANEL|{bot_id}")])
+    await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def profile_run_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs the bot under the chosen profiler and sends the sorted report as a document."""
+    query = update.callback_query
+    bot_id, mode = context.action['bot_id'], context.action['mode']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG or mode not in PROFILE_MODES:
+        await query.answer("❌ طلب غير صالح.", show_alert=True)
+        return
+    manager = get_manager(bot_id)
+    if manager.profiling:
+        await query.answer("⏳ يوجد تحليل أداء قيد التشغيل لهذا البوت بالفعل.", show_alert=True)
+        return
+    await query.answer()
+
+    seconds = PROFILE_RUN_SECONDS if mode == 'cprofile' else PROFILE_IMPORTTIME_SECONDS
+    name = BOT_CONFIG[bot_id].get('name', bot_id)
+    await query.edit_message_text(
+        f"🔬 البوت {name} يعمل الآن تحت {PROFILE_MODES[mode]} لمدة {seconds} ثانية...",
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅ رجوع", callback_data=f"BOT_PANEL|{bot_id}")]])
+    )
+
+    workdir = tempfile.mkdtemp(prefix='bot_profile_')
+    try:
+        output = os.path.join(workdir, f"{mode}.out")
+        result = await manager.profile(mode, seconds, output)
+        try:
+            report = await asyncio.to_thread(build_report, mode, output)
+        except Exception as e:
+            logger.warning(f"No profiling report for bot {bot_id}: {e}")
+            await query.message.reply_text(f"{result}\n❌ لم تُجمع بيانات تحليل الأداء.")
+            return
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        await context.bot.send_document(
+            chat_id=query.message.chat_id,
+            document=report.encode('utf-8'),
+            filename=f"{name}_{mode}_{stamp}.txt",
+            caption=f"🔬 تقرير {PROFILE_MODES[mode]} للبوت {name}\n{result}"[:1024]
+        )
+        if mode == 'cprofile':
+            # الملف الخام يُفتح بـ snakeviz أو pstats لتحليل أعمق
+            with open(output, 'rb') as f:
+                await context.bot.send_document(chat_id=query.message.chat_id, document=f,
+                                                filename=f"{name}_{stamp}.prof")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+async def webhook_toggle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switches a bot between its own polling and the shared webhook gateway."""
+    query = update.callback_query
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG or not gateway_enabled():
+        await query.answer("❌ بوابة الويب هوك غير مفعلة.", show_alert=True)
+        return
+    await query.answer()
+
+    BOT_CONFIG[bot_id]['webhook'] = not BOT_CONFIG[bot_id].get('webhook', False)
+    save_config()
+    # متغيرات البيئة تُقرأ عند التشغيل فقط، لذا يلزم إعادة تشغيل واحدة
+    manager = get_manager(bot_id)
+    result = ""
+    if manager.process and manager.process.returncode is None:
+        result = await manager.restart()
+
+    mode = "الويب هوك عبر البوابة" if BOT_CONFIG[bot_id]['webhook'] else "Polling"
+    text, keyboard = get_bot_panel_keyboard(bot_id)
+    await query.edit_message_text(
+        text=f"🌐 وضع استقبال التحديثات: {mode}\n{result}\n\n{text}",
+        reply_markup=keyboard
+    )
+
+async def hibernate_toggle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Opts the bot in or out of hibernation when idle."""
+    query = update.callback_query
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG:
+        await query.answer("❌ البوت غير موجود.", show_alert=True)
+        return
+
+    enabled = not BOT_CONFIG[bot_id].get('hibernate')
+    BOT_CONFIG[bot_id]['hibernate'] = enabled
+    save_config()
+    await query.answer("💤 تم تفعيل السبات التلقائي" if enabled else "💤 تم تعطيل السبات التلقائي")
+    if not enabled and BOT_CONFIG[bot_id].get('status') == 'hibernated':
+        # البوت النائم يصبح موقوفاً عادياً ولا يوقظه الجدول أو الطلبات الواردة بعد الآن
+        await get_manager(bot_id).stop()
+
+    text, keyboard = get_bot_panel_keyboard(bot_id)
+    await query.edit_message_text(text=text, reply_markup=keyboard)
+
+async def watchdog_toggle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Opts the bot in or out of the inactivity fallback of the watchdog; heartbeats are always watched."""
+    query = update.callback_query
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG or not watchdog_enabled():
+        await query.answer("❌ المراقبة غير متاحة.", show_alert=True)
+        return
+
+    enabled = not BOT_CONFIG[bot_id].get('watchdog')
+    BOT_CONFIG[bot_id]['watchdog'] = enabled
+    save_config()
+    await query.answer("🐶 يُعاد تشغيل البوت إذا توقف نشاطه" if enabled else "🐶 المراقبة بالنبضات فقط")
+
+    text, keyboard = get_bot_panel_keyboard(bot_id)
+    await query.edit_message_text(text=text, reply_markup=keyboard)
+
+async def cpu_priority_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switches the bot to the next priority class; a running bot is re-prioritised without a restart."""
+    query = update.callback_query
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG or not cpu_scheduler_enabled():
+        await query.answer("❌ جدولة المعالج غير متاحة.", show_alert=True)
+        return
+
+    classes = list(CPU_PRIORITY_CLASSES)
+    current = BOT_CONFIG[bot_id].get('priority', CPU_DEFAULT_PRIORITY)
+    priority = classes[(classes.index(current) + 1) % len(classes)] if current in classes else CPU_DEFAULT_PRIORITY
+    BOT_CONFIG[bot_id]['priority'] = priority
+    save_config()
+    await CPU_SCHEDULER.set_priority(bot_id, priority)
+    await query.answer(f"🎚 الأولوية: {PRIORITY_LABELS.get(priority, priority)}")
+
+    text, keyboard = get_bot_panel_keyboard(bot_id)
+    await query.edit_message_text(text=text, reply_markup=keyboard)
+
 async def delete_bot_confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Asks for confirmation before deleting a bot."""
     query = update.callback_query
     await query.answer()
     
-    bot_id = query.data.split('|')[1]
+    bot_id = context.action['bot_id']
     BOT_CONFIG = get_config()
     name = BOT_CONFIG[bot_id].get('name', bot_id)
     
@@ -451,7 +858,7 @@ async def delete_bot_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
     
-    bot_id = query.data.split('|')[1]
+    bot_id = context.action['bot_id']
     BOT_CONFIG = get_config()
     
     if bot_id not in BOT_CONFIG:
@@ -461,10 +868,9 @@ async def delete_bot_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     manager = get_manager(bot_id)
     await manager.stop()
     
-    bot_path = get_bot_path(bot_id)
     try:
-        if os.path.exists(bot_path):
-            shutil.rmtree(bot_path)
+        await JOB_MANAGER.run('delete', BOT_CONFIG[bot_id].get('name', bot_id), delete_bot_files, bot_id,
+                              report_progress=False)
         
         del BOT_CONFIG[bot_id]
         delete_manager(bot_id)
@@ -481,32 +887,137 @@ async def delete_bot_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
             reply_markup=get_bot_list_keyboard()
         )
 
-async def view_logs_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Displays the last 50 lines of the bot's logs."""
-    query = update.callback_query
-    await query.answer()
-    
-    bot_id = query.data.split('|')[1]
+def get_logs_view(bot_id: str, live: bool = False) -> tuple[str, InlineKeyboardMarkup]:
+    """Builds the log screen with the last 50 lines of the bot's output."""
     BOT_CONFIG = get_config()
-    
-    if bot_id not in BOT_CONFIG:
-        await query.edit_message_text("❌ البوت غير موجود.")
-        return
-        
     manager = get_manager(bot_id)
     logs = manager.get_logs(limit=50)
     
     if not logs:
         logs = "لا توجد سجلات حالياً."
         
-    text = f"📄 سجلات البوت {BOT_CONFIG[bot_id].get('name', bot_id)} (آخر 50 سطر):\n\n{logs}"
+    stats, limits = manager.log_capture.stats, manager.log_capture.limits
+    limit_label = "بلا حد" if limits.unlimited else f"{limits.lines_per_sec:g} سطر/ث"
+    text = f"📄 سجلات البوت {BOT_CONFIG[bot_id].get('name', bot_id)} (آخر 50 سطر):\n" \
+           f"📉 ملتقط: {stats.captured_lines} | مُسقط: {stats.dropped_lines} ({stats.dropped_bytes / 1024:.0f} KB) | " \
+           f"عينات: {stats.sampled_lines} | الحد: {limit_label}\n"
+    archive = manager.log_archive.stats if manager.log_archive else None
+    if archive and archive.segments:
+        text += f"🗜 الأرشيف: {archive.raw_bytes / 1024:.0f} KB ← {archive.compressed_bytes / 1024:.0f} KB " \
+                f"(×{archive.ratio:.1f}، {archive.throughput / 1024 / 1024:.1f} MB/ث)\n"
+    text += f"\n{logs}"
            
     keyboard = [
-        [InlineKeyboardButton("🔄 تحديث السجلات", callback_data=f"VIEW_LOGS|{bot_id}")],
+        [InlineKeyboardButton("🔄 تحديث السجلات", callback_data=f"VIEW_LOGS|{bot_id}"),
+         live_toggle_button("VIEW_LOGS", bot_id, live)],
+        [InlineKeyboardButton(f"🚦 حد السجلات: {limit_label}", callback_data=f"LOG_LIMIT|{bot_id}")],
         [InlineKeyboardButton("⬅ رجوع للوحة التحكم", callback_data=f"BOT_PANEL|{bot_id}")]
     ]
+    if manager.log_archive:
+        keyboard.insert(-1, [InlineKeyboardButton("📥 آخر ساعة", callback_data=f"LOG_ARCHIVE|{bot_id}|1"),
+                             InlineKeyboardButton("📥 آخر 24 ساعة", callback_data=f"LOG_ARCHIVE|{bot_id}|24")])
+    return text, InlineKeyboardMarkup(keyboard)
+
+async def view_logs_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays the last 50 lines of the bot's logs."""
+    query = update.callback_query
+    await query.answer()
     
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    
+    if bot_id not in BOT_CONFIG:
+        await query.edit_message_text("❌ البوت غير موجود.")
+        return
+        
+    text, keyboard = get_logs_view(bot_id)
     await query.edit_message_text(
         text=text,
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
\ No newline at end of file
+        reply_markup=keyboard
+    )
+
+def _build_log_export(lines: list, base_name: str) -> tuple[list[tuple[str, bytes]], bool]:
+    """Formats archived lines into (filename, content) parts small enough to send; blocking.
+
+    Also tells whether the lines hit the export caps, i.e. older lines were left out.
+    """
+    parts, current, size, text_size = [], [], 0, 0
+    for line in lines:
+        text_size += len(line.text) + 1
+        row = f"{datetime.fromtimestamp(line.timestamp):%Y-%m-%d %H:%M:%S} #{line.number} {line.text}\n".encode('utf-8')
+        if current and size + len(row) > LOG_EXPORT_PART_BYTES:
+            parts.append(b"".join(current))
+            current, size = [], 0
+        current.append(row)
+        size += len(row)
+    if current:
+        parts.append(b"".join(current))
+
+    files = []
+    for index, content in enumerate(parts, start=1):
+        name = base_name if len(parts) == 1 else f"{base_name}_part{index}"
+        if len(content) > LOG_EXPORT_GZIP_OVER:
+            files.append((f"{name}.txt.gz", gzip.compress(content, compresslevel=6)))
+        else:
+            files.append((f"{name}.txt", content))
+    return files, len(lines) >= LOG_EXPORT_MAX_LINES or text_size >= LOG_EXPORT_MAX_BYTES
+
+async def log_archive_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Sends the archived log lines of the last N hours as text files, newest lines first when capped."""
+    query = update.callback_query
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+    manager = get_manager(bot_id) if bot_id in BOT_CONFIG else None
+    if manager is None or manager.log_archive is None:
+        await query.answer("❌ أرشيف السجلات غير متاح.", show_alert=True)
+        return
+    await query.answer("📥 جاري تجهيز السجلات...")
+
+    hours = int(context.action['hours'])
+    # الأسطر التي لم تُضغط بعد تُؤرشف أولاً حتى يشمل الملف أحدث السجلات
+    pending = manager.log_archive.rotate()
+    if pending:
+        await asyncio.wrap_future(pending)
+    end = datetime.now().timestamp()
+    # بوت كثير الإخراج قد يكتب غيغابايتات في اليوم: يُقرأ الأحدث حتى الحد فقط
+    lines = await asyncio.to_thread(manager.log_archive.read_range, end - hours * 3600, end,
+                                    LOG_EXPORT_MAX_LINES, LOG_EXPORT_MAX_BYTES, True)
+    if not lines:
+        await query.message.reply_text("لا توجد سجلات مؤرشفة في هذه الفترة.")
+        return
+    name = BOT_CONFIG[bot_id].get('name', bot_id)
+    files, truncated = await asyncio.to_thread(_build_log_export, lines, f"{name}_logs_{hours}h")
+    caption = f"📥 سجلات آخر {hours} ساعة ({len(lines)} سطر)"
+    if truncated:
+        caption += f"\n⚠️ الفترة أكبر من الحد؛ أُرسلت أحدث السجلات منذ " \
+                   f"{datetime.fromtimestamp(lines[0].timestamp):%Y-%m-%d %H:%M:%S} فقط"
+    try:
+        for index, (filename, content) in enumerate(files, start=1):
+            part = f" — جزء {index}/{len(files)}" if len(files) > 1 else ""
+            await context.bot.send_document(chat_id=query.message.chat_id, document=content, filename=filename,
+                                            caption=f"{caption}{part}"[:1024])
+    except TelegramError as e:
+        logger.error(f"Could not send archived logs of bot {bot_id}: {e}")
+        await query.message.reply_text(f"❌ تعذر إرسال ملف السجلات: {e}")
+
+async def log_limit_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switches the bot's log rate limit to the next preset; applies to the running capture at once."""
+    query = update.callback_query
+    bot_id = context.action['bot_id']
+    BOT_CONFIG = get_config()
+
+    if bot_id not in BOT_CONFIG:
+        await query.answer("❌ البوت غير موجود.", show_alert=True)
+        return
+
+    manager = get_manager(bot_id)
+    current = (manager.log_capture.limits.lines_per_sec, manager.log_capture.limits.bytes_per_sec)
+    presets = list(LOG_LIMIT_PRESETS)
+    lines, size = presets[(presets.index(current) + 1) % len(presets)] if current in presets else presets[0]
+    BOT_CONFIG[bot_id].setdefault('log_limits', {}).update({'lines_per_sec': lines, 'bytes_per_sec': size})
+    save_config()
+    manager.log_capture.set_limits(LogLimits.from_config(BOT_CONFIG[bot_id]))
+    await query.answer("🚦 تم تغيير حد السجلات")
+
+    text, keyboard = get_logs_view(bot_id)
+    await query.edit_message_text(text=text, reply_markup=keyboard)
@@ -6,6 +6,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from database.config_manager import get_config
+from core.jobs import JOB_MANAGER
 from utils.file_utils import get_bot_path
 from handlers.bot_management import get_bot_panel_keyboard
 
@@ -67,9 +68,8 @@ async def file_manager_callback(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    current_path = parts[2]
+    bot_id = context.action['bot_id']
+    current_path = context.action['path']
     
     try:
         text, keyboard = get_file_manager_keyboard(bot_id, current_path)
@@ -89,9 +89,8 @@ async def file_actions_callback(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    file_path = parts[2]
+    bot_id = context.action['bot_id']
+    file_path = context.action['path']
     
     keyboard = [
         [InlineKeyboardButton("⬇️ تحميل الملف", callback_data=f"FM_DOWNLOAD|{bot_id}|{file_path}")],
@@ -109,9 +108,8 @@ async def fm_download_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer("جاري تجهيز الملف للتحميل...")
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    file_path = parts[2]
+    bot_id = context.action['bot_id']
+    file_path = context.action['path']
     
     abs_path = get_bot_path(bot_id, file_path)
     
@@ -131,9 +129,8 @@ async def fm_delete_confirm_callback(update: Update, context: ContextTypes.DEFAU
     query = update.callback_query
     await query.answer()
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    item_path = parts[2]
+    bot_id = context.action['bot_id']
+    item_path = context.action['path']
     
     abs_path = get_bot_path(bot_id, item_path)
     is_dir = os.path.isdir(abs_path)
@@ -155,24 +152,23 @@ async def fm_delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    item_path = parts[2]
+    bot_id = context.action['bot_id']
+    item_path = context.action['path']
     
     abs_path = get_bot_path(bot_id, item_path)
     parent_path = os.path.dirname(item_path) or "."
     
     try:
         if os.path.isdir(abs_path):
-            shutil.rmtree(abs_path)
+            await JOB_MANAGER.run('delete', item_path, shutil.rmtree, abs_path, report_progress=False)
             message = f"🗑 تم حذف المجلد **{item_path}** بنجاح."
         else:
             os.remove(abs_path)
             message = f"🗑 تم حذف الملف **{item_path}** بنجاح."
             
-        # Manually updating query data to navigate back
-        query.data = f"FILE_MANAGER|{bot_id}|{parent_path}"
-        await file_manager_callback(update, context)
+        # العودة إلى المجلد الأب
+        text, keyboard = get_file_manager_keyboard(bot_id, parent_path)
+        await query.edit_message_text(text=text, reply_markup=keyboard)
         await query.message.reply_text(message)
         
     except Exception as e:
@@ -183,9 +179,8 @@ async def fm_upload_prompt_callback(update: Update, context: ContextTypes.DEFAUL
     query = update.callback_query
     await query.answer()
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    current_path = parts[2]
+    bot_id = context.action['bot_id']
+    current_path = context.action['path']
     
     context.user_data['state'] = 'FM_AWAITING_FILE'
     context.user_data['fm_target_bot'] = bot_id
@@ -205,9 +200,8 @@ async def fm_create_dir_prompt_callback(update: Update, context: ContextTypes.DE
     query = update.callback_query
     await query.answer()
     
-    parts = query.data.split('|')
-    bot_id = parts[1]
-    current_path = parts[2]
+    bot_id = context.action['bot_id']
+    current_path = context.action['path']
     
     context.user_data['state'] = 'FM_AWAITING_DIR_NAME'
     context.user_data['fm_target_bot'] = bot_id
@@ -278,6 +272,9 @@ async def handle_file_manager_file_input(update: Update, context: ContextTypes.D
     try:
         new_file = await context.bot.get_file(file_id)
         target_path = get_bot_path(bot_id, os.path.join(current_path, file_name))
+        # ملفات الإصدار قد تكون مرتبطة (hardlink) بإصدارات أخرى، فتُستبدل بملف جديد ولا يُكتب فوقها
+        if os.path.isfile(target_path):
+            os.remove(target_path)
         await new_file.download_to_drive(custom_path=target_path)
         
         await message.reply_text(f"✅ تم رفع الملف {file_name} بنجاح إلى المسار:\n{current_path}")
@@ -0,0 +1,41 @@
+import logging
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from core.jobs import JOB_MANAGER
+
+logger = logging.getLogger(__name__)
+
+async def jobs_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays running and recently finished background jobs."""
+    query = update.callback_query
+    await query.answer()
+
+    jobs = JOB_MANAGER.list_jobs()
+    keyboard = []
+    if not jobs:
+        text = "⚙️ لا توجد مهام خلفية حالياً."
+    else:
+        text = "⚙️ المهام الخلفية (الجارية أولاً):\n\n"
+        for job in jobs[:15]:
+            text += f"#{job.job_id} {job.render()}\n\n"
+            if job.active:
+                keyboard.append([InlineKeyboardButton(f"✖️ إلغاء #{job.job_id}", callback_data=f"JOB_CANCEL|{job.job_id}")])
+
+    keyboard.append([InlineKeyboardButton("🔄 تحديث", callback_data="JOBS_LIST")])
+    keyboard.append([InlineKeyboardButton("⬅ رجوع", callback_data="MAIN_MENU")])
+
+    await query.edit_message_text(
+        text=text,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def job_cancel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Requests cancellation of a background job."""
+    query = update.callback_query
+    job_id = context.action['job_id']
+
+    if JOB_MANAGER.cancel(job_id):
+        await query.answer("⏹ تم طلب إلغاء المهمة...")
+    else:
+        await query.answer("المهمة انتهت بالفعل.", show_alert=True)
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database.config_manager import get_config, config_version
+from core.process_manager import get_manager
+from core.live_view import LIVE_VIEWS
+from handlers.bot_management import get_bot_panel_keyboard, get_logs_view
+from handlers.system_handlers import get_system_status, storage_size
+from utils.file_utils import get_bot_size
+
+logger = logging.getLogger(__name__)
+
+
+def _live_screen(screen: str, target: str):
+    """Returns (version_fn, async render_fn) for a screen that supports live mode, or None.
+
+    Directory sizes are summed in a thread; the rest of a screen reads the
+    platform's state and is built on the event loop.
+    """
+    if screen == 'SYSTEM_STATUS':
+        async def render_status(live: bool):
+            return get_system_status(live, await asyncio.to_thread(storage_size))
+        return config_version, render_status
+    if target not in get_config():
+        return None
+    if screen == 'BOT_PANEL':
+        async def render_panel(live: bool):
+            return get_bot_panel_keyboard(target, live, await asyncio.to_thread(get_bot_size, target))
+        return config_version, render_panel
+    if screen == 'VIEW_LOGS':
+        manager = get_manager(target)
+
+        async def render_logs(live: bool):
+            return get_logs_view(target, live)
+        return (lambda: (manager.log_version, config_version())), render_logs
+    return None
+
+
+async def live_start_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Turns the current screen into a live dashboard that refreshes when its state changes."""
+    query = update.callback_query
+    screen, target = context.action['screen'], context.action['target']
+    handlers = _live_screen(screen, target)
+    if handlers is None:
+        await query.answer("❌ هذه الشاشة غير متاحة.", show_alert=True)
+        return
+    await query.answer("🔴 التحديث المباشر مفعل")
+
+    version_fn, render = handlers
+    text, keyboard = await render(True)
+    await query.edit_message_text(text=text, reply_markup=keyboard)
+    LIVE_VIEWS.open(f"{screen}|{target}", query.message, version_fn, lambda: render(True), text=text)
+
+
+async def live_stop_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ends live mode and leaves a static snapshot of the screen."""
+    query = update.callback_query
+    await query.answer()
+    LIVE_VIEWS.close(query.message.chat_id, query.message.message_id)
+
+    handlers = _live_screen(context.action['screen'], context.action['target'])
+    if handlers is None:
+        return
+    text, keyboard = await handlers[1](False)
+    await query.edit_message_text(text=text, reply_markup=keyboard)
@@ -12,6 +12,7 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("🤖 إدارة البوتات", callback_data="BOT_LIST")],
         [InlineKeyboardButton("📊 حالة النظام العامة", callback_data="SYSTEM_STATUS")],
         [InlineKeyboardButton("💾 النسخ الاحتياطية", callback_data="BACKUPS_LIST")],
+        [InlineKeyboardButton("⚙️ المهام الخلفية", callback_data="JOBS_LIST")],
     ]
     return InlineKeyboardMarkup(keyboard)
 
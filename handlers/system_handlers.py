@@ -1,72 +1,283 @@
 import os
 import logging
+import asyncio
+from typing import Optional
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from config import BOTS_DIR, BACKUPS_DIR
+from config import BOTS_DIR, PROFILER_DEFAULT_SECONDS, PROFILER_DEFAULT_HZ
 from database.config_manager import get_config
+from core.process_manager import get_manager
+from core.jobs import JOB_MANAGER, JobCancelled
+from core.metrics import HANDLER_METRICS
+from core.live_view import live_toggle_button
+from core.cpu_scheduler import CPU_SCHEDULER, cpu_scheduler_enabled
+from core.hibernation import HIBERNATION, hibernation_enabled
+from core.watchdog import WATCHDOG, watchdog_enabled
+from core.sampling_profiler import profile, render_summary, ProfilerBusy
+from utils.decorators import admin_only
+from utils.file_utils import get_bot_path
+from utils.release_store import publish_release
+from utils.backup_store import (
+    list_all_backups, list_backups, load_manifest, diff_against_tree, diff_manifests, restore_release
+)
 
 logger = logging.getLogger(__name__)
 
-async def system_status_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Displays global system status."""
-    query = update.callback_query
-    await query.answer()
-    
-    BOT_CONFIG = get_config()
-    total_bots = len(BOT_CONFIG)
-    running_bots = sum(1 for config in BOT_CONFIG.values() if config.get('status') == 'running')
-    
+def storage_size() -> int:
+    """Bytes used by the live files of all hosted bots."""
     total_size = 0
     if os.path.exists(BOTS_DIR):
-        for dirpath, dirnames, filenames in os.walk(BOTS_DIR):
+        # البوتات روابط رمزية إلى إصداراتها النشطة
+        for dirpath, dirnames, filenames in os.walk(BOTS_DIR, followlinks=True):
             for f in filenames:
                 fp = os.path.join(dirpath, f)
                 if not os.path.islink(fp):
                     total_size += os.path.getsize(fp)
+    return total_size
+
+def get_system_status(live: bool = False, total_size: Optional[int] = None) -> tuple[str, InlineKeyboardMarkup]:
+    """Builds the global system status screen; ``total_size`` is computed here if not given."""
+    BOT_CONFIG = get_config()
+    total_bots = len(BOT_CONFIG)
+    running_bots = sum(1 for config in BOT_CONFIG.values() if config.get('status') == 'running')
+    hibernated_bots = sum(1 for config in BOT_CONFIG.values() if config.get('status') == 'hibernated')
+    
+    if total_size is None:
+        total_size = storage_size()
     
     total_size_mb = total_size / (1024 * 1024)
     
     status_text = f"📊 **حالة النظام العامة**\n\n" \
                   f"عدد البوتات المستضافة: {total_bots}\n" \
                   f"البوتات قيد التشغيل: {running_bots}\n" \
+                  f"البوتات النائمة: {hibernated_bots}\n" \
                   f"إجمالي مساحة التخزين: {total_size_mb:.2f} ميغابايت\n\n" \
                   f"--- حالة البوتات ---\n"
                   
     for bot_id, config in BOT_CONFIG.items():
-        status_emoji = "🟢" if config.get('status') == 'running' else "🔴"
+        status_emoji = {'running': "🟢", 'hibernated': "💤"}.get(config.get('status'), "🔴")
         status_text += f"{status_emoji} {config.get('name', bot_id)} (PID: {config.get('pid', 'N/A')})\n"
+
+    if hibernation_enabled():
+        status_text += "\n" + HIBERNATION.render()
+    if watchdog_enabled():
+        status_text += "\n" + WATCHDOG.render()
+    if cpu_scheduler_enabled():
+        status_text += "\n" + CPU_SCHEDULER.render({bot_id: c.get('name', bot_id) for bot_id, c in BOT_CONFIG.items()})
         
     keyboard = [
-        [InlineKeyboardButton("🔄 تحديث", callback_data="SYSTEM_STATUS")],
+        [InlineKeyboardButton("🔄 تحديث", callback_data="SYSTEM_STATUS"), live_toggle_button("SYSTEM_STATUS", "-", live)],
+        [InlineKeyboardButton("⏱ أداء المعالجات", callback_data="HANDLER_STATS")],
         [InlineKeyboardButton("⬅ رجوع", callback_data="MAIN_MENU")]
     ]
+    return status_text, InlineKeyboardMarkup(keyboard)
+
+async def system_status_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays global system status."""
+    query = update.callback_query
+    await query.answer()
     
+    text, keyboard = get_system_status()
     await query.edit_message_text(
-        text=status_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        text=text,
+        reply_markup=keyboard,
+    )
+
+@admin_only
+async def handler_stats_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays latency, error and in-flight statistics per handler, slowest first."""
+    query = update.callback_query
+    await query.answer()
+
+    stats = HANDLER_METRICS.snapshot()
+    if not stats:
+        text = "⏱ لا توجد قياسات بعد."
+    else:
+        text = "⏱ أداء المعالجات (الأبطأ أولاً)\n" \
+               "العدد | p50/p95 | المتوسط: تلغرام + محلي\n\n"
+        ranked = sorted(stats.items(), key=lambda item: item[1].quantile(0.95), reverse=True)
+        for key, s in ranked[:20]:
+            count = max(s.count, 1)
+            text += f"{key}: {s.count} | {s.quantile(0.5):g}/{s.quantile(0.95):g}s | " \
+                    f"{s.api_time / count:.2f}s + {s.local_time / count:.2f}s"
+            if s.errors:
+                text += f" | ❌ {s.errors}"
+            if s.in_flight:
+                text += f" | ⏳ {s.in_flight}"
+            text += "\n"
+
+    keyboard = [
+        [InlineKeyboardButton("🔄 تحديث", callback_data="HANDLER_STATS")],
+        [InlineKeyboardButton("⬅ رجوع", callback_data="SYSTEM_STATUS")]
+    ]
+    await query.edit_message_text(text=text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+@admin_only
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/profile [seconds] [hz]: samples the platform process and sends collapsed stacks plus the top functions."""
+    try:
+        seconds = float(context.args[0]) if context.args else PROFILER_DEFAULT_SECONDS
+        hz = float(context.args[1]) if len(context.args or []) > 1 else PROFILER_DEFAULT_HZ
+    except ValueError:
+        await update.message.reply_text("الاستخدام: /profile [الثواني] [العينات في الثانية]")
+        return
+
+    await update.message.reply_text(f"🔬 جاري أخذ العينات لمدة {seconds:g} ثانية...")
+    try:
+        # المحلل يعمل في خيط مستقل فتستمر حلقة الأحداث التي يقيسها في عملها
+        result = await asyncio.to_thread(profile, seconds, hz)
+    except ProfilerBusy:
+        await update.message.reply_text("⏳ يوجد تحليل آخر قيد التشغيل، حاول بعد انتهائه.")
+        return
+
+    await update.message.reply_document(
+        document=result.collapsed().encode(),
+        filename=f"profile_{int(result.seconds)}s.collapsed.txt",
+        caption=f"🔬 {result.samples} عينة خلال {result.seconds:.1f} ثانية (كلفة المحلل {result.overhead * 100:.2f}%).\n"
+                f"الملف بصيغة collapsed stacks لأدوات flamegraph.pl و speedscope."
     )
+    await update.message.reply_text(render_summary(result)[:4000])
+
 async def backups_list_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Displays the list of available backups."""
     query = update.callback_query
     await query.answer()
 
-    if not os.path.exists(BACKUPS_DIR):
+    BOT_CONFIG = get_config()
+    backups = list_all_backups()
+    entries = [(backup_id, bot_id) for bot_id, ids in backups.items() for backup_id in ids]
+    keyboard = []
+    if not entries:
         text = "💾 لا توجد نسخ احتياطية حالياً."
     else:
-        backups = os.listdir(BACKUPS_DIR)
-        if not backups:
-            text = "💾 لا توجد نسخ احتياطية حالياً."
-        else:
-            text = "💾 النسخ الاحتياطية المتاحة:\n\n"
-            for backup in sorted(backups, reverse=True)[:10]:
-                text += f"📦 {backup}\n"
+        text = "💾 النسخ الاحتياطية المتاحة (اختر نسخة لعرض الفروقات أو استعادتها):"
+        for backup_id, bot_id in sorted(entries, reverse=True)[:10]:
+            name = BOT_CONFIG.get(bot_id, {}).get('name', bot_id)
+            keyboard.append([InlineKeyboardButton(f"📦 {name} — {backup_id}", callback_data=f"BACKUP_VIEW|{bot_id}|{backup_id}")])
+
+    keyboard.append([InlineKeyboardButton("⬅ رجوع", callback_data="MAIN_MENU")])
 
+    await query.edit_message_text(
+        text=text,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+def _backup_summary(bot_id: str, backup_id: str) -> str:
+    """Builds the diff summary of a backup against the live tree and the previous backup."""
+    manifest = load_manifest(bot_id, backup_id)
+    diff = diff_against_tree(manifest, get_bot_path(bot_id))
+    size_mb = manifest['total_size'] / (1024 * 1024)
+
+    text = f"📦 النسخة {backup_id}\n" \
+           f"التاريخ: {manifest['created_at']}\n" \
+           f"الملفات: {len(manifest['files'])} | الحجم: {size_mb:.2f} MB\n\n" \
+           f"--- مقارنة مع الملفات الحالية ---\n" \
+           f"➕ ملفات ستُستعاد (مفقودة): {len(diff['missing'])}\n" \
+           f"✏️ ملفات معدلة: {len(diff['changed'])}\n" \
+           f"🗑 ملفات إضافية ستُحذف: {len(diff['extra'])}\n" \
+           f"✅ دون تغيير: {len(diff['unchanged'])}\n"
+
+    for label, key in (("✏️", 'changed'), ("➕", 'missing'), ("🗑", 'extra')):
+        for rel in diff[key][:5]:
+            text += f"{label} {rel}\n"
+
+    history = list_backups(bot_id)
+    index = history.index(backup_id)
+    if index + 1 < len(history):
+        previous = load_manifest(bot_id, history[index + 1])
+        changes = diff_manifests(previous, manifest)
+        text += f"\n--- مقارنة مع النسخة السابقة {history[index + 1]} ---\n" \
+                f"مضافة: {len(changes['added'])} | محذوفة: {len(changes['removed'])} | معدلة: {len(changes['changed'])}\n"
+    return text
+
+async def backup_view_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Shows a backup's file diff summary computed from manifests and file metadata."""
+    query = update.callback_query
+    await query.answer()
+
+    bot_id, backup_id = context.action['bot_id'], context.action['backup_id']
+    try:
+        text = await asyncio.to_thread(_backup_summary, bot_id, backup_id)
+    except Exception as e:
+        logger.error(f"Failed to read backup {bot_id}/{backup_id}: {e}")
+        await query.edit_message_text("❌ تعذر قراءة النسخة الاحتياطية.")
+        return
+
+    keyboard = []
+    if bot_id in get_config():
+        keyboard.append([InlineKeyboardButton("♻️ استعادة هذه النسخة", callback_data=f"BACKUP_RESTORE_CONFIRM|{bot_id}|{backup_id}")])
+    keyboard.append([InlineKeyboardButton("⬅ رجوع", callback_data="BACKUPS_LIST")])
+
+    await query.edit_message_text(
+        text=text,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def backup_restore_confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Asks for confirmation before restoring a backup."""
+    query = update.callback_query
+    await query.answer()
+
+    bot_id, backup_id = context.action['bot_id'], context.action['backup_id']
     keyboard = [
-        [InlineKeyboardButton("⬅ رجوع", callback_data="MAIN_MENU")]
+        [InlineKeyboardButton("✅ تأكيد الاستعادة", callback_data=f"BACKUP_RESTORE|{bot_id}|{backup_id}")],
+        [InlineKeyboardButton("❌ إلغاء", callback_data=f"BACKUP_VIEW|{bot_id}|{backup_id}")]
     ]
 
+    await query.edit_message_text(
+        text=f"⚠️ سيُبنى إصدار جديد من النسخة {backup_id} ويحل محل ملفات البوت الحالية وبياناته، "
+             f"ثم يُعاد تشغيل البوت إن كان يعمل.\nيبقى الإصدار الحالي في قائمة الإصدارات للرجوع إليه.\nهل أنت متأكد؟",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def backup_restore_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Builds a release from a backup, then stops the bot, publishes it and starts the bot once."""
+    query = update.callback_query
+    await query.answer("جاري الاستعادة...")
+
+    bot_id, backup_id = context.action['bot_id'], context.action['backup_id']
+    BOT_CONFIG = get_config()
+    if bot_id not in BOT_CONFIG:
+        await query.edit_message_text("❌ البوت غير موجود.")
+        return
+
+    try:
+        # الاستعادة تُبنى كإصدار جديد في مجلد منفصل، فلا يُمس الإصدار الذي يعمل منه البوت
+        stats = await JOB_MANAGER.run(
+            'restore', f"{BOT_CONFIG[bot_id].get('name', bot_id)} ← {backup_id}", restore_release,
+            bot_id, backup_id, message=query.message
+        )
+    except JobCancelled:
+        await query.edit_message_text("✖️ تم إلغاء الاستعادة. لم يتغير الإصدار الحالي.")
+        return
+    except Exception as e:
+        logger.exception(f"Failed to restore backup {backup_id} for bot {bot_id}: {e}")
+        await query.edit_message_text(f"❌ فشلت الاستعادة: {e}")
+        return
+
+    release_id = stats['release_id']
+    manager = get_manager(bot_id)
+    was_running = bool(manager.process and manager.process.returncode is None)
+    try:
+        if was_running:
+            await manager.stop()
+        # النسخة تحمل بيانات البوت أيضاً، فلا تُنقل إليها بيانات الإصدار السابق
+        await asyncio.to_thread(publish_release, bot_id, release_id, carry_data=False)
+    except Exception as e:
+        logger.exception(f"Failed to publish restored release {release_id} for bot {bot_id}: {e}")
+        if was_running:
+            await manager.start()
+        await query.edit_message_text(f"❌ فشلت الاستعادة: {e}")
+        return
+    start_message = await manager.start() if was_running else ""
+
+    text = f"♻️ تمت استعادة النسخة {backup_id} كإصدار جديد {release_id}.\n" \
+           f"ملفات مستعادة: {stats['written']} | الحجم: {stats['bytes_written'] / (1024 * 1024):.2f} MB\n" \
+           f"{start_message}"
+    keyboard = [[InlineKeyboardButton("⬅ رجوع للوحة التحكم", callback_data=f"BOT_PANEL|{bot_id}")]]
+
     await query.edit_message_text(
         text=text,
         reply_markup=InlineKeyboardMarkup(keyboard)
-    )
\ No newline at end of file
+    )
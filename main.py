@@ -1,10 +1,12 @@
 import os
+import json
+import signal
+import asyncio
 import logging
 from telegram import Update
 from telegram.ext import (
     Application, 
     CommandHandler, 
-    CallbackQueryHandler, 
     MessageHandler, 
     filters
 )
@@ -12,6 +14,16 @@ from telegram.ext import (
 from config import BOT_TOKEN, ADMIN_ID, BOTS_DIR, BACKUPS_DIR, USE_WEBHOOK, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL
 from database.config_manager import load_config
 from core.health_server import start_health_server
+from core.metrics import InstrumentedRequest, instrument_application
+from core.router import CallbackRouter
+from core.live_view import LIVE_VIEWS
+from core.error_digest import ERROR_DIGEST
+from core.webhook_gateway import WEBHOOK_GATEWAY, gateway_enabled
+from core.api_proxy import API_PROXY, api_proxy_enabled
+from core.shutdown import SHUTDOWN
+from core.watchdog import WATCHDOG, watchdog_enabled
+from core.cpu_scheduler import CPU_SCHEDULER, cpu_scheduler_enabled
+from core.hibernation import HIBERNATION, hibernation_enabled
 
 # Handlers
 from handlers.start_handler import start_command, main_menu_callback
@@ -20,9 +32,21 @@ from handlers.bot_management import (
     bot_panel_callback,
     handle_bot_action,
     delete_bot_confirm_callback,
+    cpu_priority_callback,
+    hibernate_toggle_callback,
+    watchdog_toggle_callback,
     delete_bot_callback,
     view_logs_callback,
     backup_bot_callback,
+    releases_callback,
+    release_activate_callback,
+    crashes_callback,
+    crash_view_callback,
+    profile_menu_callback,
+    profile_run_callback,
+    webhook_toggle_callback,
+    log_limit_callback,
+    log_archive_callback,
     upload_bot_prompt_callback,
     handle_bot_file_upload,
     handle_bot_token
@@ -38,7 +62,17 @@ from handlers.file_manager import (
     handle_file_manager_text_input,
     handle_file_manager_file_input
 )
-from handlers.system_handlers import system_status_callback, backups_list_callback
+from handlers.system_handlers import (
+    system_status_callback,
+    handler_stats_callback,
+    backups_list_callback,
+    backup_view_callback,
+    backup_restore_confirm_callback,
+    backup_restore_callback,
+    profile_command
+)
+from handlers.job_handlers import jobs_list_callback, job_cancel_callback
+from handlers.live_handlers import live_start_callback, live_stop_callback
 
 # التهيئة الأساسية للسجلات
 logging.basicConfig(
@@ -55,66 +89,154 @@ async def global_error_handler(update: object, context) -> None:
     except Exception:
         logger.exception("Failed to log exception in global_error_handler")
     try:
-        # notify admin if possible
-        if ADMIN_ID:
-            msg = f"⚠️ حدث خطأ في النظام: {context.error}"
-            await context.bot.send_message(chat_id=ADMIN_ID, text=msg)
+        # الأخطاء تُجمع حسب البصمة؛ الخطأ الجديد يُبلّغ فوراً والمتكرر في الملخص الدوري
+        if ERROR_DIGEST.record(context.error, update):
+            await ERROR_DIGEST.flush(context.bot, only_new=True)
     except Exception:
         logger.exception("Failed to notify admin about error")
 
-def main() -> None:
-    """Start the bot."""
-    # التأكد من وجود المجلدات الضرورية
-    os.makedirs(BOTS_DIR, exist_ok=True)
-    os.makedirs(BACKUPS_DIR, exist_ok=True)
-    
-    # تحميل الإعدادات
-    load_config()
-    
+async def post_init(application: Application) -> None:
+    """Starts background services that need the running event loop."""
+    ERROR_DIGEST.start(application.bot)
+    if api_proxy_enabled():
+        await API_PROXY.start()
+    if cpu_scheduler_enabled():
+        CPU_SCHEDULER.start()
+    if hibernation_enabled():
+        HIBERNATION.start()
+    if watchdog_enabled():
+        # قبل تشغيل البوتات حتى يكون مقبس النبضات جاهزاً
+        await WATCHDOG.start()
+    # البوتات التي كانت تعمل عند الإيقاف السابق تُشغَّل من جديد
+    asyncio.create_task(SHUTDOWN.restore())
+
+async def post_shutdown(application: Application) -> None:
+    """Stops the background services started in post_init and brings the hosted bots down."""
+    await CPU_SCHEDULER.stop()
+    await HIBERNATION.stop()
+    # المراقب لا يعيد تشغيل بوتات في طور الإيقاف
+    await WATCHDOG.stop()
+    # إيقاف (أو فصل) كل البوتات بمهلة واحدة، ثم أرشفة آخر السجلات وحفظ الإعدادات مرة واحدة
+    await SHUTDOWN.shutdown()
+    # البوتات قد تستخدم الوكيل حتى لحظة خروجها
+    await API_PROXY.stop()
+
+async def run_gateway(application: Application, path: str) -> None:
+    """Serves the platform bot and every hosted bot from the shared webhook gateway."""
+    async def feed_update(body: bytes) -> None:
+        await application.update_queue.put(Update.de_json(json.loads(body), application.bot))
+
+    WEBHOOK_GATEWAY.set_platform_handler(path, feed_update)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with application:
+        await post_init(application)
+        await application.start()
+        await WEBHOOK_GATEWAY.start()
+        await application.bot.set_webhook(WEBHOOK_URL, allowed_updates=Update.ALL_TYPES)
+        try:
+            await stop.wait()
+        finally:
+            await WEBHOOK_GATEWAY.stop()
+            await application.stop()
+            await post_shutdown(application)
+
+def build_application(token: str = BOT_TOKEN, base_url: str = None, base_file_url: str = None) -> Application:
+    """Builds the platform application with every handler registered.
+
+    ``base_url``/``base_file_url`` point it at another Bot API server, such as
+    the fake one used by the load harness.
+    """
     # بناء التطبيق
-    application = Application.builder().token(BOT_TOKEN).build()
+    # طلبات Bot API تمر عبر طبقة قياس تفصل زمن تلغرام عن زمن المعالجة المحلية
+    # التحديثات تُعالج بالتوازي؛ إجراءات البوت الواحد تُسلسل داخل مدير العمليات
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url).base_file_url(base_file_url or base_url)
+    application = builder.build()
 
     # إضافة المعالجات (Handlers)
     
     # الأوامر
     application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("profile", profile_command))
     
     # Callback Queries (Inline Buttons)
-    application.add_handler(CallbackQueryHandler(main_menu_callback, pattern=r"^MAIN_MENU$"))
-    application.add_handler(CallbackQueryHandler(bot_list_callback, pattern=r"^BOT_LIST$"))
-    application.add_handler(CallbackQueryHandler(bot_panel_callback, pattern=r"^BOT_PANEL\|"))
-    application.add_handler(CallbackQueryHandler(system_status_callback, pattern=r"^SYSTEM_STATUS$"))
-    application.add_handler(CallbackQueryHandler(backups_list_callback, pattern=r"^BACKUPS_LIST$"))
-    
-    application.add_handler(CallbackQueryHandler(handle_bot_action, pattern=r"^(START_BOT|STOP_BOT|RESTART_BOT)\|"))
-    application.add_handler(CallbackQueryHandler(delete_bot_confirm_callback, pattern=r"^DELETE_BOT_CONFIRM\|"))
-    application.add_handler(CallbackQueryHandler(delete_bot_callback, pattern=r"^DELETE_BOT\|"))
-    application.add_handler(CallbackQueryHandler(view_logs_callback, pattern=r"^VIEW_LOGS\|"))
-    application.add_handler(CallbackQueryHandler(backup_bot_callback, pattern=r"^BACKUP_BOT\|"))
-    
-    application.add_handler(CallbackQueryHandler(upload_bot_prompt_callback, pattern=r"^UPLOAD_BOT$"))
-    
-    application.add_handler(CallbackQueryHandler(file_manager_callback, pattern=r"^FILE_MANAGER\|"))
-    application.add_handler(CallbackQueryHandler(file_actions_callback, pattern=r"^FILE_ACTIONS\|"))
-    application.add_handler(CallbackQueryHandler(fm_download_callback, pattern=r"^FM_DOWNLOAD\|"))
-    application.add_handler(CallbackQueryHandler(fm_delete_confirm_callback, pattern=r"^FM_DELETE_CONFIRM\|"))
-    application.add_handler(CallbackQueryHandler(fm_delete_callback, pattern=r"^FM_DELETE\|"))
-    application.add_handler(CallbackQueryHandler(fm_upload_prompt_callback, pattern=r"^FM_UPLOAD_PROMPT\|"))
-    application.add_handler(CallbackQueryHandler(fm_create_dir_prompt_callback, pattern=r"^FM_CREATE_DIR_PROMPT\|"))
+    # معالج واحد يحلل بيانات الزر مرة واحدة ويوجهها حسب البادئة
+    # لكل تطبيق موجّه خاص به حتى يمكن بناء أكثر من تطبيق في نفس العملية
+    router = CallbackRouter()
+    router.register("MAIN_MENU", main_menu_callback)
+    router.register("BOT_LIST", bot_list_callback)
+    router.register("BOT_PANEL", bot_panel_callback, "bot_id")
+    router.register("SYSTEM_STATUS", system_status_callback)
+    router.register("HANDLER_STATS", handler_stats_callback)
+    router.register("BACKUPS_LIST", backups_list_callback)
+    router.register("BACKUP_VIEW", backup_view_callback, "bot_id", "backup_id")
+    router.register("BACKUP_RESTORE_CONFIRM", backup_restore_confirm_callback, "bot_id", "backup_id")
+    router.register("BACKUP_RESTORE", backup_restore_callback, "bot_id", "backup_id", block=False)
+    router.register("JOBS_LIST", jobs_list_callback)
+    router.register("JOB_CANCEL", job_cancel_callback, "job_id")
+    router.register("LIVE", live_start_callback, "screen", "target")
+    router.register("LIVE_STOP", live_stop_callback, "screen", "target")
+    # أي زر آخر على رسالة مباشرة ينهي وضع التحديث المباشر
+    router.hooks.append(LIVE_VIEWS.on_callback)
+    
+    for action in ("START_BOT", "STOP_BOT", "RESTART_BOT"):
+        router.register(action, handle_bot_action, "bot_id")
+    router.register("DELETE_BOT_CONFIRM", delete_bot_confirm_callback, "bot_id")
+    router.register("CPU_PRIORITY", cpu_priority_callback, "bot_id", block=False)
+    router.register("HIBERNATE_TOGGLE", hibernate_toggle_callback, "bot_id")
+    router.register("WATCHDOG_TOGGLE", watchdog_toggle_callback, "bot_id")
+    router.register("DELETE_BOT", delete_bot_callback, "bot_id", block=False)
+    router.register("VIEW_LOGS", view_logs_callback, "bot_id")
+    router.register("LOG_LIMIT", log_limit_callback, "bot_id")
+    router.register("LOG_ARCHIVE", log_archive_callback, "bot_id", "hours", block=False)
+    router.register("BACKUP_BOT", backup_bot_callback, "bot_id", block=False)
+    router.register("RELEASES", releases_callback, "bot_id")
+    router.register("RELEASE_ACTIVATE", release_activate_callback, "bot_id", "release_id", block=False)
+    router.register("CRASHES", crashes_callback, "bot_id")
+    router.register("CRASH_VIEW", crash_view_callback, "bot_id", "fingerprint")
+    router.register("PROFILE_MENU", profile_menu_callback, "bot_id")
+    router.register("PROFILE_RUN", profile_run_callback, "bot_id", "mode", block=False)
+    router.register("WEBHOOK_TOGGLE", webhook_toggle_callback, "bot_id", block=False)
+    
+    router.register("UPLOAD_BOT", upload_bot_prompt_callback)
+    
+    router.register("FILE_MANAGER", file_manager_callback, "bot_id", "path")
+    router.register("FILE_ACTIONS", file_actions_callback, "bot_id", "path")
+    router.register("FM_DOWNLOAD", fm_download_callback, "bot_id", "path")
+    router.register("FM_DELETE_CONFIRM", fm_delete_confirm_callback, "bot_id", "path")
+    router.register("FM_DELETE", fm_delete_callback, "bot_id", "path", block=False)
+    router.register("FM_UPLOAD_PROMPT", fm_upload_prompt_callback, "bot_id", "path")
+    router.register("FM_CREATE_DIR_PROMPT", fm_create_dir_prompt_callback, "bot_id", "path")
+    application.add_handler(router.handler())
     
     # الرسائل (Messages)
     # ملاحظة: تم استخدام فلاتر ADMIN_ID لضمان الأمان
     admin_filter = filters.User(ADMIN_ID)
     
     # ترتيب المعالجات مهم جداً لتجنب التداخل
+    # معالجات الرفع والنشر غير حاجبة حتى تبقى أزرار إلغاء المهام مستجيبة
     application.add_handler(MessageHandler(
         filters.Document.ALL & admin_filter, 
-        handle_bot_file_upload
+        handle_bot_file_upload,
+        block=False
     ), group=1)
     
     application.add_handler(MessageHandler(
         filters.TEXT & admin_filter & ~filters.COMMAND, 
-        handle_bot_token
+        handle_bot_token,
+        block=False
     ), group=1)
     
     application.add_handler(MessageHandler(
@@ -127,6 +249,24 @@ def main() -> None:
         handle_file_manager_file_input
     ), group=2)
     
+    # قياس زمن الاستجابة والأخطاء لكل معالج مسجل أعلاه
+    instrument_application(application)
+    
+    # register global error handler
+    application.add_error_handler(global_error_handler)
+    return application
+
+def main() -> None:
+    """Start the bot."""
+    # التأكد من وجود المجلدات الضرورية
+    os.makedirs(BOTS_DIR, exist_ok=True)
+    os.makedirs(BACKUPS_DIR, exist_ok=True)
+    
+    # تحميل الإعدادات
+    load_config()
+    
+    application = build_application()
+    
     logger.info("Starting Advanced Bot Hosting Platform...")
     
     # تشغيل خادم مراقبة الحالة في خيط منفصل
@@ -135,8 +275,6 @@ def main() -> None:
     logger.info("Health server is running on port 8000")
     
     # بدء تشغيل البوت
-    # register global error handler
-    application.add_error_handler(global_error_handler)
 
     if USE_WEBHOOK:
         # إذا لم يُحدد مسار ويب هوك محليًا، استخدم جزء التوكن كمسار افتراضي
@@ -144,6 +282,9 @@ def main() -> None:
         if not WEBHOOK_URL:
             logger.warning("WEBHOOK_URL غير مُحدد؛ سيتم الرجوع إلى Polling بدلاً من Webhook.")
             application.run_polling(allowed_updates=Update.ALL_TYPES)
+        elif gateway_enabled():
+            logger.info(f"Starting shared webhook gateway on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{path} -> {WEBHOOK_URL}")
+            asyncio.run(run_gateway(application, path))
         else:
             logger.info(f"Starting webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{path} -> {WEBHOOK_URL}")
             application.run_webhook(listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=path, webhook_url=WEBHOOK_URL)
@@ -0,0 +1,409 @@
+import os
+import json
+import zlib
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from concurrent.futures import Executor, as_completed
+from typing import Callable, Optional
+
+from config import BOTS_DIR, BACKUPS_DIR, BACKUP_KEEP_LAST, BACKUP_KEEP_DAILY, BACKUP_COMPRESSION_LEVEL
+from utils.file_utils import get_bot_path
+from utils.release_store import build_release
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Blobs that do not shrink by at least this factor are stored uncompressed
+MIN_COMPRESSION_GAIN = 0.9
+SKIP_DIRS = {'__pycache__', '.git'}
+COMPRESSED_SUFFIX = '.z'
+
+# Serialises manifest commits against garbage collection
+_STORE_LOCK = threading.RLock()
+
+ProgressCallback = Callable[[int, int, int, int], None]
+
+
+def _objects_dir(store_root: str) -> str:
+    return os.path.join(store_root, 'objects')
+
+
+def _manifests_dir(store_root: str, bot_id: str = "") -> str:
+    return os.path.join(store_root, 'manifests', bot_id)
+
+
+def blob_path(digest: str, store_root: str = BACKUPS_DIR) -> str | None:
+    """Returns the on-disk path of a stored blob (compressed or raw), or None if missing."""
+    base = os.path.join(_objects_dir(store_root), digest[:2], digest)
+    for path in (base + COMPRESSED_SUFFIX, base):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _store_blob(src_path: str, store_root: str) -> tuple[str, int, bool]:
+    """Hashes and compresses a file in one pass; returns (digest, stored_bytes, is_new)."""
+    objects = _objects_dir(store_root)
+    os.makedirs(objects, exist_ok=True)
+    hasher = hashlib.sha256()
+    compressor = zlib.compressobj(BACKUP_COMPRESSION_LEVEL)
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(prefix='blob_', dir=objects)
+    try:
+        with os.fdopen(fd, 'wb') as tmp, open(src_path, 'rb') as src:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                hasher.update(chunk)
+                tmp.write(compressor.compress(chunk))
+            tmp.write(compressor.flush())
+
+        digest = hasher.hexdigest()
+        if blob_path(digest, store_root):
+            os.remove(tmp_path)
+            return digest, 0, False
+
+        target = os.path.join(objects, digest[:2], digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        stored = os.path.getsize(tmp_path)
+        if size and stored >= size * MIN_COMPRESSION_GAIN:
+            # Incompressible data (images, archives) is kept raw so it can be hardlinked
+            os.remove(tmp_path)
+            with open(src_path, 'rb') as src, open(target + '.tmp', 'wb') as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    dst.write(chunk)
+            os.replace(target + '.tmp', target)
+            return digest, size, True
+
+        os.replace(tmp_path, target + COMPRESSED_SUFFIX)
+        return digest, stored, True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_blob(digest: str, store_root: str = BACKUPS_DIR):
+    """Yields the decompressed content of a blob in chunks."""
+    path = blob_path(digest, store_root)
+    if path is None:
+        raise FileNotFoundError(f"Blob {digest} is missing from the backup store")
+    decompressor = zlib.decompressobj() if path.endswith(COMPRESSED_SUFFIX) else None
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield decompressor.decompress(chunk) if decompressor else chunk
+    if decompressor:
+        yield decompressor.flush()
+
+
+def walk_tree(root: str) -> dict[str, os.stat_result]:
+    """Returns {relative_path: stat} for every regular file under root."""
+    entries = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            if os.path.islink(fp):
+                continue
+            try:
+                st = os.stat(fp)
+            except OSError:
+                continue
+            entries[os.path.relpath(fp, root).replace(os.sep, '/')] = st
+    return entries
+
+
+def list_backups(bot_id: str, store_root: str = BACKUPS_DIR) -> list[str]:
+    """Returns the backup ids of a bot, newest first."""
+    path = _manifests_dir(store_root, bot_id)
+    if not os.path.isdir(path):
+        return []
+    return sorted((f[:-5] for f in os.listdir(path) if f.endswith('.json')), reverse=True)
+
+
+def list_all_backups(store_root: str = BACKUPS_DIR) -> dict[str, list[str]]:
+    """Returns {bot_id: [backup ids, newest first]} for every bot in the store."""
+    path = _manifests_dir(store_root)
+    if not os.path.isdir(path):
+        return {}
+    return {bot_id: list_backups(bot_id, store_root) for bot_id in sorted(os.listdir(path))}
+
+
+def load_manifest(bot_id: str, backup_id: str, store_root: str = BACKUPS_DIR) -> dict:
+    with open(os.path.join(_manifests_dir(store_root, bot_id), f"{backup_id}.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest: dict, store_root: str) -> None:
+    path = _manifests_dir(store_root, manifest['bot_id'])
+    os.makedirs(path, exist_ok=True)
+    target = os.path.join(path, f"{manifest['backup_id']}.json")
+    with open(target + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(target + '.tmp', target)
+
+
+def _new_backup_id(bot_id: str, store_root: str) -> str:
+    backup_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    existing = set(list_backups(bot_id, store_root))
+    suffix = 1
+    candidate = backup_id
+    while candidate in existing:
+        suffix += 1
+        candidate = f"{backup_id}_{suffix}"
+    return candidate
+
+
+def backup_tree(bot_id: str, src_root: str, store_root: str = BACKUPS_DIR,
+                progress: Optional[ProgressCallback] = None, executor: Optional[Executor] = None) -> dict:
+    """Stores an incremental, deduplicated backup of src_root and returns its manifest.
+
+    New or modified files are hashed and compressed on ``executor`` when given
+    (typically a process pool), otherwise in the calling thread.
+    """
+    started = time.monotonic()
+    tree = walk_tree(src_root)
+    total_bytes = sum(st.st_size for st in tree.values())
+
+    previous = {}
+    history = list_backups(bot_id, store_root)
+    if history:
+        try:
+            previous = load_manifest(bot_id, history[0], store_root)['files']
+        except (OSError, ValueError, KeyError):
+            previous = {}
+
+    files = {}
+    changed = []
+    counters = {'done_bytes': 0, 'new_blobs': 0, 'stored_bytes': 0}
+
+    def _record(rel: str, st: os.stat_result, digest: str) -> None:
+        files[rel] = {'hash': digest, 'size': st.st_size, 'mtime': st.st_mtime, 'mode': st.st_mode & 0o7777}
+        counters['done_bytes'] += st.st_size
+        if progress:
+            progress(counters['done_bytes'], total_bytes, len(files), len(tree))
+
+    def _stored(result: tuple[str, int, bool]) -> str:
+        digest, stored, is_new = result
+        counters['new_blobs'] += is_new
+        counters['stored_bytes'] += stored
+        return digest
+
+    with _STORE_LOCK:
+        for rel, st in sorted(tree.items()):
+            old = previous.get(rel)
+            # Unchanged files (same size and mtime) reuse the previous hash without being read
+            if old and old['size'] == st.st_size and old['mtime'] == st.st_mtime and blob_path(old['hash'], store_root):
+                _record(rel, st, old['hash'])
+            else:
+                changed.append((rel, st))
+
+        if executor is not None and len(changed) > 1:
+            # Hashing and compression are CPU bound, so they are fanned out to the given pool
+            futures = {executor.submit(_store_blob, os.path.join(src_root, rel), store_root): (rel, st)
+                       for rel, st in changed}
+            try:
+                for future in as_completed(futures):
+                    rel, st = futures[future]
+                    _record(rel, st, _stored(future.result()))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        else:
+            for rel, st in changed:
+                _record(rel, st, _stored(_store_blob(os.path.join(src_root, rel), store_root)))
+
+        files = dict(sorted(files.items()))
+        manifest = {
+            'bot_id': bot_id,
+            'backup_id': _new_backup_id(bot_id, store_root),
+            'created_at': datetime.now().isoformat(),
+            'total_size': total_bytes,
+            'new_blobs': counters['new_blobs'],
+            'stored_bytes': counters['stored_bytes'],
+            'files': files,
+        }
+        _write_manifest(manifest, store_root)
+
+    logger.info(
+        f"Backup {manifest['backup_id']} of bot {bot_id}: {len(files)} files, "
+        f"{manifest['new_blobs']} new blobs, {manifest['stored_bytes']} bytes stored in {time.monotonic() - started:.2f}s"
+    )
+    return manifest
+
+
+def apply_retention(bot_id: str, keep_last: int = BACKUP_KEEP_LAST, keep_daily: int = BACKUP_KEEP_DAILY,
+                    store_root: str = BACKUPS_DIR) -> list[str]:
+    """Deletes manifests outside the retention policy and returns the removed backup ids.
+
+    The newest ``keep_last`` backups are kept, plus the newest backup of each of
+    the last ``keep_daily`` days that have backups.
+    """
+    backups = list_backups(bot_id, store_root)
+    keep = set(backups[:keep_last])
+    days_seen = []
+    for backup_id in backups:
+        day = backup_id[:8]
+        if day not in days_seen:
+            days_seen.append(day)
+            if len(days_seen) <= keep_daily:
+                keep.add(backup_id)
+
+    removed = []
+    with _STORE_LOCK:
+        for backup_id in backups:
+            if backup_id not in keep:
+                os.remove(os.path.join(_manifests_dir(store_root, bot_id), f"{backup_id}.json"))
+                removed.append(backup_id)
+    return removed
+
+
+def gc_blobs(store_root: str = BACKUPS_DIR) -> tuple[int, int]:
+    """Removes blobs no manifest references; returns (blobs_removed, bytes_freed)."""
+    with _STORE_LOCK:
+        referenced = set()
+        for bot_id, backups in list_all_backups(store_root).items():
+            for backup_id in backups:
+                try:
+                    manifest = load_manifest(bot_id, backup_id, store_root)
+                except (OSError, ValueError):
+                    logger.warning(f"Skipping unreadable manifest {bot_id}/{backup_id} during GC")
+                    # Without the manifest we cannot know what is safe to delete
+                    return 0, 0
+                referenced.update(entry['hash'] for entry in manifest['files'].values())
+
+        removed = freed = 0
+        objects = _objects_dir(store_root)
+        if not os.path.isdir(objects):
+            return 0, 0
+        for dirpath, _, filenames in os.walk(objects):
+            for f in filenames:
+                digest = f[:-len(COMPRESSED_SUFFIX)] if f.endswith(COMPRESSED_SUFFIX) else f
+                if digest in referenced:
+                    continue
+                fp = os.path.join(dirpath, f)
+                freed += os.path.getsize(fp)
+                os.remove(fp)
+                removed += 1
+
+    if removed:
+        logger.info(f"Backup GC removed {removed} blobs ({freed} bytes)")
+    return removed, freed
+
+
+def create_backup(bot_id: str, progress: Optional[ProgressCallback] = None,
+                  executor: Optional[Executor] = None) -> dict | None:
+    """Backs up a bot's files, then applies the retention policy and collects orphaned blobs."""
+    try:
+        bot_path = get_bot_path(bot_id)
+        if not os.path.exists(bot_path):
+            return None
+        manifest = backup_tree(bot_id, bot_path, progress=progress, executor=executor)
+        if apply_retention(bot_id):
+            gc_blobs()
+        return manifest
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to create backup for bot {bot_id}: {e}")
+        return None
+
+
+def diff_against_tree(manifest: dict, root: str) -> dict[str, list[str]]:
+    """Compares a manifest with a live tree using only file metadata (no content reads).
+
+    ``missing`` files exist only in the backup, ``extra`` only in the live tree,
+    ``changed`` differ in size or mtime and ``unchanged`` match on both.
+    """
+    live = walk_tree(root) if os.path.isdir(root) else {}
+    files = manifest['files']
+    diff = {'missing': [], 'extra': [], 'changed': [], 'unchanged': []}
+    for rel, entry in files.items():
+        st = live.get(rel)
+        if st is None:
+            diff['missing'].append(rel)
+        elif st.st_size == entry['size'] and st.st_mtime == entry['mtime']:
+            diff['unchanged'].append(rel)
+        else:
+            diff['changed'].append(rel)
+    diff['extra'] = sorted(rel for rel in live if rel not in files)
+    return diff
+
+
+def diff_manifests(old: dict, new: dict) -> dict[str, list[str]]:
+    """Compares two manifests by content hash."""
+    old_files, new_files = old['files'], new['files']
+    return {
+        'added': sorted(rel for rel in new_files if rel not in old_files),
+        'removed': sorted(rel for rel in old_files if rel not in new_files),
+        'changed': sorted(rel for rel in new_files
+                          if rel in old_files and new_files[rel]['hash'] != old_files[rel]['hash']),
+    }
+
+
+def _file_digest(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _write_restored_file(target: str, entry: dict, store_root: str) -> None:
+    """Materialises one manifest entry at target as a new file of its own."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as dst:
+        for chunk in read_blob(entry['hash'], store_root):
+            dst.write(chunk)
+    os.chmod(target, entry['mode'])
+    os.utime(target, (entry['mtime'], entry['mtime']))
+
+
+def restore_tree(bot_id: str, backup_id: str, dest_root: str, store_root: str = BACKUPS_DIR,
+                 progress: Optional[ProgressCallback] = None) -> dict:
+    """Writes every file of a backup into dest_root, a new staging directory.
+
+    Files are always copied out of the store, never hardlinked, so nothing
+    done to the restored tree can reach a stored blob.
+    """
+    manifest = load_manifest(bot_id, backup_id, store_root)
+    files = manifest['files']
+    if os.path.exists(dest_root) and os.listdir(dest_root):
+        raise ValueError(f"Restore target {dest_root} is not empty")
+    stats = {'written': 0, 'bytes_written': 0}
+    total_bytes = sum(entry['size'] for entry in files.values())
+
+    with _STORE_LOCK:
+        for index, (rel, entry) in enumerate(sorted(files.items()), start=1):
+            _write_restored_file(os.path.join(dest_root, *rel.split('/')), entry, store_root)
+            stats['written'] += 1
+            stats['bytes_written'] += entry['size']
+            if progress:
+                progress(stats['bytes_written'], total_bytes, index, len(files))
+
+    logger.info(f"Restored backup {backup_id} of bot {bot_id} into {dest_root}: {stats}")
+    return stats
+
+
+def restore_release(bot_id: str, backup_id: str, store_root: str = BACKUPS_DIR,
+                    progress: Optional[ProgressCallback] = None) -> dict:
+    """Builds a new, inactive release of the bot from a backup.
+
+    Returns the restore stats plus ``release_id``; the caller stops the bot
+    and publishes the release. Unchanged files share the existing release
+    objects, and the previous release stays available for rollback.
+    """
+    staging = tempfile.mkdtemp(prefix=f'restore_{bot_id}_', dir=BOTS_DIR)
+    try:
+        stats = restore_tree(bot_id, backup_id, staging, store_root, progress=progress)
+        stats['release_id'] = build_release(bot_id, staging, source='backup')
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return stats
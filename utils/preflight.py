@@ -0,0 +1,179 @@
+import os
+import ast
+import sys
+import time
+import json
+import logging
+import py_compile
+import subprocess
+import importlib.util
+from dataclasses import dataclass, field
+from concurrent.futures import Executor, as_completed
+from typing import Callable, Optional
+
+from config import PREFLIGHT_CHUNK_FILES, PREFLIGHT_IMPORT_TIMEOUT, PREFLIGHT_MAX_FILE_SIZE
+from utils.token_scanner import SKIP_DIRS, VENDOR_DIRS
+
+logger = logging.getLogger(__name__)
+
+# Runs under the bot's interpreter and prints the names it cannot find. The working directory entry
+# -c puts first on sys.path is dropped; find_spec on a top-level name locates it without importing it.
+_RESOLVE_SCRIPT = (
+    "import sys, json, importlib.util\n"
+    "sys.path.pop(0)\n"
+    "names = json.load(sys.stdin)\n"
+    "print(json.dumps([n for n in names if importlib.util.find_spec(n) is None]))\n"
+)
+
+
+@dataclass
+class PreflightReport:
+    """Outcome of byte-compiling and checking a release before it is started."""
+    files: int = 0
+    compiled: int = 0
+    # (path, line, message); vendored files are reported apart because they rarely run
+    syntax_errors: list[tuple[str, int, str]] = field(default_factory=list)
+    vendored_errors: list[tuple[str, int, str]] = field(default_factory=list)
+    # top-level module -> files importing it
+    unresolved: dict[str, list[str]] = field(default_factory=dict)
+    compile_seconds: float = 0.0
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.syntax_errors
+
+    def render(self, limit: int = 10) -> str:
+        text = f"🧪 فحص ما قبل التشغيل: {self.files} ملف بايثون في {self.seconds:.2f}s\n" \
+               f"تُرجم مسبقاً: {self.compiled} (يوفر حتى {self.compile_seconds * 1000:.0f}ms من الترجمة عند أول تشغيل)\n"
+        if self.syntax_errors:
+            text += f"\n❌ أخطاء صياغة ({len(self.syntax_errors)}):\n"
+            text += "\n".join(f"• {path}:{line}: {message}" for path, line, message in self.syntax_errors[:limit])
+            text += "\n"
+        if self.vendored_errors:
+            text += f"\n⚠️ أخطاء صياغة في مكتبات مضمّنة: {len(self.vendored_errors)} (أولها " \
+                    f"{self.vendored_errors[0][0]}:{self.vendored_errors[0][1]})\n"
+        if self.unresolved:
+            text += f"\n⚠️ وحدات غير مثبتة ({len(self.unresolved)}):\n"
+            text += "\n".join(f"• {name} ← {', '.join(files[:3])}"
+                              for name, files in sorted(self.unresolved.items())[:limit])
+            text += "\n"
+        return text
+
+
+def _is_vendored(rel_path: str) -> bool:
+    return any(part.lower() in VENDOR_DIRS for part in rel_path.replace('\\', '/').split('/')[:-1])
+
+
+def _top_level_imports(tree: ast.Module) -> set[str]:
+    """Absolute imports made directly in the module body; guarded or lazy imports are left out."""
+    names = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names.add(node.module.split('.')[0])
+    names.discard('__future__')
+    return names
+
+
+def _compile_chunk(root: str, rel_paths: list[str]) -> list[tuple[str, Optional[tuple[int, str]], list[str], float]]:
+    """Worker: parses and byte-compiles each file; returns (path, syntax error, imports, seconds)."""
+    results = []
+    for rel in rel_paths:
+        path = os.path.join(root, rel)
+        started = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                tree = ast.parse(f.read(), filename=rel)
+            # Bots run without -O, so the plain (non-optimized) cache file is the one they load
+            py_compile.compile(path, cfile=importlib.util.cache_from_source(path, optimization=''),
+                               doraise=True, optimize=0)
+            results.append((rel, None, sorted(_top_level_imports(tree)), time.perf_counter() - started))
+        except SyntaxError as e:
+            results.append((rel, (e.lineno or 0, e.msg or str(e)), [], time.perf_counter() - started))
+        except (py_compile.PyCompileError, OSError, ValueError) as e:
+            logger.debug(f"Preflight could not compile {rel}: {e}")
+            results.append((rel, None, [], time.perf_counter() - started))
+    return results
+
+
+def _local_names(root: str, rel_paths: list[str]) -> set[str]:
+    """Module names the bot provides itself: every .py file and every directory holding one."""
+    names = set()
+    for rel in rel_paths:
+        parts = rel.replace('\\', '/').split('/')
+        names.add(parts[-1][:-3])
+        names.update(parts[:-1])
+    # Extension modules shipped with the bot (e.g. name.cpython-311-x86_64-linux-gnu.so)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        names.update(f.split('.', 1)[0] for f in filenames if f.endswith(('.so', '.pyd')))
+    return names
+
+
+def _unresolved(names: set[str], interpreter: str) -> set[str]:
+    """Names the bot's interpreter cannot find, checked in a child process so the platform's own modules don't count."""
+    candidates = sorted(n for n in names if n not in sys.builtin_module_names and n not in sys.stdlib_module_names)
+    if not candidates:
+        return set()
+    result = subprocess.run([interpreter, '-c', _RESOLVE_SCRIPT], input=json.dumps(candidates), capture_output=True,
+                            text=True, timeout=PREFLIGHT_IMPORT_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"import check failed: {result.stderr.strip()[-300:]}")
+    return set(json.loads(result.stdout))
+
+
+def run_preflight(root: str, executor: Executor, interpreter: str = sys.executable,
+                  progress: Optional[Callable[[int, int], None]] = None) -> PreflightReport:
+    """Byte-compiles every .py file under root on ``executor`` and checks syntax and imports.
+
+    The ``__pycache__`` files are written next to the sources, so the first
+    start of the release loads bytecode instead of compiling. Files are
+    handed to the pool in chunks of PREFLIGHT_CHUNK_FILES; ``progress`` is
+    called after each chunk. Blocking: run it as a job.
+    """
+    started = time.perf_counter()
+    report = PreflightReport()
+    rel_paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            if f.endswith('.py') and not os.path.islink(fp) and os.path.getsize(fp) <= PREFLIGHT_MAX_FILE_SIZE:
+                rel_paths.append(os.path.relpath(fp, root))
+    report.files = len(rel_paths)
+
+    chunks = [rel_paths[i:i + PREFLIGHT_CHUNK_FILES] for i in range(0, len(rel_paths), PREFLIGHT_CHUNK_FILES)]
+    futures = [executor.submit(_compile_chunk, root, chunk) for chunk in chunks]
+    imports: dict[str, list[str]] = {}
+    done = 0
+    try:
+        for future in as_completed(futures):
+            for rel, error, names, seconds in future.result():
+                report.compile_seconds += seconds
+                if error:
+                    (report.vendored_errors if _is_vendored(rel) else report.syntax_errors).append((rel, *error))
+                    continue
+                report.compiled += 1
+                if not _is_vendored(rel):
+                    for name in names:
+                        imports.setdefault(name, []).append(rel)
+            done += 1
+            if progress:
+                progress(done, len(chunks))
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    try:
+        missing = _unresolved(set(imports) - _local_names(root, rel_paths), interpreter)
+        report.unresolved = {name: sorted(imports[name]) for name in missing}
+    except (OSError, ValueError, RuntimeError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"Preflight import check skipped for {root}: {e}")
+    report.syntax_errors.sort()
+    report.seconds = time.perf_counter() - started
+    logger.info(f"Preflight of {root}: {report.compiled}/{report.files} compiled, {len(report.syntax_errors)} syntax "
+                f"errors, {len(report.unresolved)} unresolved imports in {report.seconds:.2f}s")
+    return report
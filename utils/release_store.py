@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from typing import Callable, Optional
+
+from config import BOTS_DIR, RELEASES_DIR, RELEASE_KEEP, RELEASE_MUTABLE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+SKIP_DIRS = {'__pycache__', '.git'}
+PARTIAL_SUFFIX = '.partial'
+
+
+def _objects_dir() -> str:
+    return os.path.join(RELEASES_DIR, 'objects')
+
+
+def _bot_releases_dir(bot_id: str) -> str:
+    return os.path.join(RELEASES_DIR, bot_id)
+
+
+def live_path(bot_id: str) -> str:
+    return os.path.abspath(os.path.join(BOTS_DIR, bot_id))
+
+
+def release_path(bot_id: str, release_id: str) -> str:
+    return os.path.abspath(os.path.join(_bot_releases_dir(bot_id), release_id))
+
+
+def _file_digest(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_mutable(rel_path: str) -> bool:
+    """Data files a bot may rewrite at runtime are copied instead of hardlinked."""
+    return rel_path.lower().endswith(RELEASE_MUTABLE_EXTENSIONS)
+
+
+def _inodes_shareable() -> bool:
+    # Read-only objects stop in-place writes only for unprivileged bots; root ignores the mode bits
+    return hasattr(os, 'geteuid') and os.geteuid() != 0
+
+
+def _intern_file(src: str, dst: str) -> bool:
+    """Places src at dst through the object store; returns True if an existing object was reused."""
+    if not _inodes_shareable():
+        shutil.copy2(src, dst)
+        return False
+    digest = _file_digest(src)
+    obj = os.path.join(_objects_dir(), digest[:2], digest)
+    reused = os.path.exists(obj)
+    try:
+        if not reused:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            try:
+                os.link(src, obj)
+                # Shared inodes must not be rewritten in place, so objects are read-only
+                os.chmod(obj, os.stat(obj).st_mode & ~0o222)
+            except FileExistsError:
+                reused = True
+        os.link(obj, dst)
+    except OSError as e:
+        # Different filesystem or no hardlink support: fall back to a plain copy
+        logger.debug(f"Hardlink failed for {src}: {e}")
+        shutil.copy2(src, dst)
+    return reused
+
+
+def _walk_files(root: str) -> list[str]:
+    """Relative paths of the regular files under root, without caches and VCS folders."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        rel_dir = os.path.relpath(dirpath, root)
+        for f in filenames:
+            if not os.path.islink(os.path.join(dirpath, f)):
+                files.append(os.path.normpath(os.path.join(rel_dir, f)))
+    return files
+
+
+def _new_release_id(bot_id: str) -> str:
+    release_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    while os.path.exists(release_path(bot_id, release_id)):
+        release_id = f"{release_id}_1"
+    return release_id
+
+
+def _write_meta(bot_id: str, release_id: str, source: str, files: int, reused: int,
+                uploaded: Optional[list[str]]) -> None:
+    meta = {
+        'release_id': release_id,
+        'created_at': datetime.now().isoformat(),
+        'source': source,
+        'files': files,
+        'reused_objects': reused,
+        # Files that came with the upload; everything else in the release is runtime data
+        'uploaded': uploaded,
+    }
+    with open(release_path(bot_id, release_id) + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def _update_meta(bot_id: str, release_id: str, **changes) -> None:
+    meta = _read_meta(bot_id, release_id)
+    if not meta:
+        return
+    for key, value in changes.items():
+        if value is None:
+            meta.pop(key, None)
+        else:
+            meta[key] = value
+    with open(release_path(bot_id, release_id) + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def _read_meta(bot_id: str, release_id: str) -> dict:
+    try:
+        with open(release_path(bot_id, release_id) + '.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def create_release(bot_id: str, src_root: str, source: str = 'upload',
+                   progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Builds a release directory from src_root and returns its id.
+
+    Identical files across releases and bots share one inode from the object
+    store (unless the platform runs as root). Files matching
+    RELEASE_MUTABLE_EXTENSIONS are copied instead. The release holds only the
+    upload; runtime data is moved in when it is activated.
+    """
+    started = time.monotonic()
+    release_id = _new_release_id(bot_id)
+    target = release_path(bot_id, release_id) + PARTIAL_SUFFIX
+    os.makedirs(target, exist_ok=True)
+
+    entries = _walk_files(src_root)
+    reused = 0
+    try:
+        for index, rel in enumerate(entries, start=1):
+            src, dst = os.path.join(src_root, rel), os.path.join(target, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if is_mutable(rel):
+                shutil.copy2(src, dst)
+            else:
+                reused += _intern_file(src, dst)
+            if progress:
+                progress(index, len(entries))
+        os.replace(target, release_path(bot_id, release_id))
+    except BaseException:
+        shutil.rmtree(target, ignore_errors=True)
+        raise
+
+    _write_meta(bot_id, release_id, source, len(entries), reused, sorted(entries))
+    logger.info(f"Release {release_id} of bot {bot_id}: {len(entries)} files, {reused} reused objects "
+                f"in {time.monotonic() - started:.2f}s")
+    return release_id
+
+
+def _code_files(bot_id: str, release_id: str) -> tuple[set[str], set[str]]:
+    """(code files, uploaded files) of a release.
+
+    Code is what came with the upload, minus data files the bot may rewrite.
+    Releases migrated from a legacy directory have no upload list, so only
+    their Python files count as code.
+    """
+    uploaded = _read_meta(bot_id, release_id).get('uploaded')
+    if uploaded is None:
+        return {rel for rel in _walk_files(release_path(bot_id, release_id)) if rel.endswith('.py')}, set()
+    return {rel for rel in uploaded if not is_mutable(rel)}, set(uploaded)
+
+
+def _sync_runtime_data(bot_id: str, source_id: str, target_id: str, keep_uploaded_data: bool) -> int:
+    """Makes the runtime data of release target_id that of release source_id; returns the files copied.
+
+    Runtime data is every file that is not code: whatever the bot created
+    (databases, sessions, sqlite journals, its own configs) and uploaded data
+    files it may have rewritten. The source's copy wins unless the target
+    brings its own from a fresh upload and ``keep_uploaded_data`` is set.
+    Stale runtime files the target kept from its earlier life are removed.
+    """
+    source_root, target_root = release_path(bot_id, source_id), release_path(bot_id, target_id)
+    source_code, _ = _code_files(bot_id, source_id)
+    target_code, target_uploaded = _code_files(bot_id, target_id)
+    protected = target_code | (target_uploaded if keep_uploaded_data else set())
+    data = set(_walk_files(source_root)) - source_code - protected
+
+    for rel in data:
+        dst = os.path.join(target_root, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        # Written next to the destination and swapped in, never into an existing inode
+        tmp = f"{dst}.{os.getpid()}.sync"
+        shutil.copy2(os.path.join(source_root, rel), tmp)
+        os.replace(tmp, dst)
+    if _read_meta(bot_id, target_id).get('uploaded') is not None:
+        for rel in set(_walk_files(target_root)) - target_uploaded - data:
+            os.remove(os.path.join(target_root, rel))
+    return len(data)
+
+
+def current_release(bot_id: str) -> str | None:
+    """Returns the id of the release the live path points to, or None for legacy/missing bots."""
+    path = live_path(bot_id)
+    if not os.path.islink(path):
+        return None
+    return os.path.basename(os.path.realpath(path))
+
+
+def _legacy_aside_path(bot_id: str) -> str:
+    return os.path.join(BOTS_DIR, f".{bot_id}.legacy")
+
+
+def _migrate_legacy_dir(bot_id: str) -> None:
+    """Turns a plain hosted_bots/<id> directory into the bot's first release.
+
+    The directory is moved, never deleted: a bot still running from it keeps
+    its working directory and open files.
+    """
+    path = live_path(bot_id)
+    if os.path.islink(path) or not os.path.isdir(path):
+        return
+    release_id = _new_release_id(bot_id)
+    os.makedirs(_bot_releases_dir(bot_id), exist_ok=True)
+    try:
+        os.rename(path, release_path(bot_id, release_id))
+        _write_meta(bot_id, release_id, 'legacy', len(_walk_files(release_path(bot_id, release_id))), 0, None)
+    except OSError as e:
+        # Releases on another filesystem: copy, and keep the old directory aside until the bot is deleted
+        logger.debug(f"Could not move legacy directory of bot {bot_id}: {e}")
+        release_id = create_release(bot_id, path, source='legacy')
+        meta = _read_meta(bot_id, release_id)
+        # Nothing tells the bot's code from its data here, so no upload list is recorded
+        _write_meta(bot_id, release_id, 'legacy', meta['files'], meta['reused_objects'], None)
+        os.rename(path, _legacy_aside_path(bot_id))
+    _swap_link(bot_id, release_id)
+    logger.info(f"Migrated legacy directory of bot {bot_id} to release {release_id}")
+
+
+def _swap_link(bot_id: str, release_id: str) -> None:
+    path = live_path(bot_id)
+    tmp_link = os.path.join(os.path.dirname(path), f".{bot_id}.swap")
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.relpath(release_path(bot_id, release_id), os.path.dirname(path)), tmp_link)
+    os.replace(tmp_link, path)
+
+
+def activate_release(bot_id: str, release_id: str, keep_uploaded_data: bool = False,
+                     carry_data: bool = True) -> None:
+    """Moves the bot's runtime data into a release and atomically points the live symlink at it.
+
+    Data is carried on every switch, so switching back to an older release
+    keeps the bot's current databases instead of the old release's copy.
+    Without ``carry_data`` the release runs with exactly the files it holds
+    (a restored backup). Stop the bot first, or writes made during the
+    switch are lost.
+    """
+    if not os.path.isdir(release_path(bot_id, release_id)):
+        raise FileNotFoundError(f"Release {release_id} of bot {bot_id} does not exist")
+    _migrate_legacy_dir(bot_id)
+    previous = current_release(bot_id)
+    # A held release was never live, so like a fresh deploy it keeps the data files it was uploaded with
+    keep_uploaded_data = keep_uploaded_data or bool(_read_meta(bot_id, release_id).get('held'))
+    if carry_data and previous and previous != release_id and os.path.isdir(release_path(bot_id, previous)):
+        copied = _sync_runtime_data(bot_id, previous, release_id, keep_uploaded_data)
+        logger.info(f"Bot {bot_id}: {copied} runtime data files moved from release {previous} to {release_id}")
+    _swap_link(bot_id, release_id)
+    _update_meta(bot_id, release_id, held=None)
+    logger.info(f"Bot {bot_id} now runs release {release_id}")
+
+
+def build_release(bot_id: str, src_root: str, source: str = 'upload',
+                  progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Creates a release from src_root without activating it."""
+    _migrate_legacy_dir(bot_id)
+    return create_release(bot_id, src_root, source=source, progress=progress)
+
+
+def publish_release(bot_id: str, release_id: str, carry_data: bool = True) -> None:
+    """Swaps a freshly built release live, keeping data files it was uploaded with, and prunes old releases."""
+    activate_release(bot_id, release_id, keep_uploaded_data=True, carry_data=carry_data)
+    prune_releases(bot_id)
+
+
+def hold_release(bot_id: str, release_id: str) -> list[str]:
+    """Keeps a built release that was not published (e.g. blocked by preflight) and prunes.
+
+    Only the newest held release is kept, so repeated failed uploads do not
+    pile up; it stays listed and can still be activated by hand.
+    """
+    active = current_release(bot_id)
+    removed = []
+    for meta in list_releases(bot_id):
+        if meta.get('held') and meta['release_id'] not in (release_id, active):
+            shutil.rmtree(release_path(bot_id, meta['release_id']), ignore_errors=True)
+            os.remove(release_path(bot_id, meta['release_id']) + '.json')
+            removed.append(meta['release_id'])
+    _update_meta(bot_id, release_id, held=True)
+    pruned = prune_releases(bot_id)
+    if removed and not pruned:
+        gc_objects()
+    return removed + pruned
+
+
+def deploy(bot_id: str, src_root: str, source: str = 'upload',
+           progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Creates a release from src_root, swaps it live and prunes old releases."""
+    release_id = build_release(bot_id, src_root, source=source, progress=progress)
+    publish_release(bot_id, release_id)
+    return release_id
+
+
+def list_releases(bot_id: str) -> list[dict]:
+    """Returns release metadata, newest first."""
+    root = _bot_releases_dir(bot_id)
+    if not os.path.isdir(root):
+        return []
+    releases = []
+    for name in os.listdir(root):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                releases.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(releases, key=lambda r: r['release_id'], reverse=True)
+
+
+def prune_releases(bot_id: str, keep: int = RELEASE_KEEP) -> list[str]:
+    """Deletes the oldest releases beyond ``keep`` (never the live one) and collects orphaned objects."""
+    active = current_release(bot_id)
+    removed = []
+    for meta in list_releases(bot_id)[keep:]:
+        release_id = meta['release_id']
+        if release_id == active:
+            continue
+        shutil.rmtree(release_path(bot_id, release_id), ignore_errors=True)
+        os.remove(release_path(bot_id, release_id) + '.json')
+        removed.append(release_id)
+    if removed:
+        gc_objects()
+    return removed
+
+
+def gc_objects() -> int:
+    """Removes store objects no release links to any more (link count of 1)."""
+    removed = 0
+    objects = _objects_dir()
+    if not os.path.isdir(objects):
+        return 0
+    for dirpath, _, filenames in os.walk(objects):
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            try:
+                if os.stat(fp).st_nlink == 1:
+                    os.remove(fp)
+                    removed += 1
+            except OSError:
+                continue
+    if removed:
+        logger.info(f"Release GC removed {removed} unreferenced objects")
+    return removed
+
+
+def delete_bot_files(bot_id: str) -> None:
+    """Removes a bot's live path and all of its releases."""
+    path = live_path(bot_id)
+    if os.path.islink(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+    shutil.rmtree(_legacy_aside_path(bot_id), ignore_errors=True)
+    shutil.rmtree(_bot_releases_dir(bot_id), ignore_errors=True)
+    gc_objects()
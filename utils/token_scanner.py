@@ -0,0 +1,200 @@
+import os
+import re
+import mmap
+import logging
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN_BYTES = re.compile(rb'(\d+:[a-zA-Z0-9_-]{20,})')
+# Real Bot API tokens: numeric bot id followed by a 35 character secret
+VALID_TOKEN_PATTERN = re.compile(r'^\d{5,16}:[a-zA-Z0-9_-]{35}$')
+
+ENTRY_POINT_NAMES = ('main.py', 'bot.py', 'run.py', 'app.py')
+CONFIG_NAMES = ('config.py', 'settings.py', 'constants.py', '.env')
+CONFIG_EXTENSIONS = ('.env', '.json', '.yaml', '.yml', '.toml', '.ini', '.cfg')
+SKIP_DIRS = {'__pycache__', '.git', '.hg', '.svn', 'node_modules'}
+VENDOR_DIRS = {'site-packages', 'venv', '.venv', 'env', 'lib', 'libs', 'vendor'}
+
+MAX_SCAN_FILE_SIZE = 2 * 1024 * 1024
+MMAP_THRESHOLD = 256 * 1024
+BINARY_SNIFF_SIZE = 8192
+SCAN_WORKERS = 4
+# Bytes kept between chunks so a token split across two reads is still matched
+SCAN_OVERLAP = 256
+
+
+@dataclass
+class TokenCandidate:
+    """A distinct token found while scanning, with every place it appears."""
+    token: str
+    locations: list[str] = field(default_factory=list)
+
+    @property
+    def validated(self) -> bool:
+        return bool(VALID_TOKEN_PATTERN.match(self.token))
+
+    def masked(self) -> str:
+        bot_id, _, secret = self.token.partition(':')
+        return f"{bot_id}:{secret[:4]}…{secret[-4:]}"
+
+
+def is_scan_candidate(rel_path: str) -> bool:
+    """Returns True for files that may hold a token (.py sources and config files)."""
+    name = os.path.basename(rel_path).lower()
+    return name.endswith('.py') or name in CONFIG_NAMES or name.startswith('.env') or name.endswith(CONFIG_EXTENSIONS)
+
+
+def scan_priority(rel_path: str) -> tuple[int, int]:
+    """Sort key that puts entry points and config files first and vendored code last."""
+    parts = rel_path.replace('\\', '/').strip('/').split('/')
+    name = parts[-1].lower()
+    depth = len(parts) - 1
+    if depth == 0 and name in ENTRY_POINT_NAMES:
+        tier = 0
+    elif name in CONFIG_NAMES or name.startswith('.env') or name.endswith(CONFIG_EXTENSIONS):
+        tier = 1
+    elif any(p.lower() in VENDOR_DIRS for p in parts[:-1]):
+        tier = 3
+    else:
+        tier = 2
+    return tier, depth
+
+
+class TokenStreamScanner:
+    """Incrementally searches a byte stream for token patterns, tracking line numbers."""
+    def __init__(self, pattern: re.Pattern = TOKEN_PATTERN_BYTES):
+        self.pattern = pattern
+        self.tail = b''
+        self.line = 1
+        self.found: dict[str, int] = {}
+        # Stream offset of the tail's first byte, the byte just before it, and the end of the last match
+        self.offset = 0
+        self.before = b''
+        self.recorded_end = 0
+
+    def _matches(self, window: bytes):
+        # The overlap is scanned twice: searching from the end of the last recorded match keeps its
+        # tail from coming back as a shorter duplicate, as a single pass over the whole stream would
+        for match in self.pattern.finditer(window, max(0, self.recorded_end - self.offset)):
+            # A number cut at the window start would match without its first digits
+            if match.start() == 0 and self.before.isdigit():
+                continue
+            yield match
+
+    def _record(self, window: bytes, match: re.Match) -> None:
+        self.recorded_end = self.offset + match.end()
+        token = match.group(1).decode('ascii', errors='ignore')
+        if token not in self.found:
+            self.found[token] = self.line + window.count(b'\n', 0, match.start())
+
+    def feed(self, chunk: bytes) -> None:
+        window = self.tail + chunk
+        keep_from = max(0, len(window) - SCAN_OVERLAP)
+        for match in self._matches(window):
+            # A match touching the end of the window may continue in the next chunk
+            if match.end() == len(window):
+                keep_from = min(keep_from, match.start())
+                break
+            self._record(window, match)
+        self.line += window.count(b'\n', 0, keep_from)
+        if keep_from:
+            self.before = window[keep_from - 1:keep_from]
+        self.offset += keep_from
+        self.tail = window[keep_from:]
+
+    def close(self) -> dict[str, int]:
+        for match in self._matches(self.tail):
+            self._record(self.tail, match)
+        self.tail = b''
+        return self.found
+
+    @property
+    def has_valid_token(self) -> bool:
+        return any(VALID_TOKEN_PATTERN.match(t) for t in self.found)
+
+
+def merge_candidates(candidates: dict[str, TokenCandidate], found: dict[str, int], location: str) -> None:
+    """Adds the tokens found in one file to the candidate map."""
+    for token, line in found.items():
+        candidate = candidates.setdefault(token, TokenCandidate(token))
+        candidate.locations.append(f"{location}:{line}")
+
+
+def sort_candidates(candidates: dict[str, TokenCandidate]) -> list[TokenCandidate]:
+    """Orders candidates with validated tokens first, keeping discovery order otherwise."""
+    return sorted(candidates.values(), key=lambda c: not c.validated)
+
+
+def _scan_file(file_path: str, stop: threading.Event) -> dict[str, int]:
+    if stop.is_set():
+        return {}
+    try:
+        size = os.path.getsize(file_path)
+        if size == 0 or size > MAX_SCAN_FILE_SIZE:
+            return {}
+        with open(file_path, 'rb') as f:
+            if b'\0' in f.read(BINARY_SNIFF_SIZE):
+                return {}
+            f.seek(0)
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return _search_buffer(data)
+            return _search_buffer(f.read())
+    except OSError as e:
+        logger.warning(f"Could not read file {file_path}: {e}")
+        return {}
+
+
+def _search_buffer(data) -> dict[str, int]:
+    found: dict[str, int] = {}
+    for match in TOKEN_PATTERN_BYTES.finditer(data):
+        token = match.group(1).decode('ascii', errors='ignore')
+        if token not in found:
+            found[token] = data[:match.start()].count(b'\n') + 1
+    return found
+
+
+def _collect_files(root: str) -> list[str]:
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for f in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, f), root)
+            if is_scan_candidate(rel):
+                files.append(rel)
+    files.sort(key=scan_priority)
+    return files
+
+
+def scan_directory_for_tokens(root: str, max_workers: int = SCAN_WORKERS) -> list[TokenCandidate]:
+    """Scans likely files under root in a bounded thread pool, stopping at the first validated token."""
+    files = _collect_files(root)
+    candidates: dict[str, TokenCandidate] = {}
+    stop = threading.Event()
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='token_scan')
+    try:
+        # Files are submitted in priority order so likely files are picked up first
+        futures = {executor.submit(_scan_file, os.path.join(root, rel), stop): rel for rel in files}
+        for future in as_completed(futures):
+            if any(VALID_TOKEN_PATTERN.match(t) for t in future.result()):
+                stop.set()
+                break
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    # Includes files that finished while the remaining work was being cancelled
+    for future, rel in futures.items():
+        if future.done() and not future.cancelled():
+            merge_candidates(candidates, future.result(), rel)
+    return sort_candidates(candidates)
+
+
+def scan_file_for_tokens(file_path: str) -> list[TokenCandidate]:
+    """Scans a single file for tokens."""
+    candidates: dict[str, TokenCandidate] = {}
+    merge_candidates(candidates, _scan_file(file_path, threading.Event()), os.path.basename(file_path))
+    return sort_candidates(candidates)
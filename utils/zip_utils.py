@@ -0,0 +1,131 @@
+import os
+import re
+import stat
+import zipfile
+import logging
+from typing import Callable, Optional
+
+from config import MAX_ZIP_TOTAL_SIZE, MAX_ZIP_MEMBERS, MAX_ZIP_RATIO
+from utils.token_scanner import (
+    MAX_SCAN_FILE_SIZE, TokenCandidate, TokenStreamScanner, is_scan_candidate, scan_priority, merge_candidates,
+    sort_candidates
+)
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Ratio checks only kick in once a member has produced this much data
+RATIO_CHECK_FLOOR = 1024 * 1024
+
+
+class UnsafeZipError(zipfile.BadZipFile):
+    """Raised when an archive member is unsafe or the archive exceeds the install limits."""
+
+
+def safe_member_path(dest_root: str, member_name: str) -> str | None:
+    """Maps an archive member name to a path inside dest_root, or raises UnsafeZipError."""
+    name = member_name.replace('\\', '/')
+    if name.startswith('/') or re.match(r'^[a-zA-Z]:', name):
+        raise UnsafeZipError(f"Absolute path in archive: {member_name}")
+
+    parts = [p for p in name.split('/') if p not in ('', '.')]
+    if any(p == '..' for p in parts):
+        raise UnsafeZipError(f"Path traversal in archive: {member_name}")
+    if not parts:
+        return None
+
+    root = os.path.abspath(dest_root)
+    target = os.path.abspath(os.path.join(root, *parts))
+    if os.path.commonpath([root, target]) != root:
+        raise UnsafeZipError(f"Path escapes bot directory: {member_name}")
+    return target
+
+
+def _check_archive_limits(infos: list[zipfile.ZipInfo]) -> None:
+    if len(infos) > MAX_ZIP_MEMBERS:
+        raise UnsafeZipError(f"Too many files in archive ({len(infos)} > {MAX_ZIP_MEMBERS})")
+    declared = sum(info.file_size for info in infos)
+    if declared > MAX_ZIP_TOTAL_SIZE:
+        raise UnsafeZipError(f"Archive too large when extracted ({declared} bytes)")
+
+
+def _stream_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, total: int, sink, scanner: TokenStreamScanner | None) -> int:
+    """Streams one member into sink while enforcing the size and ratio limits; returns the new running total."""
+    written = 0
+    with zf.open(info) as src:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            total += len(chunk)
+            # Header sizes can lie, so the limits are enforced on the real output
+            if total > MAX_ZIP_TOTAL_SIZE:
+                raise UnsafeZipError("Archive exceeds the extracted size limit")
+            if written > RATIO_CHECK_FLOOR and written > MAX_ZIP_RATIO * max(info.compress_size, 1):
+                raise UnsafeZipError(f"Suspicious compression ratio for {info.filename}")
+            if sink is not None:
+                sink.write(chunk)
+            if scanner is not None:
+                scanner.feed(chunk)
+    return total
+
+
+def extract_zip_streaming(zip_path: str, dest_root: str,
+                          progress: Optional[Callable[[int, int], None]] = None) -> list[TokenCandidate]:
+    """Extracts a zip archive into dest_root in a single pass and returns the token candidates found on the way."""
+    os.makedirs(dest_root, exist_ok=True)
+    candidates: dict[str, TokenCandidate] = {}
+    scanning = True
+    total = 0
+
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        infos = zf.infolist()
+        _check_archive_limits(infos)
+        # Members are read by offset, so likely token files can be extracted first
+        infos.sort(key=lambda i: scan_priority(i.filename))
+
+        for index, info in enumerate(infos, start=1):
+            if progress:
+                progress(index, len(infos))
+            target = safe_member_path(dest_root, info.filename)
+            if target is None:
+                continue
+            if stat.S_ISLNK(info.external_attr >> 16):
+                raise UnsafeZipError(f"Symbolic links are not allowed: {info.filename}")
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            scan = scanning and info.file_size <= MAX_SCAN_FILE_SIZE and is_scan_candidate(info.filename)
+            scanner = TokenStreamScanner() if scan else None
+            with open(target, 'wb') as dst:
+                total = _stream_member(zf, info, total, dst, scanner)
+            if scanner is not None:
+                merge_candidates(candidates, scanner.close(), info.filename)
+                # Stop scanning after the first real token; the rest is only written out
+                scanning = not scanner.has_valid_token
+
+    logger.info(f"Extracted {len(infos)} members ({total} bytes) from {zip_path}")
+    return sort_candidates(candidates)
+
+
+def scan_zip_for_tokens(zip_path: str) -> list[TokenCandidate]:
+    """Searches likely members of a zip archive for tokens without writing anything to disk."""
+    candidates: dict[str, TokenCandidate] = {}
+    total = 0
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        infos = zf.infolist()
+        _check_archive_limits(infos)
+        for info in sorted(infos, key=lambda i: scan_priority(i.filename)):
+            if info.is_dir() or info.file_size > MAX_SCAN_FILE_SIZE or not is_scan_candidate(info.filename):
+                continue
+            safe_member_path(os.getcwd(), info.filename)
+            scanner = TokenStreamScanner()
+            total = _stream_member(zf, info, total, None, scanner)
+            merge_candidates(candidates, scanner.close(), info.filename)
+            if scanner.has_valid_token:
+                break
+    return sort_candidates(candidates)
+